@@ -3,10 +3,12 @@ from runhouse.resources.blobs import blob, Blob, file, File
 from runhouse.resources.envs import conda_env, CondaEnv, env, Env
 from runhouse.resources.folders import Folder, folder, GCSFolder, S3Folder
 from runhouse.resources.functionals.mapper import Mapper, mapper
+from runhouse.resources.functionals.pipeline import Pipeline, pipeline
 from runhouse.resources.functions.aws_lambda import LambdaFunction
 from runhouse.resources.functions.aws_lambda_factory import aws_lambda_fn
 from runhouse.resources.functions.function import Function
 from runhouse.resources.functions.function_factory import function
+from runhouse.resources.futures import as_completed, RemoteFuture, wait
 from runhouse.resources.hardware import (
     cluster,
     Cluster,
@@ -20,10 +22,18 @@ from runhouse.resources.hardware import (
 # WARNING: Any built-in module that is imported here must be capitalized followed by all lowercase, or we will
 # will not find the module class when attempting to reconstruct it from a config.
 from runhouse.resources.kvstores.kvstore import Kvstore
-from runhouse.resources.module import Module, module
+from runhouse.resources.module import batched, cached, Module, module, single_flight
 from runhouse.resources.packages import git_package, GitPackage, package, Package
-from runhouse.resources.provenance import capture_stdout, Run, run, RunStatus, RunType
+from runhouse.resources.provenance import (
+    capture_stdout,
+    is_cancelled,
+    Run,
+    run,
+    RunStatus,
+    RunType,
+)
 from runhouse.resources.queues import Queue
+from runhouse.resources.refs import Ref, ref
 from runhouse.resources.resource import Resource
 from runhouse.resources.secrets import provider_secret, ProviderSecret, Secret, secret
 from runhouse.resources.tables import Table, table
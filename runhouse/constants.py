@@ -13,6 +13,55 @@ RH_LOGFILE_PATH = Path.home() / LOGS_DIR
 
 MAX_MESSAGE_LENGTH = 1 * 1024 * 1024 * 1024  # 1 GB
 
+# Payloads whose pickle is larger than this are streamed to the server in chunks rather than sent as one JSON body
+CHUNKED_UPLOAD_THRESHOLD = 64 * 1024 * 1024  # 64 MB
+UPLOAD_CHUNK_SIZE = 16 * 1024 * 1024  # 16 MB
+
+# Async run completion is reported via a long-poll, which returns as soon as any of the polled runs finish, or after
+# this many seconds otherwise. Clients wanting to wait longer just poll again.
+RUN_STATUS_LONG_POLL_TIMEOUT = 30
+RUN_STATUS_POLL_INTERVAL = 0.05
+
+# Results streamed back from a generator are coalesced into frames of up to this many items or bytes, waiting up to
+# this many seconds for more items to arrive before sending a frame
+STREAM_FRAME_MAX_ITEMS = 1000
+STREAM_FRAME_MAX_BYTES = 1024 * 1024
+STREAM_FRAME_MAX_WAIT = 0.005
+
+# Result queues of generator calls hold up to this many items in memory, spilling any more to segment files of up to
+# this many bytes on local disk until the client streaming them catches up
+RESULT_QUEUE_MAX_MEMORY_ITEMS = 10000
+QUEUE_SPILL_SEGMENT_BYTES = 64 * 1024 * 1024  # 64 MB
+
+# Calls to an env servlet run in a Ray concurrency group per priority class, with this many threads each. Calls beyond
+# a class's limit queue in Ray behind that class only, before taking any of the servlet's threads, so e.g. a flood of
+# low priority batch calls can't hold up high priority ones. Up to MAX_EARLY_CANCELS calls cancelled while still queued
+# are remembered, so they're cancelled as soon as they start.
+DEFAULT_CALL_PRIORITY = "normal"
+CALL_PRIORITY_POOL_SIZES = {"high": 64, "normal": 512, "low": 16}
+MAX_EARLY_CANCELS = 10000
+
+# Ray concurrency groups of each env servlet and how many of their methods can run at once. Cheap object store
+# operations ("control") and fetching results ("results") have their own threads, so they stay fast however busy user
+# calls ("user", and "call_<priority>" for module method calls) keep the servlet. Methods outside these groups, e.g.
+# put_resource_local and replica setup, share the servlet's max_concurrency, as they did before it had any groups.
+ENV_SERVLET_CONCURRENCY_GROUPS = {
+    "control": 50,
+    "results": 500,
+    "user": 1000,
+    **{f"call_{priority}": size for priority, size in CALL_PRIORITY_POOL_SIZES.items()},
+}
+ENV_SERVLET_MAX_CONCURRENCY = 1000
+
+# Call arguments whose pickle is at least this large are sent by their hash, and only uploaded if the env doesn't hold
+# them already from an earlier call. Each env keeps up to this many bytes of such arguments.
+ARG_DEDUP_THRESHOLD = 1024 * 1024  # 1 MB
+ARG_CACHE_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB
+ARG_CACHE_MAX_ENTRIES = 1024
+
+# Results from an env's worker processes at least this large are passed back to the servlet through shared memory
+PROCESS_POOL_SHM_THRESHOLD = 1024 * 1024
+
 CLI_RESTART_CMD = "runhouse restart"
 CLI_STOP_CMD = "runhouse stop"
 
@@ -273,6 +273,7 @@ def _start_server(
     use_nginx=False,
     certs_address=None,
     use_local_telemetry=False,
+    workers=None,
 ):
     ############################################
     # Build CLI commands to start the server
@@ -341,6 +342,11 @@ def _start_server(
         logger.info("Configuring local telemetry on the cluster.")
         flags.append(use_local_telemetry_flag)
 
+    workers_flag = f" --workers {workers}" if workers else ""
+    if workers_flag:
+        logger.info(f"Starting server with {workers} worker processes.")
+        flags.append(workers_flag)
+
     # Check if screen or nohup are available
     screen = screen and _check_if_command_exists("screen")
     nohup = not screen and nohup and _check_if_command_exists("nohup")
@@ -432,6 +438,9 @@ def start(
     use_local_telemetry: bool = typer.Option(
         False, help="Whether to use local telemetry"
     ),
+    workers: Optional[int] = typer.Option(
+        None, help="Number of server worker processes. Defaults to 1."
+    ),
 ):
     """Start the HTTP or HTTPS server on the cluster."""
     _start_server(
@@ -447,6 +456,7 @@ def start(
         use_nginx=use_nginx,
         certs_address=certs_address,
         use_local_telemetry=use_local_telemetry,
+        workers=workers,
     )
 
 
@@ -500,6 +510,9 @@ def restart(
         False,
         help="Whether to use local telemetry",
     ),
+    workers: Optional[int] = typer.Option(
+        None, help="Number of server worker processes. Defaults to 1."
+    ),
 ):
     """Restart the HTTP server on the cluster."""
     if name:
@@ -523,6 +536,7 @@ def restart(
         use_nginx=use_nginx,
         certs_address=certs_address,
         use_local_telemetry=use_local_telemetry,
+        workers=workers,
     )
 
 
@@ -3,7 +3,7 @@ import logging
 from typing import Any, Optional, Tuple, Union
 
 from runhouse.resources.envs import _get_env_from, Env
-from runhouse.resources.module import LOCAL_METHODS, Module
+from runhouse.resources.module import _signature_cache, LOCAL_METHODS, Module
 
 logger = logging.getLogger(__name__)
 
@@ -38,11 +38,16 @@ class Asgi(Module):
     def signature(self):
         sig = super().signature
 
-        route_attrs = {
-            name: self.method_signature(endpoint)
-            for name, endpoint in self._route_names_and_endpoints().items()
-            if not name[0] == "_" and name not in LOCAL_METHODS
-        }
+        # Walking the routes requires loading the app, so cache the result by the app's pointers
+        route_attrs = _signature_cache.pointers_signature(
+            "asgi",
+            self.app_pointers,
+            lambda: {
+                name: self.method_signature(endpoint)
+                for name, endpoint in self._route_names_and_endpoints().items()
+                if not name[0] == "_" and name not in LOCAL_METHODS
+            },
+        )
         sig.update(route_attrs)
         return sig
 
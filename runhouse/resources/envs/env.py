@@ -31,6 +31,7 @@ class Env(Resource):
         working_dir: Optional[Union[str, Path]] = None,
         secrets: Optional[Union[str, "Secret"]] = [],
         compute: Optional[Dict] = {},
+        procs: Optional[int] = None,
         dryrun: bool = True,
         **kwargs,  # We have this here to ignore extra arguments when calling from_config
     ):
@@ -47,6 +48,7 @@ class Env(Resource):
         self.working_dir = working_dir
         self.secrets = secrets
         self.compute = compute
+        self.procs = procs
 
     @property
     def env_name(self):
@@ -82,7 +84,7 @@ class Env(Resource):
     def config_for_rns(self):
         config = super().config_for_rns
         self.save_attrs_to_config(
-            config, ["setup_cmds", "env_vars", "env_name", "compute"]
+            config, ["setup_cmds", "env_vars", "env_name", "compute", "procs"]
         )
         config.update(
             {
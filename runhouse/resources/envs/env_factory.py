@@ -20,6 +20,7 @@ def env(
     working_dir: Optional[Union[str, Path]] = None,
     secrets: Optional[Union[str, "Secret"]] = [],
     compute: Optional[Dict] = {},
+    procs: Optional[int] = None,
     dryrun: bool = False,
 ):
     """Builds an instance of :class:`Env`.
@@ -39,6 +40,9 @@ def env(
             cluster scheduler (generally Ray). Only use this if you know what you're doing.
             Example: ``{"cpus": 1, "gpus": 1}``. (Default: {})
             More info: https://docs.ray.io/en/latest/ray-core/scheduling/resources.html
+        procs (int, optional): Run synchronous method calls in this many worker processes, each loading its own
+            copy of the module, so CPU-bound Python calls aren't serialized by the GIL. State changes made by a call
+            aren't seen by other calls. (Default: ``None``, calls run in threads of the env's process)
         dryrun (bool, optional): Whether to run in dryrun mode. (Default: ``False``)
 
 
@@ -59,7 +63,7 @@ def env(
         >>> conda_env = rh.env(conda_env="conda_env.yaml", reqs=["pip:/accelerate"])   # with additional reqs
     """
     if name and not any(
-        [reqs, conda_env, setup_cmds, env_vars, secrets, working_dir, compute]
+        [reqs, conda_env, setup_cmds, env_vars, secrets, working_dir, compute, procs]
     ):
         return Env.from_name(name, dryrun)
 
@@ -77,6 +81,7 @@ def env(
             working_dir=working_dir,
             secrets=secrets,
             name=name or conda_yaml["name"],
+            procs=procs,
             dryrun=dryrun,
         )
 
@@ -88,6 +93,7 @@ def env(
         secrets=secrets,
         name=name or Env.DEFAULT_NAME,
         compute=compute,
+        procs=procs,
         dryrun=dryrun,
     )
 
@@ -102,6 +108,7 @@ def conda_env(
     working_dir: Optional[Union[str, Path]] = "./",
     secrets: List[Union[str, "Secret"]] = [],
     compute: Optional[Dict] = {},
+    procs: Optional[int] = None,
     dryrun: bool = False,
 ):
     """Builds an instance of :class:`CondaEnv`.
@@ -121,6 +128,9 @@ def conda_env(
             cluster scheduler (generally Ray). Only use this if you know what you're doing.
             Example: ``{"cpus": 1, "gpus": 1}``. (Default: {})
             More info: https://docs.ray.io/en/latest/ray-core/scheduling/resources.html
+        procs (int, optional): Run synchronous method calls in this many worker processes, each loading its own
+            copy of the module, so CPU-bound Python calls aren't serialized by the GIL. State changes made by a call
+            aren't seen by other calls. (Default: ``None``, calls run in threads of the env's process)
         dryrun (bool, optional): Whether to run in dryrun mode. (Default: ``False``)
 
     Returns:
@@ -146,5 +156,6 @@ def conda_env(
         working_dir=working_dir,
         secrets=secrets,
         compute=compute,
+        procs=procs,
         dryrun=dryrun,
     )
@@ -1,22 +1,361 @@
+import collections
+import contextlib
 import logging
-from multiprocessing import pool
-from typing import List, Optional, Union
+import math
+import os
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import as_completed, Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type, Union
+
+import httpx
+import ray.exceptions
+import requests
+
+from runhouse.resources.envs import Env
 
 from runhouse.resources.functions import function, Function
+from runhouse.resources.functions.function import _auto_chunksize
 
 from runhouse.resources.module import Module
 
 logger = logging.getLogger(__name__)
 
+# Failures of a replica or of the connection to it, rather than errors raised by the call itself, which are retried
+# on another replica and count against the replica's health by default
+REPLICA_FAILURES = (
+    ConnectionError,
+    TimeoutError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    httpx.TransportError,
+    ray.exceptions.RayActorError,
+    ray.exceptions.WorkerCrashedError,
+)
+
+
+class _ReplicaScheduler:
+    """Tracks the outstanding requests on each replica of a Mapper and hands out replicas according to the
+    scheduling policy, blocking while every replica is at its in-flight cap. Also owns the thread pool the Mapper
+    dispatches from, which is reused across calls."""
+
+    POLICIES = ["least_loaded", "power_of_two", "round_robin"]
+    # A replica which fails this many requests in a row is marked unhealthy, and gets no new requests for the
+    # cooldown (unless no replica is healthy), letting it drain
+    UNHEALTHY_AFTER_FAILURES = 3
+    UNHEALTHY_COOLDOWN = 30
+
+    def __init__(
+        self, policy: str = "least_loaded", max_in_flight: Optional[int] = None
+    ):
+        if policy not in self.POLICIES:
+            raise ValueError(
+                f"Unknown scheduling policy {policy}, must be one of {self.POLICIES}"
+            )
+        self.policy = policy
+        self.max_in_flight = max_in_flight
+        self._init_runtime_state()
+
+    def _init_runtime_state(self):
+        self._cond = threading.Condition()
+        self._in_flight = {}
+        self._next = 0
+        self._executor = None
+        self._executor_size = 0
+        self._failures = {}
+        self._unhealthy_until = {}
+        # Replicas being reaped, which get no new requests
+        self._draining = set()
+
+    def __getstate__(self):
+        # Locks and threads can't be pickled (e.g. when the Mapper is sent to a cluster), so we recreate them
+        return {"policy": self.policy, "max_in_flight": self.max_in_flight}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_runtime_state()
+
+    def load(self, replica) -> int:
+        return self._in_flight.get(id(replica), 0)
+
+    def healthy(self, replica) -> bool:
+        return self._unhealthy_until.get(id(replica), 0) <= time.time()
+
+    def record_result(self, replica: Module, success: bool):
+        """Track consecutive failures on the replica, marking it unhealthy if there are too many."""
+        with self._cond:
+            if success:
+                self._failures.pop(id(replica), None)
+                return
+            self._failures[id(replica)] = self._failures.get(id(replica), 0) + 1
+            if self._failures[
+                id(replica)
+            ] >= self.UNHEALTHY_AFTER_FAILURES and self.healthy(replica):
+                logger.warning(
+                    f"Replica {getattr(replica, 'name', replica)} failed {self._failures[id(replica)]} requests "
+                    f"in a row, not sending it new requests for {self.UNHEALTHY_COOLDOWN}s"
+                )
+                self._unhealthy_until[id(replica)] = (
+                    time.time() + self.UNHEALTHY_COOLDOWN
+                )
+
+    def acquire(
+        self,
+        replicas: Union[List[Module], Callable[[], List[Module]]],
+        exclude: Optional[set] = None,
+    ) -> Module:
+        """Reserve a replica for a request, waiting until one is under its in-flight cap. Healthy replicas whose ids
+        aren't in ``exclude`` (e.g. the replicas a retried request already failed on) are preferred, then any healthy
+        replica, and only if none are healthy, the unhealthy ones. Replicas being drained are never picked.
+        ``replicas`` can be a function returning the current replicas, which is called again each time the wait is
+        woken, so replicas added or removed meanwhile are accounted for."""
+        get_replicas = replicas if callable(replicas) else lambda: replicas
+        exclude = exclude or set()
+        with self._cond:
+            while True:
+                replicas = [r for r in get_replicas() if id(r) not in self._draining]
+                healthy = [r for r in replicas if self.healthy(r)]
+                pool = (
+                    [r for r in healthy if id(r) not in exclude]
+                    or healthy
+                    or [r for r in replicas if id(r) not in exclude]
+                    or replicas
+                )
+                # Rotate the starting point so ties (e.g. sequential calls) are spread across replicas
+                start = self._next % len(pool) if pool else 0
+                candidates = [pool[(start + i) % len(pool)] for i in range(len(pool))]
+                if self.max_in_flight:
+                    candidates = [
+                        r for r in candidates if self.load(r) < self.max_in_flight
+                    ]
+                if candidates:
+                    break
+                self._cond.wait()
+
+            if self.policy == "round_robin":
+                replica = candidates[0]
+            elif self.policy == "power_of_two" and len(candidates) > 2:
+                replica = min(random.sample(candidates, 2), key=self.load)
+            else:
+                replica = min(candidates, key=self.load)
+
+            self._next += 1
+            self._in_flight[id(replica)] = self.load(replica) + 1
+            return replica
+
+    def release(self, replica: Module):
+        with self._cond:
+            self._in_flight[id(replica)] = self.load(replica) - 1
+            if not self._in_flight[id(replica)]:
+                del self._in_flight[id(replica)]
+            self._cond.notify_all()
+
+    def drain(self, replica: Module):
+        """Stop handing out the replica, and wait until it has no outstanding requests."""
+        with self._cond:
+            self._draining.add(id(replica))
+            while self.load(replica):
+                self._cond.wait()
+
+    def forget(self, replica: Module):
+        """Drop what's tracked about a replica which has been removed, as its id may be reused by a new one."""
+        with self._cond:
+            self._draining.discard(id(replica))
+            self._failures.pop(id(replica), None)
+            self._unhealthy_until.pop(id(replica), None)
+
+    def executor(self, num_replicas: int) -> ThreadPoolExecutor:
+        """The thread pool to dispatch requests from, grown if the replicas could take more requests at once."""
+        size = (
+            num_replicas * self.max_in_flight
+            if self.max_in_flight
+            else max(os.cpu_count() or 1, num_replicas)
+        )
+        with self._cond:
+            if self._executor is None or self._executor_size < size:
+                if self._executor is not None:
+                    # Let requests already submitted to the old pool finish in the background
+                    self._executor.shutdown(wait=False)
+                self._executor = ThreadPoolExecutor(max_workers=size)
+                self._executor_size = size
+            return self._executor
+
+
+class _Autoscaler:
+    """Watches the latency of a Mapper's requests (including time spent waiting for a free replica), adding replicas
+    when a percentile of the recent latencies is over the target, and reaping auto replicas which have sat idle for
+    the cooldown. The scaling runs in a background thread so it doesn't hold up the calls themselves."""
+
+    # Number of recent request latencies to base scaling up on, and how many are needed to make a decision
+    WINDOW = 100
+    MIN_SAMPLES = 10
+
+    def __init__(
+        self,
+        target_latency: float,
+        min_replicas: int,
+        max_replicas: int,
+        percentile: float = 0.95,
+        cooldown: float = 60,
+    ):
+        if not 0 < percentile <= 1:
+            raise ValueError("latency_percentile must be between 0 and 1")
+        if not 1 <= min_replicas <= max_replicas:
+            raise ValueError(
+                f"Invalid replica bounds: min_replicas ({min_replicas}) must be at least 1 and no more than "
+                f"max_replicas ({max_replicas})"
+            )
+        self.target_latency = target_latency
+        self.min_replicas = min_replicas
+        self.max_replicas = max_replicas
+        self.percentile = percentile
+        self.cooldown = cooldown
+        self.decisions = []
+        self._init_runtime_state()
+
+    def _init_runtime_state(self):
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=self.WINDOW)
+        self._last_used = {}
+        self._wake = threading.Event()
+        self._thread = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for attr in ["_lock", "_latencies", "_last_used", "_wake", "_thread"]:
+            state.pop(attr)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_runtime_state()
+
+    def record(self, mapper: "Mapper", replica: Module, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+            self._last_used[id(replica)] = time.time()
+            if self._thread is None:
+                # Only hold a weak reference so the thread doesn't keep the Mapper alive
+                self._thread = threading.Thread(
+                    target=self._run, args=(weakref.ref(mapper),), daemon=True
+                )
+                self._thread.start()
+        if latency > self.target_latency:
+            self._wake.set()
+
+    def latency_percentile(self) -> Optional[float]:
+        """The configured percentile of the recent request latencies, or None if there are too few to go on."""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < self.MIN_SAMPLES:
+            return None
+        return samples[min(int(self.percentile * len(samples)), len(samples) - 1)]
+
+    def _run(self, mapper_ref):
+        interval = max(min(self.cooldown / 4, 10), 0.5)
+        while True:
+            self._wake.wait(timeout=interval)
+            self._wake.clear()
+            mapper = mapper_ref()
+            if mapper is None:
+                return
+            try:
+                self.check(mapper)
+            except Exception as e:
+                logger.exception(f"Error autoscaling mapper replicas: {e}")
+            del mapper
+
+    def check(self, mapper: "Mapper"):
+        """Make a scaling decision for the Mapper based on the recent latencies and idle replicas."""
+        now = time.time()
+        num_replicas = len(mapper.replicas)
+        with self._lock:
+            for replica in mapper._auto_replicas:
+                self._last_used.setdefault(id(replica), now)
+
+        latency = self.latency_percentile()
+        if (
+            latency is not None
+            and latency > self.target_latency
+            and num_replicas < self.max_replicas
+        ):
+            # Scale in proportion to how far over the target we are, as the latency is mostly queueing
+            desired = min(
+                math.ceil(num_replicas * latency / self.target_latency),
+                self.max_replicas,
+            )
+            self._record_decision(
+                "scale_up",
+                num_replicas,
+                desired,
+                f"p{round(self.percentile * 100)} latency {round(latency, 3)}s is over the target of "
+                f"{self.target_latency}s",
+            )
+            mapper._add_auto_replicas(desired - num_replicas)
+            with self._lock:
+                # Start over, so the next decision reflects the new capacity
+                self._latencies.clear()
+            return
+
+        idle = [
+            replica
+            for replica in mapper._auto_replicas
+            if not mapper._scheduler.load(replica)
+            and now - self._last_used.get(id(replica), now) > self.cooldown
+        ]
+        num_to_reap = min(len(idle), num_replicas - self.min_replicas)
+        if num_to_reap > 0:
+            self._record_decision(
+                "scale_down",
+                num_replicas,
+                num_replicas - num_to_reap,
+                f"{num_to_reap} replica(s) idle for over {self.cooldown}s",
+            )
+            mapper._reap_replicas(idle[:num_to_reap])
+            with self._lock:
+                for replica in idle[:num_to_reap]:
+                    self._last_used.pop(id(replica), None)
+
+    def _record_decision(
+        self, action: str, from_replicas: int, to_replicas: int, reason: str
+    ):
+        logger.info(
+            f"Mapper autoscaling: {action} from {from_replicas} to {to_replicas} replicas, {reason}"
+        )
+        self.decisions.append(
+            {
+                "time": time.time(),
+                "action": action,
+                "from_replicas": from_replicas,
+                "to_replicas": to_replicas,
+                "reason": reason,
+            }
+        )
+
 
 class Mapper(Module):
+    # Longest to wait between retries of a failed call
+    MAX_RETRY_BACKOFF = 30
+
     def __init__(
         self,
         module: Module,
         method: str,
         num_replicas: Optional[int] = -1,
         replicas: Optional[List[Module]] = None,
-        **kwargs
+        scheduling: str = "least_loaded",
+        max_in_flight_per_replica: Optional[int] = None,
+        target_latency: Optional[float] = None,
+        min_replicas: Optional[int] = None,
+        max_replicas: Optional[int] = None,
+        scale_down_cooldown: float = 60,
+        latency_percentile: float = 0.95,
+        max_retries: int = 0,
+        retry_backoff: float = 0.5,
+        retry_on: Optional[Tuple[Type[Exception], ...]] = None,
+        **kwargs,
     ):
         """
         Runhouse Mapper object. It is used for mapping a function or module method over a list of inputs,
@@ -31,14 +370,36 @@ class Mapper(Module):
         self.num_replicas = num_replicas
         self._auto_replicas = []
         self._user_replicas = replicas or []
-        self._last_called = 0
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.retry_on = tuple(retry_on) if retry_on is not None else REPLICA_FAILURES
+        self._scheduler = _ReplicaScheduler(scheduling, max_in_flight_per_replica)
         if self.num_replicas > len(self.replicas) and self.num_replicas > 0:
             self._add_auto_replicas(self.num_replicas - len(self.replicas))
 
+        self._autoscaler = None
+        if target_latency:
+            if not max_replicas:
+                raise ValueError(
+                    "max_replicas must be set to autoscale with a target_latency"
+                )
+            self._autoscaler = _Autoscaler(
+                target_latency,
+                min_replicas or len(self.replicas),
+                max_replicas,
+                percentile=latency_percentile,
+                cooldown=scale_down_cooldown,
+            )
+
     @property
     def replicas(self):
         return [self.module] + self._auto_replicas + self._user_replicas
 
+    @property
+    def scaling_decisions(self) -> List[Dict]:
+        """The scaling decisions made by the autoscaler, oldest first, if autoscaling is enabled."""
+        return list(self._autoscaler.decisions) if self._autoscaler else []
+
     def add_replicas(self, replicas: Union[int, List[Module]]):
         if isinstance(replicas, int):
             self.num_replicas += replicas
@@ -53,21 +414,220 @@ class Mapper(Module):
         self._auto_replicas = self._auto_replicas[:-num_replicas]
 
     def _add_auto_replicas(self, num_replicas: int):
-        self._auto_replicas.extend(self.module.replicate(num_replicas))
+        # Use the lowest free indices, so replicas added after others were reaped don't reuse a live replica's env
+        used = {replica.name for replica in self._auto_replicas}
+        indices = []
+        i = 0
+        while len(indices) < num_replicas:
+            if f"{self.module.name}_replica_{i}" not in used:
+                indices.append(i)
+            i += 1
+
+        envs = []
+        for i in indices:
+            env_conf = self.module.env.config_for_rns
+            env_conf["name"] = f"{self.module.env.name}_replica_{i}"
+            envs.append(Env.from_config(env_conf))
+
+        self._auto_replicas.extend(
+            self.module.replicate(
+                num_replicas,
+                names=[f"{self.module.name}_replica_{i}" for i in indices],
+                envs=envs,
+            )
+        )
+        self.num_replicas = len(self.replicas)
 
-    def increment_counter(self):
-        self._last_called += 1
-        if self._last_called >= len(self.replicas):
-            self._last_called = 0
-        return self._last_called
+    def _reap_replicas(self, replicas: List[Module]):
+        # Stop sending requests to the replicas, let any in flight finish, then kill their envs
+        reaped = {id(replica) for replica in replicas}
+        self._auto_replicas = [
+            replica for replica in self._auto_replicas if id(replica) not in reaped
+        ]
+        self.num_replicas = len(self.replicas)
+        for replica in replicas:
+            self._scheduler.drain(replica)
+            replica.system.kill(replica.env.name)
+            self._scheduler.forget(replica)
+
+    @contextlib.contextmanager
+    def _acquire_replica(self, exclude: Optional[set] = None):
+        start = time.time()
+        # The scheduler re-reads the replicas whenever it's woken, so a call waiting for a free replica never gets
+        # one which was reaped while it waited
+        replica = self._scheduler.acquire(lambda: self.replicas, exclude=exclude)
+        try:
+            yield replica
+        finally:
+            self._scheduler.release(replica)
+            if self._autoscaler:
+                self._autoscaler.record(self, replica, time.time() - start)
+
+    def _call_with_retries(
+        self,
+        call: Callable[[Module], Any],
+        retries: Optional[int] = None,
+        exclude: Optional[set] = None,
+    ):
+        """Run ``call(replica)`` on a replica, retrying failures of the replica (any of ``retry_on``) with
+        exponential backoff, each time on a replica which hasn't failed the call yet if there is one. Other errors
+        are raised by the call itself, so they're raised straight away and don't count against the replica."""
+        retries = self.max_retries if retries is None else retries
+        failed = set(exclude or ())
+        for attempt in range(retries + 1):
+            with self._acquire_replica(exclude=failed) as replica:
+                try:
+                    result = call(replica)
+                except self.retry_on as e:
+                    self._scheduler.record_result(replica, success=False)
+                    if attempt == retries:
+                        raise
+                    failed.add(id(replica))
+                    logger.warning(
+                        f"Call on replica {replica.name} failed, retrying ({attempt + 1}/{retries}): {e}"
+                    )
+                except Exception:
+                    # The replica ran the call fine, it's the call which failed
+                    self._scheduler.record_result(replica, success=True)
+                    raise
+                else:
+                    self._scheduler.record_result(replica, success=True)
+                    return result
+
+            delay = min(self.retry_backoff * 2**attempt, self.MAX_RETRY_BACKOFF)
+            time.sleep(random.uniform(delay / 2, delay))
+
+    def _call_method_on_replica(
+        self,
+        args,
+        kwargs,
+        retries: Optional[int] = None,
+        exclude: Optional[set] = None,
+    ):
+        return self._call_with_retries(
+            lambda replica: getattr(replica, self.method)(*args, **kwargs),
+            retries=retries,
+            exclude=exclude,
+        )
 
-    @staticmethod
-    def _call_method_on_replica(replica, method, args, kwargs):
-        return getattr(replica, method)(*args, **kwargs)
+    def _call_chunk_on_replica(self, replica, args_chunk, kwargs, return_exceptions):
+        kwargs = kwargs.copy()
+        stream_logs = kwargs.pop("stream_logs", False)
+        client = replica._client()
+        if client:
+            # Send the whole chunk in one request and loop over it on the replica
+            return client.call(
+                replica.name,
+                "_call_chunk",
+                self.method,
+                args_chunk,
+                kwargs,
+                return_exceptions,
+                stream_logs=stream_logs,
+            )
+        return replica._call_chunk(self.method, args_chunk, kwargs, return_exceptions)
+
+    def _submit(
+        self,
+        args_lists: Iterable,
+        kwargs,
+        chunksize: Optional[int] = None,
+        return_exceptions: bool = False,
+    ):
+        """Submit the calls for each set of args, returning a list of futures which each resolve to a list of
+        results, one per input in the chunk."""
+        kwargs["stream_logs"] = kwargs.get("stream_logs", False)
+        args_lists = list(args_lists)
+        executor = self._scheduler.executor(len(self.replicas))
+
+        def call_single(args, retries=None, exclude=None):
+            try:
+                return self._call_method_on_replica(
+                    args, kwargs, retries=retries, exclude=exclude
+                )
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+
+        def call_chunk(args_chunk):
+            # Have the replica return the errors of individual inputs rather than failing the whole chunk, so only
+            # the inputs which hit a replica failure are retried, on their own and spread across the other replicas
+            item_errors = return_exceptions or self.max_retries > 0
+            ran_on = []
+
+            def call(replica):
+                ran_on[:] = [replica]
+                return self._call_chunk_on_replica(
+                    replica, args_chunk, kwargs, item_errors
+                )
+
+            try:
+                results = self._call_with_retries(call)
+            except Exception as e:
+                if return_exceptions:
+                    return [e] * len(args_chunk)
+                raise
+
+            if item_errors:
+                replica = ran_on[0]
+                for i, result in enumerate(results):
+                    if not isinstance(result, Exception):
+                        continue
+                    if isinstance(result, self.retry_on):
+                        self._scheduler.record_result(replica, success=False)
+                        if self.max_retries > 0:
+                            results[i] = call_single(
+                                args_chunk[i],
+                                retries=self.max_retries - 1,
+                                exclude={id(replica)},
+                            )
+                            continue
+                    if not return_exceptions:
+                        raise result
+            return results
+
+        futures = []
+        if not chunksize and args_lists:
+            # Run the first call on its own to see how long calls take, and size the chunks from that
+            start = time.time()
+            first = Future()
+            first.set_result([call_single(args_lists[0])])
+            futures.append(first)
+            args_lists = args_lists[1:]
+            num_workers = len(self.replicas) * (self._scheduler.max_in_flight or 1)
+            chunksize = _auto_chunksize(
+                len(args_lists), num_workers, time.time() - start
+            )
+
+        if chunksize == 1:
+            futures.extend(
+                executor.submit(lambda args: [call_single(args)], args)
+                for args in args_lists
+            )
+        else:
+            futures.extend(
+                executor.submit(call_chunk, args_lists[i : i + chunksize])
+                for i in range(0, len(args_lists), chunksize)
+            )
+        return futures
 
-    def map(self, *args, **kwargs):
+    def map(
+        self,
+        *args,
+        chunksize: Optional[int] = None,
+        return_exceptions: bool = False,
+        **kwargs,
+    ):
         """Map the function or method over a list of arguments.
 
+        Args:
+            chunksize (Optional[int]): Number of inputs to send to a replica in each request. By default, this is
+                chosen from the measured latency of the first call, so that many fast calls are batched together
+                while slow calls are still spread across the replicas.
+            return_exceptions (bool): Return the exception raised by an input (after any retries) in place of its
+                result, rather than raising it, so the results of the other inputs aren't lost. (Default: ``False``)
+
         Example:
             >>> def local_sum(arg1, arg2, arg3):
             >>>     return arg1 + arg2 + arg3
@@ -78,22 +638,56 @@ class Mapper(Module):
             >>> # output: [4, 9]
 
         """
-        kwargs["stream_logs"] = kwargs.get("stream_logs", False)
+        return list(
+            self.imap(
+                *args,
+                chunksize=chunksize,
+                return_exceptions=return_exceptions,
+                **kwargs,
+            )
+        )
 
-        def call_method_on_replica(job):
-            replica, method, argies, kwargies = job
-            return getattr(replica, method)(*argies, **kwargies)
+    def imap(
+        self,
+        *args,
+        chunksize: Optional[int] = None,
+        return_exceptions: bool = False,
+        **kwargs,
+    ):
+        """Like :func:`map`, but returns a generator which yields the results in order as they become available.
 
-        jobs = [
-            (self.replicas[self.increment_counter()], self.method, args, kwargs)
-            for args in zip(*args)
-        ]
+        Example:
+            >>> for res in mapper.imap([1, 2], [1, 4], [2, 3]):
+            >>>     print(res)
+        """
+        for future in self._submit(zip(*args), kwargs, chunksize, return_exceptions):
+            yield from future.result()
 
-        with pool.ThreadPool() as p:
-            # Run the function in parallel on the arguments, keeping the order.
-            return list(p.imap(call_method_on_replica, jobs))
+    def imap_unordered(
+        self,
+        *args,
+        chunksize: Optional[int] = None,
+        return_exceptions: bool = False,
+        **kwargs,
+    ):
+        """Like :func:`imap`, but yields the results in the order they finish rather than the order of the inputs.
+        Results within a chunk stay in order.
 
-    def starmap(self, args_lists: List, **kwargs):
+        Example:
+            >>> for res in mapper.imap_unordered([1, 2], [1, 4], [2, 3]):
+            >>>     print(res)
+        """
+        futures = self._submit(zip(*args), kwargs, chunksize, return_exceptions)
+        for future in as_completed(futures):
+            yield from future.result()
+
+    def starmap(
+        self,
+        args_lists: List,
+        chunksize: Optional[int] = None,
+        return_exceptions: bool = False,
+        **kwargs,
+    ):
         """Like :func:`map` except that the elements of the iterable are expected to be iterables
         that are unpacked as arguments. An iterable of ``[(1,2), (3, 4)]`` results in
         ``func(1,2), func(3,4)]``.
@@ -108,23 +702,15 @@ class Mapper(Module):
             >>> # runs the function twice, once with args (1, 2) and once with args (3, 4)
             >>> mapper.starmap(arg_list)
         """
-        kwargs["stream_logs"] = kwargs.get("stream_logs", False)
-
-        def call_method_on_replica(job):
-            replica, method, argies, kwargies = job
-            return getattr(replica, method)(*argies, **kwargies)
-
-        jobs = [
-            (self.replicas[self.increment_counter()], self.method, args, kwargs)
-            for args in args_lists
+        return [
+            result
+            for future in self._submit(args_lists, kwargs, chunksize, return_exceptions)
+            for result in future.result()
         ]
 
-        with pool.ThreadPool() as p:
-            # Run the function in parallel on the arguments, keeping the order.
-            return list(p.imap(call_method_on_replica, jobs))
-
     def call(self, *args, **kwargs):
-        """Call the function or method on a single replica.
+        """Call the function or method on a single replica, chosen by the Mapper's scheduling policy. If the call
+        fails and ``max_retries`` is set, it's retried on another replica.
 
         Example:
             >>> def local_sum(arg1, arg2, arg3):
@@ -134,12 +720,10 @@ class Mapper(Module):
             >>> mapper = rh.mapper(remote_fn, num_replicas=2)
             >>> for i in range(10):
             >>>     mapper.call(i, 1, 2)
-            >>>     # output: 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, run in round-robin replica order
+            >>>     # output: 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, spread across the replicas
 
         """
-        return getattr(self.replicas[self.increment_counter()], self.method)(
-            *args, **kwargs
-        )
+        return self._call_method_on_replica(args, kwargs)
 
 
 def mapper(
@@ -148,7 +732,17 @@ def mapper(
     num_replicas: int = -1,
     replicas: Optional[List[Module]] = None,
     sync_workdir: bool = False,
-    **kwargs
+    scheduling: str = "least_loaded",
+    max_in_flight_per_replica: Optional[int] = None,
+    target_latency: Optional[float] = None,
+    min_replicas: Optional[int] = None,
+    max_replicas: Optional[int] = None,
+    scale_down_cooldown: float = 60,
+    latency_percentile: float = 0.95,
+    max_retries: int = 0,
+    retry_backoff: float = 0.5,
+    retry_on: Optional[Tuple[Type[Exception], ...]] = None,
+    **kwargs,
 ) -> Mapper:
     """
     A factory method for creating Mapper modules. A mapper is a module that can map a function or module method over
@@ -169,6 +763,33 @@ def mapper(
         replicas (Optional[List[Module]], optional): List of user-specified replicas.
         sync_workdir (bool, optional): Whether to sync the working dir to the replicated environments.
             (Default: ``False``)
+        scheduling (str, optional): How to pick the replica for each call. ``"least_loaded"`` picks the replica
+            with the fewest outstanding calls, ``"power_of_two"`` the less loaded of two random replicas, and
+            ``"round_robin"`` cycles through them. (Default: ``"least_loaded"``)
+        max_in_flight_per_replica (Optional[int], optional): Cap on the outstanding calls to each replica. Further
+            calls wait for a replica to free up. (Default: ``None``, no cap)
+        target_latency (Optional[float], optional): Autoscale the replicas to keep request latency, including time
+            spent waiting for a free replica, under this many seconds. Replicas are added when the
+            ``latency_percentile`` of recent latencies is over the target, and auto replicas are reaped once they've
+            been idle for ``scale_down_cooldown`` seconds. The decisions are recorded in
+            ``Mapper.scaling_decisions``. (Default: ``None``, no autoscaling)
+        min_replicas (Optional[int], optional): Fewest replicas to scale down to when autoscaling. (Default: the
+            initial number of replicas)
+        max_replicas (Optional[int], optional): Most replicas to scale up to when autoscaling. Required if
+            ``target_latency`` is set.
+        scale_down_cooldown (float, optional): Seconds an auto replica must be idle before it's reaped when
+            autoscaling. (Default: ``60``)
+        latency_percentile (float, optional): Percentile of recent request latencies to compare against
+            ``target_latency``. (Default: ``0.95``)
+        max_retries (int, optional): Number of times to retry a call which failed with one of ``retry_on``, each
+            time on a replica which hasn't failed it yet if possible. Replicas which fail several calls in a row are
+            marked unhealthy and get no new calls for a while. (Default: ``0``)
+        retry_backoff (float, optional): Seconds to wait before the first retry of a call, doubling with each
+            further retry. (Default: ``0.5``)
+        retry_on (Optional[Tuple[Type[Exception], ...]], optional): The exception types which count as a failure of
+            the replica, and are retried and counted against its health. Any other error is raised by the call
+            itself, so it's returned or raised without retrying. (Default: ``None``, connection errors and Ray actor
+            and worker failures)
 
     Returns:
         Mapper: The resulting Mapper object.
@@ -177,6 +798,9 @@ def mapper(
         >>> remote_fn = rh.function(local_fn).to(cluster)
         >>> mapper = rh.mapper(remote_fn, num_replicas=2)
 
+        >>> # Scale between 1 and 8 replicas to keep p95 latency under 2 seconds
+        >>> mapper = rh.mapper(remote_fn, num_replicas=1, target_latency=2, max_replicas=8)
+
         >>> remote_module = rh.module(cls=MyClass, system=cluster, env="my_env")
         >>> mapper = rh.mapper(remote_module, method=my_class_method, replicas=-1)
     """
@@ -191,7 +815,23 @@ def mapper(
     if not sync_workdir:
         module.env.working_dir = None
 
-    new_mapper = Mapper(module, method, num_replicas, replicas, **kwargs)
+    new_mapper = Mapper(
+        module,
+        method,
+        num_replicas,
+        replicas,
+        scheduling=scheduling,
+        max_in_flight_per_replica=max_in_flight_per_replica,
+        target_latency=target_latency,
+        min_replicas=min_replicas,
+        max_replicas=max_replicas,
+        scale_down_cooldown=scale_down_cooldown,
+        latency_percentile=latency_percentile,
+        max_retries=max_retries,
+        retry_backoff=retry_backoff,
+        retry_on=retry_on,
+        **kwargs,
+    )
 
     if not sync_workdir:
         module.env.working_dir = backup
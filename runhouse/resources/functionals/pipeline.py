@@ -0,0 +1,181 @@
+import collections
+import logging
+from typing import Any, List, Optional, Tuple, Union
+
+from runhouse.globals import obj_store
+from runhouse.resources.envs import Env
+
+from runhouse.resources.functions import Function
+
+from runhouse.resources.module import Module
+
+logger = logging.getLogger(__name__)
+
+
+def _servlet_for(module_name: str):
+    env_name = obj_store.get_env_servlet_name_for_key(module_name)
+    if env_name is None:
+        raise KeyError(f"Pipeline step {module_name} not found on the cluster")
+    return obj_store.get_env_servlet(env_name)
+
+
+class Pipeline(Module):
+    # Most items of a generator step to buffer ahead of the steps consuming them
+    STREAM_BUFFER = 100
+
+    def __init__(self, steps: List[Tuple[str, str, bool]], **kwargs):
+        """
+        Runhouse Pipeline object. It chains calls to module methods on a cluster, passing each step's result to the
+        next step's env servlet through the cluster's object store rather than back through the client.
+
+        .. note::
+                To create a Pipeline, please use the factory method :func:`pipeline`.
+        """
+        super().__init__(**kwargs)
+        # (module name, method name, whether the method is a generator) for each step
+        self.steps = [tuple(step) for step in steps]
+
+    def run(self, *args, **kwargs):
+        """Run the pipeline on the cluster, passing the args to the first step and each step's result to the next.
+        Returns the last step's result, or if a step is a generator, a list of the results for each of its items.
+        Use :func:`run_stream` to get those results as they're produced.
+
+        Example:
+            >>> pipe = rh.pipeline(preprocess, model.predict, postprocess)
+            >>> pipe.run(raw_inputs)
+        """
+        import ray
+
+        if any(is_gen for _, _, is_gen in self.steps):
+            return list(self._stream(self.steps, args, kwargs, ()))
+        return ray.get(self._submit(self.steps, args, kwargs, ()))
+
+    def run_stream(self, *args, **kwargs):
+        """Run the pipeline like :func:`run`, but as a generator. If a step is a generator, each of its items is
+        passed through the rest of the steps as soon as it's produced, and the results are yielded in order as they
+        complete. Otherwise, the pipeline's single result is yielded.
+
+        Example:
+            >>> pipe = rh.pipeline(read_documents, tokenize, model.embed)
+            >>> for embedding in pipe.run_stream(corpus_path):
+            >>>     index.add(embedding)
+        """
+        import ray
+
+        if any(is_gen for _, _, is_gen in self.steps):
+            yield from self._stream(self.steps, args, kwargs, ())
+        else:
+            yield ray.get(self._submit(self.steps, args, kwargs, ()))
+
+    def _submit(self, steps, args, kwargs, prev: Tuple):
+        """Chain calls to the (non-generator) steps on their env servlets without waiting on them, returning the
+        ObjectRef of the last step's result. Ray hands each result straight to the servlet of the next step."""
+        for module_name, method_name, _ in steps:
+            ref = _servlet_for(module_name).call_pipeline_step.remote(
+                module_name, method_name, args, kwargs, *prev
+            )
+            args, kwargs, prev = None, None, (ref,)
+        return prev[0]
+
+    def _stream(self, steps, args, kwargs, prev: Tuple):
+        import ray
+        from ray.util.queue import Queue as RayQueue
+
+        i = next(i for i, (_, _, is_gen) in enumerate(steps) if is_gen)
+        if i:
+            prev = (self._submit(steps[:i], args, kwargs, prev),)
+            args, kwargs = None, None
+
+        module_name, method_name, _ = steps[i]
+        queue = RayQueue(maxsize=self.STREAM_BUFFER)
+        _servlet_for(module_name).stream_pipeline_step.remote(
+            module_name, method_name, args, kwargs, queue, *prev
+        )
+
+        rest = steps[i + 1 :]
+        rest_streams = any(is_gen for _, _, is_gen in rest)
+        pending = collections.deque()
+        try:
+            while True:
+                kind, value = queue.get()
+                if kind == "end":
+                    break
+                if kind == "error":
+                    raise value
+
+                if rest_streams:
+                    yield from self._stream(rest, None, None, (value,))
+                    continue
+
+                # Send each item on through the rest of the steps as it arrives, and yield the results in order
+                pending.append(self._submit(rest, None, None, (value,)))
+                while pending and ray.wait([pending[0]], timeout=0)[0]:
+                    yield ray.get(pending.popleft())
+
+            while pending:
+                yield ray.get(pending.popleft())
+        finally:
+            # Also stops the generator step if we stopped consuming early
+            queue.shutdown(force=True)
+
+
+def _step_module_and_method(step) -> Tuple[Module, str]:
+    if isinstance(step, tuple):
+        return step
+    if isinstance(step, Function):
+        return step, "call"
+    if hasattr(step, "module") and hasattr(step, "method_name"):
+        # A method of a remote module, e.g. model.predict
+        return step.module, step.method_name
+    raise TypeError(
+        f"Pipeline steps must be functions, methods of modules, or (module, method name) tuples, not {type(step)}"
+    )
+
+
+def pipeline(
+    *steps: Union[Function, Any, Tuple[Module, str]],
+    name: Optional[str] = None,
+    env: Optional[Union[str, Env]] = None,
+) -> Pipeline:
+    """
+    A factory method for creating Pipeline modules. A pipeline chains calls to functions and module methods on a
+    cluster, passing the args to the first step and each step's result to the next, with only the final result
+    returned to the client. Intermediate results are passed between the steps' envs through the cluster's object
+    store, and if a step is a generator, each of its items goes through the rest of the steps as soon as it's
+    produced, with the results streamed back by ``run_stream``.
+
+    Args:
+        *steps: The functions, methods of modules (e.g. ``model.predict``), or ``(module, method name)`` tuples to
+            call, in order. They must all be on the same cluster.
+        name (Optional[str], optional): Name of the pipeline.
+        env (Optional[str or Env], optional): Env to run the pipeline in, which only coordinates the steps.
+            (Default: the cluster's default env)
+
+    Returns:
+        Pipeline: The resulting Pipeline object, on the steps' cluster.
+
+    Example:
+        >>> preprocess = rh.function(preprocess_fn).to(cluster, env="cpu_env")
+        >>> model = rh.module(Model).to(cluster, env="gpu_env")(name="model")
+        >>> pipe = rh.pipeline(preprocess, model.predict, (postprocessor, "format"))
+        >>> pipe.run(raw_inputs)
+    """
+    if not steps:
+        raise ValueError("A pipeline needs at least one step")
+
+    system = None
+    step_specs = []
+    for step in steps:
+        module, method_name = _step_module_and_method(step)
+        if not module.system or not module.name:
+            raise ValueError(
+                f"Pipeline step {module.name or type(module).__name__} must be sent to a cluster first"
+            )
+        if system and module.system.rns_address != system.rns_address:
+            raise ValueError("All the steps of a pipeline must be on the same cluster")
+        system = module.system
+
+        is_gen = module.signature.get(method_name, {}).get("gen", False)
+        step_specs.append((module.name, method_name, is_gen))
+
+    return Pipeline(step_specs, name=name).to(system, env=env)
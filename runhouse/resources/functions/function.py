@@ -1,6 +1,8 @@
 import copy
 import inspect
 import logging
+import math
+import time
 import warnings
 from pathlib import Path
 from typing import Any, List, Optional, Tuple, Union
@@ -8,12 +10,33 @@ from typing import Any, List, Optional, Tuple, Union
 from runhouse import globals
 from runhouse.resources.envs import _get_env_from, Env
 from runhouse.resources.hardware import _get_cluster_from, Cluster
-from runhouse.resources.module import Module
+from runhouse.resources.module import _signature_cache, Module
 
 from runhouse.resources.resource import Resource
 
 logger = logging.getLogger(__name__)
 
+# When mapping without an explicit chunksize, chunks are sized to take about this long to run
+_TARGET_CHUNK_SECONDS = 0.1
+# ...while still giving each worker at least this many chunks, so the load stays balanced
+_MIN_CHUNKS_PER_WORKER = 4
+
+_ray_call_chunk = None
+
+
+def _call_chunk(fn, args_chunk, kwargs):
+    return [fn(*args, **kwargs) for args in args_chunk]
+
+
+def _auto_chunksize(num_items: int, num_workers: int, latency: float) -> int:
+    """Pick a chunksize for mapping over num_items from the measured latency of a single call. Chunks are made
+    large enough to amortize the per-call overhead, but small enough to keep all the workers busy."""
+    if num_items <= 0:
+        return 1
+    by_latency = int(_TARGET_CHUNK_SECONDS / latency) if latency > 0 else num_items
+    by_balance = math.ceil(num_items / (max(num_workers, 1) * _MIN_CHUNKS_PER_WORKER))
+    return max(1, min(by_latency, by_balance))
+
 
 class Function(Module):
     RESOURCE_TYPE = "function"
@@ -158,12 +181,22 @@ class Function(Module):
 
     def method_signature(self, method, rich=False):
         if callable(method) and method.__name__ == "call":
-            return self.method_signature(self._get_obj_from_pointers(*self.fn_pointers))
+            return _signature_cache.pointers_signature(
+                "function",
+                self.fn_pointers,
+                lambda: self.method_signature(
+                    self._get_obj_from_pointers(*self.fn_pointers)
+                ),
+            )
         return super().method_signature(method, rich=rich)
 
-    def map(self, *args, **kwargs):
+    def map(self, *args, chunksize: Optional[int] = None, **kwargs):
         """Map a function over a list of arguments.
 
+        Args:
+            chunksize (Optional[int]): Number of inputs to run in each Ray task. By default, this is chosen from the
+                measured latency of the first call.
+
         Example:
             >>> def local_sum(arg1, arg2, arg3):
             >>>     return arg1 + arg2 + arg3
@@ -173,13 +206,9 @@ class Function(Module):
             >>> # output: [4, 9]
 
         """
-        import ray
+        return self.starmap(list(zip(*args)), chunksize=chunksize, **kwargs)
 
-        fn = self._get_obj_from_pointers(*self.fn_pointers)
-        ray_wrapped_fn = ray.remote(fn)
-        return ray.get([ray_wrapped_fn.remote(*args, **kwargs) for args in zip(*args)])
-
-    def starmap(self, args_lists, **kwargs):
+    def starmap(self, args_lists, chunksize: Optional[int] = None, **kwargs):
         """Like :func:`map` except that the elements of the iterable are expected to be iterables
         that are unpacked as arguments. An iterable of [(1,2), (3, 4)] results in [func(1,2), func(3,4)].
 
@@ -190,17 +219,48 @@ class Function(Module):
         """
         import ray
 
-        fn = self._get_obj_from_pointers(*self.fn_pointers)
-        ray_wrapped_fn = ray.remote(fn)
-        return ray.get([ray_wrapped_fn.remote(*args, **kwargs) for args in args_lists])
+        global _ray_call_chunk
+        if _ray_call_chunk is None:
+            _ray_call_chunk = ray.remote(_call_chunk)
+
+        args_lists = list(args_lists)
+        if not args_lists:
+            return []
+
+        fn_ref = ray.put(self._get_obj_from_pointers(*self.fn_pointers))
+        results = []
+        if not chunksize:
+            start = time.time()
+            results = ray.get(_ray_call_chunk.remote(fn_ref, args_lists[:1], kwargs))
+            args_lists = args_lists[1:]
+            chunksize = _auto_chunksize(
+                len(args_lists),
+                int(ray.available_resources().get("CPU", 1)),
+                time.time() - start,
+            )
+
+        chunk_refs = [
+            _ray_call_chunk.remote(fn_ref, args_lists[i : i + chunksize], kwargs)
+            for i in range(0, len(args_lists), chunksize)
+        ]
+        for chunk_ref in chunk_refs:
+            results.extend(ray.get(chunk_ref))
+        return results
 
     def remote(self, *args, local=True, **kwargs):
         obj = self.call.remote(*args, **kwargs)
         return obj
 
     def run(self, *args, local=True, **kwargs):
-        key = self.call.run(*args, **kwargs)
-        return key
+        """Submit a call asynchronously and return a :class:`RemoteFuture` for its result.
+
+        Example:
+            >>> remote_fn = rh.function(local_fn).to(gpu)
+            >>> future = remote_fn.run(1, 2)
+            >>> future.result(timeout=60)
+        """
+        future = self.call.run(*args, **kwargs)
+        return future
 
     def get(self, run_key):
         """Get the result of a Function call that was submitted as async using `run`.
@@ -0,0 +1,223 @@
+import logging
+import threading
+import time
+from concurrent.futures import CancelledError, TimeoutError
+from typing import Callable, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# How long the background callback thread long-polls for before checking for newly added futures
+_CALLBACK_POLL_TIMEOUT = 1
+# When waiting on futures from several clusters at once, how long to long-poll each cluster before moving to the next
+_MULTI_CLIENT_POLL_TIMEOUT = 0.5
+
+
+class RemoteFuture(str):
+    """Handle to a method call submitted asynchronously with ``.run()``.
+
+    It is a ``str`` of the run key, so it can still be passed anywhere a run key is accepted (e.g.
+    ``cluster.get(run_key)``), and adds a ``concurrent.futures``-like interface for waiting on the result. Completion
+    is reported by the cluster's long-poll endpoint, which can check many runs in one request, so waiting on many
+    futures with :func:`as_completed` or :func:`wait` only takes a handful of requests.
+
+    Example:
+        >>> remote_fn = rh.function(local_fn).to(gpu)
+        >>> futures = [remote_fn.run(i) for i in range(100)]
+        >>> for future in rh.as_completed(futures):
+        >>>     print(future.result())
+    """
+
+    def __new__(cls, run_key: str, client):
+        future = super().__new__(cls, run_key)
+        future._client = client
+        future._status = None
+        future._result = None
+        future._exception = None
+        future._fetched = False
+        future._callbacks = []
+        future._lock = threading.Lock()
+        return future
+
+    def __reduce__(self):
+        # The client holds open connections, so only the run key is sent along if the future is pickled
+        return str, (str(self),)
+
+    @property
+    def name(self):
+        return str(self)
+
+    @property
+    def run_key(self):
+        return str(self)
+
+    def cancel(self) -> bool:
+        """Cancel the run on the cluster if it's still running. Returns whether it was. The cancellation is
+        cooperative, so the run may take a moment to stop (see ``Cluster.cancel``)."""
+        if self._status is not None:
+            return False
+        return bool(self._client.cancel(str(self)))
+
+    def cancelled(self) -> bool:
+        """Return True if the run has stopped because it was cancelled, checking with the cluster without waiting."""
+        return self.done() and self._status == "CANCELLED"
+
+    def done(self) -> bool:
+        """Return True if the run has finished, checking with the cluster without waiting."""
+        if self._status is None:
+            _poll([self], timeout=0)
+        return self._status is not None
+
+    def result(self, timeout: Optional[float] = None):
+        """Wait up to ``timeout`` seconds for the run to finish and return its result, raising the remote exception
+        if the run failed. Raises ``concurrent.futures.TimeoutError`` if the run is still going."""
+        self._wait(timeout)
+        self._fetch()
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self, timeout: Optional[float] = None):
+        """Wait up to ``timeout`` seconds for the run to finish and return the exception it raised, if any."""
+        self._wait(timeout)
+        self._fetch()
+        return self._exception
+
+    def add_done_callback(self, fn: Callable[["RemoteFuture"], None]):
+        """Call ``fn(future)`` once the run finishes, from a background thread. If the run has already finished,
+        ``fn`` is called immediately."""
+        with self._lock:
+            if self._status is None:
+                self._callbacks.append(fn)
+                _callback_watcher.watch(self)
+                return
+        self._invoke_callback(fn)
+
+    def _wait(self, timeout):
+        if self._status is None:
+            for _ in as_completed([self], timeout=timeout):
+                pass
+
+    def _fetch(self):
+        with self._lock:
+            if self._fetched:
+                return
+            if self._status == "CANCELLED":
+                self._exception = CancelledError(f"Run {self} was cancelled")
+                self._fetched = True
+                return
+            try:
+                self._result = self._client.get(str(self), default=KeyError)
+            except Exception as e:
+                self._exception = e
+            self._fetched = True
+
+    def _set_status(self, status: str):
+        with self._lock:
+            self._status = status
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            self._invoke_callback(fn)
+
+    def _invoke_callback(self, fn):
+        try:
+            fn(self)
+        except Exception as e:
+            logger.exception(f"Exception in callback for run {self}: {e}")
+
+
+def _poll(
+    futures: Iterable[RemoteFuture], timeout: Optional[float]
+) -> List[RemoteFuture]:
+    """Long-poll the clusters of the given futures, marking and returning any which finished."""
+    by_client = {}
+    for future in futures:
+        by_client.setdefault(id(future._client), []).append(future)
+
+    if len(by_client) > 1 and (timeout is None or timeout > _MULTI_CLIENT_POLL_TIMEOUT):
+        timeout = _MULTI_CLIENT_POLL_TIMEOUT
+
+    finished = []
+    for client_futures in by_client.values():
+        keys = list({str(future) for future in client_futures})
+        statuses = client_futures[0]._client.wait_for_runs(keys, timeout=timeout) or {}
+        for future in client_futures:
+            if str(future) in statuses:
+                future._set_status(statuses[str(future)])
+                finished.append(future)
+        if finished:
+            # Return as soon as we have something rather than long-polling the remaining clusters
+            break
+    return finished
+
+
+def as_completed(
+    futures: Iterable[RemoteFuture], timeout: Optional[float] = None
+) -> Iterator[RemoteFuture]:
+    """Yield the given futures as their runs finish. Raises ``concurrent.futures.TimeoutError`` if any are still
+    running after ``timeout`` seconds."""
+    deadline = None if timeout is None else time.time() + timeout
+    pending = []
+    for future in futures:
+        if future._status is not None:
+            yield future
+        else:
+            pending.append(future)
+
+    while pending:
+        remaining = None if deadline is None else max(deadline - time.time(), 0)
+        finished = _poll(pending, remaining)
+        pending = [future for future in pending if future._status is None]
+        yield from finished
+        if pending and deadline is not None and time.time() >= deadline:
+            raise TimeoutError(f"{len(pending)} futures unfinished")
+
+
+def wait(futures: Iterable[RemoteFuture], timeout: Optional[float] = None):
+    """Wait up to ``timeout`` seconds for the given futures to finish. Returns a tuple of the sets of done and
+    not done futures."""
+    futures = set(futures)
+    done = set()
+    try:
+        for future in as_completed(futures, timeout=timeout):
+            done.add(future)
+    except TimeoutError:
+        pass
+    return done, futures - done
+
+
+class _CallbackWatcher:
+    """Background thread which long-polls for the futures with pending done callbacks. All such futures share
+    the thread, so callbacks on many futures don't mean many polling loops."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._thread = None
+
+    def watch(self, future: RemoteFuture):
+        with self._lock:
+            self._pending[id(future)] = future
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                self._pending = {
+                    key: future
+                    for key, future in self._pending.items()
+                    if future._status is None
+                }
+                futures = list(self._pending.values())
+                if not futures:
+                    self._thread = None
+                    return
+            try:
+                _poll(futures, timeout=_CALLBACK_POLL_TIMEOUT)
+            except Exception as e:
+                logger.exception(f"Error polling for finished runs: {e}")
+                time.sleep(_CALLBACK_POLL_TIMEOUT)
+
+
+_callback_watcher = _CallbackWatcher()
@@ -725,6 +725,8 @@ class Cluster(Resource):
         remote=False,
         run_async=False,
         save=False,
+        timeout=None,
+        priority=None,
         **kwargs,
     ):
         """Call a method on a module that is in the cluster's object store.
@@ -736,6 +738,10 @@ class Cluster(Resource):
             run_name (str): Name for the run.
             remote (bool): Return a remote object from the function, rather than the result proper.
             run_async (bool): Run the method asynchronously and return a run_key to retreive results and logs later.
+            timeout (float, optional): Cancel the call on the cluster if it's still running after this many seconds.
+            priority (str, optional): Priority class of the call within its env, "high", "normal" (default) or "low".
+                Each class runs in its own bounded pool of workers, so e.g. a flood of "low" priority batch calls
+                doesn't hold up "high" priority interactive ones.
             *args: Positional arguments to pass to the method.
             **kwargs: Keyword arguments to pass to the method.
 
@@ -758,8 +764,24 @@ class Cluster(Resource):
             args=args,
             kwargs=kwargs,
             system=self,
+            timeout=timeout,
+            priority=priority,
         )
 
+    def cancel(self, run_key: str) -> bool:
+        """Cancel an in-flight call on the cluster by its run key. Async methods have their task cancelled and
+        generators are closed before their next item, while synchronous methods are flagged, and can check
+        :func:`rh.is_cancelled` to return early. Returns whether a running call was found.
+
+        Example:
+            >>> run_key = remote_fn.run(arg1)
+            >>> cluster.cancel(run_key)
+        """
+        self.check_server()
+        if self.on_this_cluster():
+            return obj_store.cancel_run(run_key)
+        return self.client.cancel(run_key)
+
     def is_connected(self):
         """Whether the RPC tunnel is up.
 
@@ -1,16 +1,19 @@
 import asyncio
 import copy
+import hashlib
 import importlib
 import inspect
 import logging
 import os
 import sys
-from concurrent.futures import ThreadPoolExecutor
+import threading
+import weakref
 from pathlib import Path
 from typing import Callable, List, Optional, Tuple, Type, Union
 
 from runhouse.globals import obj_store, rns_client
 from runhouse.resources.envs import _get_env_from, Env
+from runhouse.resources.futures import RemoteFuture
 from runhouse.resources.hardware import _current_cluster, _get_cluster_from, Cluster
 from runhouse.resources.packages import Package
 from runhouse.resources.resource import Resource
@@ -59,6 +62,85 @@ LOCAL_METHODS = dir(Resource) + [
 ]
 
 
+class _SignatureCache:
+    """Memoized method signatures, so dispatching attribute access on a remote Module doesn't call inspect.signature
+    or inspect.getmembers each time.
+
+    Function signatures and class member names are keyed weakly by the function or class object, so reloading a
+    module (which creates new function and class objects) invalidates them. Signatures resolved through pointers
+    (e.g. a Function's underlying fn) are keyed by the pointers and dropped when their module is reloaded.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._functions = weakref.WeakKeyDictionary()
+        self._class_members = weakref.WeakKeyDictionary()
+        self._pointers = {}
+
+    def function_signature(self, method, rich, compute):
+        func = getattr(method, "__func__", method)
+        # Only cache plain Python functions, whose signature can't change without creating a new function object
+        if not inspect.isfunction(func):
+            return compute()
+        key = (inspect.ismethod(method), rich)
+        signatures = self._functions.get(func)
+        if signatures is None:
+            with self._lock:
+                signatures = self._functions.setdefault(func, {})
+        if key not in signatures:
+            signatures[key] = compute()
+        return signatures[key]
+
+    def class_member_names(self, cls):
+        names = self._class_members.get(cls)
+        if names is None:
+            # Store only names, as the members would keep the class (and its module) alive through their globals
+            names = [
+                name
+                for (name, _) in inspect.getmembers(cls)
+                if not name[0] == "_" and name not in LOCAL_METHODS
+            ]
+            with self._lock:
+                self._class_members[cls] = names
+        return names
+
+    def pointers_signature(self, kind, pointers, compute):
+        key = (kind, tuple(pointers))
+        if key not in self._pointers:
+            signature = compute()
+            with self._lock:
+                self._pointers[key] = signature
+        return self._pointers[key]
+
+    def invalidate_module(self, module_name):
+        with self._lock:
+            self._pointers = {
+                (kind, pointers): signature
+                for (kind, pointers), signature in self._pointers.items()
+                if pointers[1] != module_name
+            }
+
+
+_signature_cache = _SignatureCache()
+
+
+def _module_source_version(module, previous=None):
+    """Return the (mtime, size, content hash) of a module's source file, or None if it has no file. The file is
+    only hashed if its mtime or size differ from those in previous."""
+    path = getattr(module, "__file__", None)
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return previous
+    if previous and previous[:2] == (stat.st_mtime_ns, stat.st_size):
+        return previous
+    with open(path, "rb") as f:
+        content_hash = hashlib.sha256(f.read()).hexdigest()
+    return stat.st_mtime_ns, stat.st_size, content_hash
+
+
 class Module(Resource):
     RESOURCE_TYPE = "module"
 
@@ -228,14 +310,19 @@ class Module(Resource):
             for name in self._extract_state()
         }
         member_attrs = {
-            name: self.method_signature(method)
-            for (name, method) in inspect.getmembers(self.__class__)
-            if not name[0] == "_" and name not in LOCAL_METHODS
+            name: self.method_signature(getattr(self.__class__, name))
+            for name in _signature_cache.class_member_names(self.__class__)
         }
         return {**var_attrs, **member_attrs}
 
     def method_signature(self, method, rich=False):
         """Extracts the properties of a method that we want to preserve when sending the method over the wire."""
+        return _signature_cache.function_signature(
+            method, rich, lambda: Module._compute_method_signature(method, rich)
+        )
+
+    @staticmethod
+    def _compute_method_signature(method, rich=False):
         if not callable(method):
             return {
                 "signature": None,
@@ -243,6 +330,9 @@ class Module(Resource):
                 "async": False,
                 "gen": False,
                 "local": False,
+                "cache": None,
+                "batch": None,
+                "single_flight": None,
             }
 
         signature = inspect.signature(method)
@@ -255,6 +345,12 @@ class Module(Resource):
             or inspect.isasyncgenfunction(method),
             "local": "local" in signature.parameters
             and signature.parameters["local"].default is True,
+            # Set by @rh.cached
+            "cache": getattr(method, "__rh_cache__", None),
+            # Set by @rh.batched
+            "batch": getattr(method, "__rh_batch__", None),
+            # Set by @rh.single_flight
+            "single_flight": getattr(method, "__rh_single_flight__", None),
         }
         if rich:
             signature_metadata["doc"] = (
@@ -340,24 +436,61 @@ class Module(Resource):
 
     @staticmethod
     def _get_obj_from_pointers(module_path, module_name, obj_name, reload=True):
-        """Helper method to load a class or function from a module path, module name, and class name."""
+        """Helper method to load a class or function from a module path, module name, and class name.
+
+        Imported modules are cached. With reload=True, a cached module is only reloaded if its source file has
+        changed since it was imported, so warm lookups (e.g. on every Function call) skip the import machinery.
+        """
+        module = obj_store.imported_modules.get(module_name)
+        if module is not None and not (
+            reload and Module._module_source_changed(module_name, module)
+        ):
+            return getattr(module, obj_name)
+
         if module_path:
             abs_path = str((Path.home() / module_path).expanduser().resolve())
-            sys.path.insert(0, abs_path)
-            logger.debug(f"Appending {module_path} to sys.path")
+            if abs_path not in sys.path:
+                sys.path.insert(0, abs_path)
+                logger.debug(f"Appending {module_path} to sys.path")
 
-        if module_name in obj_store.imported_modules and reload:
+        if module is not None:
+            _signature_cache.invalidate_module(module_name)
             importlib.invalidate_caches()
-            obj_store.imported_modules[module_name] = importlib.reload(
-                obj_store.imported_modules[module_name]
-            )
+            module = importlib.reload(module)
             logger.debug(f"Reloaded module {module_name}")
         else:
             logger.debug(f"Importing module {module_name}")
-            obj_store.imported_modules[module_name] = importlib.import_module(
-                module_name
-            )
-        return getattr(obj_store.imported_modules[module_name], obj_name)
+            module = importlib.import_module(module_name)
+        obj_store.imported_modules[module_name] = module
+        obj_store.imported_module_versions[module_name] = _module_source_version(module)
+        return getattr(module, obj_name)
+
+    @staticmethod
+    def _module_source_changed(module_name, module):
+        """Whether the module's source file has changed since we last imported it. Only a stat call unless the
+        mtime or size changed, in which case we compare content hashes, so touching a file doesn't cause a reload."""
+        previous = obj_store.imported_module_versions.get(module_name)
+        current = _module_source_version(module, previous)
+        if previous is None or current is None or current == previous:
+            return False
+        obj_store.imported_module_versions[module_name] = current
+        return current[2] != previous[2]
+
+    def _call_chunk(self, method_name, args_chunk, kwargs, return_exceptions=False):
+        """Call a method over a chunk of inputs in a loop, so mapping over many small inputs (e.g. in a Mapper)
+        takes one call per chunk rather than one per input. If ``return_exceptions``, an input which raises gets
+        its exception in place of its result rather than failing the whole chunk."""
+        method = getattr(self, method_name)
+        if not return_exceptions:
+            return [method(*args, **kwargs) for args in args_chunk]
+
+        results = []
+        for args in args_chunk:
+            try:
+                results.append(method(*args, **kwargs))
+            except Exception as e:
+                results.append(e)
+        return results
 
     def _extract_state(self):
         # Exclude anything already being sent in the config and private module attributes
@@ -532,41 +665,43 @@ class Module(Resource):
         class RemoteMethodWrapper:
             """Helper class to allow methods to be called with __call__, remote, or run."""
 
+            # So the method can be referred to on the cluster, e.g. as a step of a pipeline
+            module = self
+            method_name = item
+
             def __call__(self, *args, **kwargs):
-                # stream_logs and run_name are both supported args here, but we can't include them explicitly because
-                # the local code path here will throw an error if they are included and not supported in the
-                # method signature.
+                # stream_logs, run_name, timeout and priority are all supported args here, but we can't include them
+                # explicitly because the local code path here will throw an error if they are included and not
+                # supported in the method signature.
 
                 # Check if the method has a "local=True" arg, and check that the user didn't pass local=False instead
                 if local_default and kwargs.pop("local", True):
                     return attr(*args, **kwargs)
 
-                # If the method is a coroutine, we need to wrap it in a function so we can await it
+                # If the method is a coroutine, call it through the client's pooled async connections so it can
+                # be awaited without tying up a thread per call
                 if is_async:
-
-                    def call_wrapper():
-                        return client.call(
-                            name,
-                            item,
-                            *args,
-                            **kwargs,
-                        )
-
                     if is_gen:
 
                         async def async_gen():
-                            for res in call_wrapper():
+                            async for res in await client.call_async(
+                                name,
+                                item,
+                                *args,
+                                **kwargs,
+                            ):
                                 yield res
 
                         return async_gen()
 
-                    _executor = ThreadPoolExecutor(1)
-
-                    async def async_call():
-                        return await loop.run_in_executor(_executor, call_wrapper)
-
-                    loop = asyncio.get_event_loop()
-                    return asyncio.create_task(async_call())
+                    return asyncio.create_task(
+                        client.call_async(
+                            name,
+                            item,
+                            *args,
+                            **kwargs,
+                        )
+                    )
 
                 return client.call(
                     name,
@@ -585,13 +720,16 @@ class Module(Resource):
                 )
 
             def run(self, *args, stream_logs=False, run_name=None, **kwargs):
-                return self.__call__(
+                run_key = self.__call__(
                     *args,
                     stream_logs=stream_logs,
                     run_name=run_name,
                     run_async=True,
                     **kwargs,
                 )
+                if isinstance(run_key, str):
+                    return RemoteFuture(run_key, client)
+                return run_key
 
             def local(self, *args, **kwargs):
                 """Allows us to call a function with fn.local(*args) instead of fn(*args, local=True)"""
@@ -629,8 +767,21 @@ class Module(Resource):
         else:
             return self
 
-    def replicate(self, num_replicas=1, names=None, envs=None, parallel=True):
-        """Replicate the module on the cluster in a new env and return the new modules."""
+    def replicate(
+        self, num_replicas=1, names=None, envs=None, parallel=True, fork=False
+    ):
+        """Replicate the module on the cluster in a new env and return the new modules.
+
+        Args:
+            num_replicas (int): Number of replicas to create. (Default: 1)
+            names (Optional[List[str]]): Names for the replicas. Defaults to ``{name}_replica_{i}``.
+            envs (Optional[List]): Envs to put the replicas in. Defaults to copies of the module's env, named
+                ``{env name}_replica_{i}``.
+            parallel (bool): Whether to create the replicas in parallel. (Default: ``True``)
+            fork (bool): Fork the module's already-running env and its current state into the replicas on the
+                cluster, rather than installing each replica's env and constructing the module from its config. Much
+                faster, but the replicas always share the module's env setup. (Default: ``False``)
+        """
         if not self.system or not self.name:
             raise ValueError(
                 "Cannot replicate a module that is not on a cluster. Please send the module to a cluster first."
@@ -648,6 +799,13 @@ class Module(Resource):
                 "If names is a list, it must be the same length as num_replicas."
             )
 
+        if fork:
+            if envs:
+                raise ValueError(
+                    "Cannot pass envs when forking replicas, they are copies of the module's env."
+                )
+            return self._fork_replicas(num_replicas, names)
+
         def create_replica(i):
             name = names[i] if isinstance(names, list) else f"{self.name}_replica_{i}"
 
@@ -673,6 +831,29 @@ class Module(Resource):
 
         return [create_replica(i) for i in range(num_replicas)]
 
+    def _fork_replicas(self, num_replicas, names=None):
+        names = names or [f"{self.name}_replica_{i}" for i in range(num_replicas)]
+        env_names = [f"{self.env.name}_replica_{i}" for i in range(num_replicas)]
+        if self.system.on_this_cluster():
+            obj_store.replicate_resource(self.name, names, env_names)
+        else:
+            self.system.check_server()
+            self.system.client.replicate_resource(self.name, names, env_names)
+
+        replicas = []
+        for name, env_name in zip(names, env_names):
+            env_conf = self.env.config_for_rns
+            env_conf["name"] = env_name
+            new_config = self.config_for_rns
+            new_config["name"] = name
+            new_config.pop("env", None)
+            new_config.pop("system", None)
+            replica = Module.from_config(new_config)
+            replica.system = self.system
+            replica.env = Env.from_config(env_conf)
+            replicas.append(replica)
+        return replicas
+
     @property
     def remote(self):
         """Helper property to allow for access to remote properties, both public and private. Returning functions
@@ -800,9 +981,11 @@ class Module(Resource):
         system = super().__getattribute__("_system")
         name = super().__getattribute__("_name")
 
-        def call_wrapper():
+        async def call_wrapper():
             if not key:
-                return client.get(name, remote=remote, stream_logs=stream_logs)
+                return await client.get_async(
+                    name, remote=remote, stream_logs=stream_logs
+                )
 
             if isinstance(system, Cluster) and name and system.on_this_cluster():
                 obj_store_obj = obj_store.get(name, check_other_envs=True)
@@ -810,7 +993,9 @@ class Module(Resource):
                     return obj_store_obj.__getattribute__(key)
                 else:
                     return self.__getattribute__(key)
-            return client.call(name, key, remote=remote, stream_logs=stream_logs)
+            return await client.call_async(
+                name, key, remote=remote, stream_logs=stream_logs
+            )
 
         try:
             is_gen = (key and hasattr(self, key)) and inspect.isasyncgenfunction(
@@ -822,18 +1007,12 @@ class Module(Resource):
         if is_gen:
 
             async def async_gen():
-                for res in call_wrapper():
+                async for res in await call_wrapper():
                     yield res
 
             return async_gen()
 
-        _executor = ThreadPoolExecutor(1)
-
-        async def async_call():
-            return await loop.run_in_executor(_executor, call_wrapper)
-
-        loop = asyncio.get_event_loop()
-        return await asyncio.create_task(async_call())
+        return await call_wrapper()
 
     async def set_async(self, key: str, value):
         """Async version of property setter.
@@ -846,21 +1025,12 @@ class Module(Resource):
         if not client or not self._name:
             return super().__setattr__(key, value)
 
-        def call_wrapper():
-            return self._client().call(
-                module_name=self._name,
-                method_name=key,
-                new_value=value,
-                stream_logs=False,
-            )
-
-        _executor = ThreadPoolExecutor(1)
-
-        async def async_call():
-            return await loop.run_in_executor(_executor, call_wrapper)
-
-        loop = asyncio.get_event_loop()
-        return await asyncio.create_task(async_call())
+        return await client.call_async(
+            module_name=self._name,
+            method_name=key,
+            new_value=value,
+            stream_logs=False,
+        )
 
     def resolve(self):
         """Specify that the module should resolve to a particular state when passed into a remote method. This is
@@ -1242,3 +1412,92 @@ def module(
         pointers=cls_pointers,
         name=name,
     )
+
+
+def cached(
+    maxsize: Union[int, Callable] = 128,
+    max_bytes: Optional[int] = None,
+    ttl: Optional[float] = None,
+):
+    """Mark a pure Module method (or a function passed to :func:`function`) so that the env servlet serving it caches
+    its results by arguments. Repeat calls with the same arguments return the cached result without running the
+    method. Only calls through the cluster are cached, and each module's cache is cleared when it's replaced.
+
+    Args:
+        maxsize (int): Max number of results to cache, evicting the least recently used. (Default: 128)
+        max_bytes (Optional[int]): Max total pickled size of the cached results. Results larger than this are
+            never cached. (Default: ``None``, unbounded)
+        ttl (Optional[float]): Seconds after which a cached result expires. (Default: ``None``, never)
+
+    Example:
+        >>> class Embedder(rh.Module):
+        >>>     @rh.cached(maxsize=10000, ttl=3600)
+        >>>     def embed(self, text):
+        >>>         return self.model.encode(text)
+    """
+
+    if callable(maxsize):
+        # Used bare, as @rh.cached
+        return cached()(maxsize)
+
+    def decorator(fn):
+        fn.__rh_cache__ = {"maxsize": maxsize, "max_bytes": max_bytes, "ttl": ttl}
+        return fn
+
+    return decorator
+
+
+def batched(
+    max_batch_size: Union[int, Callable] = 32,
+    max_wait_ms: float = 10,
+):
+    """Mark a Module method (or a function passed to :func:`function`) which takes a list of inputs and returns a
+    list of their results, so that the env servlet serving it batches concurrent calls. Each call through the cluster
+    passes a single input, e.g. ``model.predict(x)``, and the servlet collects the inputs of concurrent calls into one
+    list, calls the method once with it, and returns each caller its own result. Calls made locally, rather than
+    through the cluster, call the method directly and so should pass a list.
+
+    Args:
+        max_batch_size (int): Max number of inputs to pass the method at once. (Default: 32)
+        max_wait_ms (float): Max time to wait for more calls to fill a batch after the first call arrives. Longer
+            waits give larger batches and more throughput under load, at the cost of latency. (Default: 10)
+
+    Example:
+        >>> class Model(rh.Module):
+        >>>     @rh.batched(max_batch_size=64, max_wait_ms=5)
+        >>>     def predict(self, inputs):
+        >>>         return self.model(np.stack(inputs)).tolist()
+    """
+
+    if callable(max_batch_size):
+        # Used bare, as @rh.batched
+        return batched()(max_batch_size)
+
+    def decorator(fn):
+        fn.__rh_batch__ = {"max_batch_size": max_batch_size, "max_wait_ms": max_wait_ms}
+        return fn
+
+    return decorator
+
+
+def single_flight(method: Optional[Callable] = None):
+    """Mark a Module method (or a function passed to :func:`function`) so that identical concurrent calls to it,
+    i.e. with the same arguments, share one execution. Calls arriving while the method is already running with the
+    same arguments wait for that run and all get its result, rather than running it again, which suits expensive
+    loads or warm-ups requested by many clients at once. If the method is a generator, calls which arrive partway
+    through get the items produced so far, then the rest as they're produced.
+
+    Only calls through the cluster are coalesced. If the run the calls share fails or is cancelled, so do they.
+
+    Example:
+        >>> class ConfigStore(rh.Module):
+        >>>     @rh.single_flight
+        >>>     def load(self, path):
+        >>>         return expensive_load(path)
+    """
+
+    def decorator(fn):
+        fn.__rh_single_flight__ = True
+        return fn
+
+    return decorator(method) if method else decorator
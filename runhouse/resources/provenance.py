@@ -2,6 +2,7 @@ import copy
 import json
 import logging
 import sys
+import threading
 from enum import Enum
 from io import StringIO
 from pathlib import Path
@@ -30,6 +31,30 @@ class RunStatus(str, Enum):
     ERROR = "ERROR"
 
 
+# The cancellation flag of the call running in the current thread, set by the env servlet running it
+_current_call = threading.local()
+
+
+def is_cancelled() -> bool:
+    """Whether the remote call running in this thread has been cancelled, e.g. with ``cluster.cancel(run_key)``,
+    because its ``timeout`` passed, or because the client disconnected. Long-running synchronous methods can check
+    this periodically and return early, as they can't be interrupted otherwise.
+
+    Example:
+        >>> def train(epochs):
+        >>>     for epoch in range(epochs):
+        >>>         if rh.is_cancelled():
+        >>>             return
+        >>>         train_epoch()
+    """
+    cancel_event = getattr(_current_call, "cancel_event", None)
+    return cancel_event is not None and cancel_event.is_set()
+
+
+def _set_cancel_event(cancel_event: Optional[threading.Event]):
+    _current_call.cancel_event = cancel_event
+
+
 class RunType(str, Enum):
     CMD_RUN = "CMD"
     FUNCTION_RUN = "FUNCTION"
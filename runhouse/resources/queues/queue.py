@@ -1,13 +1,241 @@
+import collections
+import logging
 import queue
-from typing import Any, List, Optional, Union
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
 
 from runhouse import Cluster, Env
 from runhouse.resources.module import Module
+from runhouse.resources.queues.spill import SpillSegments
+
+logger = logging.getLogger(__name__)
+
+
+class _QueueBuffer:
+    """The items of a Queue, in a deque. Batches are put and taken with one lock acquisition each, and gets of items
+    which are already queued don't take the lock at all (``deque.popleft`` is atomic), only falling back to waiting
+    on a condition when the buffer is empty. Kept apart from the Queue so these hot paths don't go through
+    ``Module.__getattribute__`` for each attribute access."""
+
+    def __init__(self, max_size: int = 0):
+        self.max_size = max_size
+        self.items = collections.deque()
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+        self.all_tasks_done = threading.Condition(self.lock)
+        self.unfinished_tasks = 0
+        # Threads blocked in get or put, so the other side only takes the lock to notify when someone's waiting
+        self.waiting_getters = 0
+        self.waiting_putters = 0
+        # (function, out_queue) pairs, kept here so the Queue reaches them through the same attribute lookup as data
+        self.subscribers = []
+
+    def put(self, item: Any, block=True, timeout=None) -> bool:
+        """Put a single item, returning whether it was put before the buffer filled up, if it has a ``max_size``."""
+        if self.max_size:
+            return self.put_batch([item], block, timeout) == 1
+        with self.lock:
+            self._append_one(item)
+            self.unfinished_tasks += 1
+            if self.waiting_getters:
+                self.not_empty.notify()
+        return True
+
+    def put_batch(self, items: List[Any], block=True, timeout=None) -> int:
+        """Put the items, returning how many were put before the buffer filled up, if it has a ``max_size``."""
+        with self.lock:
+            if self.max_size:
+                num_put = self._put_bounded(items, block, timeout)
+            else:
+                self._append(items)
+                num_put = len(items)
+            self.unfinished_tasks += num_put
+            if num_put and self.waiting_getters:
+                self.not_empty.notify(num_put)
+        return num_put
+
+    def _put_bounded(self, items: List[Any], block, timeout) -> int:
+        # Called with the lock held
+        deadline = None if timeout is None else time.time() + timeout
+        num_put = 0
+        # Counted as waiting before checking for space, so a get freeing space after the check still notifies us
+        self.waiting_putters += 1
+        try:
+            while num_put < len(items):
+                space = self.max_size - len(self)
+                if space > 0:
+                    chunk = items[num_put : num_put + space]
+                    self._append(chunk)
+                    num_put += len(chunk)
+                    continue
+                remaining = None if deadline is None else deadline - time.time()
+                if not block or (remaining is not None and remaining <= 0):
+                    break
+                if num_put and self.waiting_getters:
+                    # Let consumers take what's been put so far
+                    self.not_empty.notify(num_put)
+                self.not_full.wait(remaining)
+        finally:
+            self.waiting_putters -= 1
+        return num_put
+
+    def put_front(self, items: List[Any]):
+        """Put items back at the front of the buffer, ahead of those already in it, without counting them as new
+        tasks, e.g. items which were taken but not consumed."""
+        with self.lock:
+            self.items.extendleft(reversed(items))
+            if items and self.waiting_getters:
+                self.not_empty.notify(len(items))
+
+    def _append(self, items: List[Any]):
+        self.items.extend(items)
+
+    def _append_one(self, item: Any):
+        self.items.append(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def _has_items(self) -> bool:
+        return bool(self.items)
+
+    def get(self, block=True, timeout=None) -> Any:
+        try:
+            item = self.items.popleft()
+        except IndexError:
+            return self.get_batch(1, block, timeout)[0]
+        if self.waiting_putters:
+            with self.not_full:
+                self.not_full.notify()
+        return item
+
+    def get_batch(self, batch_size: int, block=True, timeout=None) -> List[Any]:
+        items = self._pop_available(batch_size)
+        if items:
+            return items
+        if not block:
+            raise queue.Empty
+
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            with self.lock:
+                self.waiting_getters += 1
+                try:
+                    while not self._has_items():
+                        remaining = None if deadline is None else deadline - time.time()
+                        if remaining is not None and remaining <= 0:
+                            raise queue.Empty
+                        self.not_empty.wait(remaining)
+                finally:
+                    self.waiting_getters -= 1
+            # Another getter may take the items before we do, in which case we wait again
+            items = self._pop_available(batch_size)
+            if items:
+                return items
+
+    def _pop_available(self, batch_size: int) -> List[Any]:
+        items = []
+        popleft = self.items.popleft
+        try:
+            while len(items) < batch_size:
+                items.append(popleft())
+        except IndexError:
+            pass
+        if items and self.waiting_putters:
+            with self.not_full:
+                self.not_full.notify(len(items))
+        return items
+
+    def task_done(self):
+        with self.lock:
+            if self.unfinished_tasks <= 0:
+                raise ValueError("task_done() called too many times")
+            self.unfinished_tasks -= 1
+            if not self.unfinished_tasks:
+                self.all_tasks_done.notify_all()
+
+    def join(self):
+        with self.lock:
+            while self.unfinished_tasks:
+                self.all_tasks_done.wait()
+
+    def usage(self) -> Dict[str, int]:
+        return {"memory_items": len(self.items), "disk_items": 0, "disk_bytes": 0}
+
+
+class _SpillingQueueBuffer(_QueueBuffer):
+    """A _QueueBuffer holding at most ``max_memory_items`` items in memory, which spills any more to append-only
+    segment files on disk until consumers catch up. Once items have spilled, later items are spilled after them
+    until the disk is drained, so items still come out in the order they were put."""
+
+    def __init__(
+        self,
+        max_size: int = 0,
+        max_memory_items: int = 0,
+        spill_dir: Optional[str] = None,
+    ):
+        super().__init__(max_size=max_size)
+        self.max_memory_items = max_memory_items
+        self.spill = SpillSegments(spill_dir)
+
+    def _append(self, items: List[Any]):
+        # Called with the lock held
+        if not self.spill.num_items:
+            space = self.max_memory_items - len(self.items)
+            if space >= len(items):
+                self.items.extend(items)
+                return
+            if space > 0:
+                self.items.extend(items[:space])
+                items = items[space:]
+            logger.debug(
+                f"Queue buffer over {self.max_memory_items} items, spilling to {self.spill.directory or 'disk'}"
+            )
+        self.spill.append(items)
+
+    def _append_one(self, item: Any):
+        # Called with the lock held
+        if self.spill.num_items or len(self.items) >= self.max_memory_items:
+            self._append([item])
+        else:
+            self.items.append(item)
+
+    def __len__(self):
+        return len(self.items) + self.spill.num_items
+
+    def _has_items(self) -> bool:
+        return bool(self.items) or bool(self.spill.num_items)
+
+    def _pop_available(self, batch_size: int) -> List[Any]:
+        items = super()._pop_available(batch_size)
+        if len(items) < batch_size and self.spill.num_items:
+            with self.lock:
+                # Items on disk all come after those in memory, so refilling never reorders them. Reads enough for
+                # the rest of this batch on top of refilling memory, as those are taken straight away.
+                space = self.max_memory_items - len(self.items)
+                self.items.extend(
+                    self.spill.read(max(space, 0) + batch_size - len(items))
+                )
+            items.extend(super()._pop_available(batch_size - len(items)))
+        return items
+
+    def usage(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "memory_items": len(self.items),
+                "disk_items": self.spill.num_items,
+                "disk_bytes": self.spill.num_bytes,
+            }
 
 
 class Queue(Module):
     RESOURCE_TYPE = "queue"
     DEFAULT_CACHE_FOLDER = ".cache/runhouse/queues"
+    # Max number of items to fetch per call when iterating over the queue, so iterating over a remote queue takes one
+    # round trip per batch of items rather than per item
+    ITER_BATCH_SIZE = 1000
 
     """Simple dict wrapper to act as a queue. Wrapping this in an actor allows us to access
     it across Ray processes and nodes, and even keep some things pinned to Python memory."""
@@ -19,62 +247,107 @@ class Queue(Module):
         env: Optional[Env] = None,
         max_size: int = 0,
         persist: bool = False,  # TODO
+        max_memory_items: int = 0,
+        spill_dir: Optional[str] = None,
         dryrun: bool = False,
         **kwargs,
     ):
         """
         Runhouse Queue object
 
+        If ``max_memory_items`` is set, the queue holds at most that many items in memory, and spills any more to
+        append-only segment files on local disk (in a temp directory under ``spill_dir``), reading them back in order
+        as consumers catch up. Spilled items are pickled with cloudpickle.
+
         .. note::
                 To build a Queue, please use the factory method :func:`queue`.
         """
         super().__init__(name=name, system=system, env=env, dryrun=dryrun, **kwargs)
         if not self._system or self._system.on_this_cluster():
-            self.data = queue.Queue(maxsize=max_size)
+            if max_memory_items:
+                self.data = _SpillingQueueBuffer(
+                    max_size=max_size,
+                    max_memory_items=max_memory_items,
+                    spill_dir=spill_dir,
+                )
+            else:
+                self.data = _QueueBuffer(max_size=max_size)
             self.persist = persist
-            self._subscribers = []
 
     def put(self, item: Any, block=True, timeout=None):
-        self.data.put(item, block=block, timeout=timeout)
-        for fn, out_queue in self._subscribers:
+        data = self.data
+        if not data.put(item, block=block, timeout=timeout):
+            raise queue.Full
+        for fn, out_queue in data.subscribers:
             res = fn(item)
             if out_queue:
                 out_queue.put(res)
 
     def put_nowait(self, item: Any):
-        self.data.put_nowait(item)
+        self.put(item, block=False)
 
     def put_batch(self, items: List[Any], block=True, timeout=None):
-        for item in items:
-            self.data.put(item, block=block, timeout=timeout)
+        """Put all the items in the queue at once. On a remote queue, this sends them all in one call. If the queue
+        has a ``max_size``, as many items are put as fit, waiting for space for the rest (up to ``timeout`` seconds
+        if ``block``), and ``queue.Full`` is raised if they don't all fit in time, after putting those which did."""
+        items = list(items)
+        data = self.data
+        num_put = data.put_batch(items, block=block, timeout=timeout)
+
+        subscribers = data.subscribers
+        if subscribers:
+            for item in items[:num_put]:
+                for fn, out_queue in subscribers:
+                    res = fn(item)
+                    if out_queue:
+                        out_queue.put(res)
+
+        if num_put < len(items):
+            raise queue.Full
 
     def get(self, block=True, timeout=None):
         return self.data.get(block=block, timeout=timeout)
 
     def get_nowait(self):
-        return self.data.get_nowait()
+        return self.get(block=False)
 
-    def get_batch(self, batch_size: int, block=True, timeout=None):
-        items = []
-        for _ in range(batch_size):
-            items.append(self.data.get(block=block, timeout=timeout))
-        return items
+    def get_batch(self, batch_size: int, block=True, timeout=None) -> List[Any]:
+        """Take up to ``batch_size`` items from the queue, returning as soon as any are available rather than waiting
+        for a full batch. On a remote queue, this fetches them all in one call. If the queue is empty, waits for an
+        item (up to ``timeout`` seconds if ``block``), raising ``queue.Empty`` if none arrives."""
+        return self.data.get_batch(batch_size, block=block, timeout=timeout)
+
+    def put_front(self, items: List[Any]):
+        """Put items back at the front of the queue, ahead of those already in it, e.g. items taken with
+        ``get_batch`` which weren't consumed. They don't count as new tasks for ``join``."""
+        self.data.put_front(list(items))
 
     def __iter__(self):
+        items = collections.deque()
         try:
             while True:
-                yield self.get()
+                items.extend(self.get_batch(self.ITER_BATCH_SIZE))
+                while items:
+                    yield items.popleft()
         except queue.Empty:
             return
+        finally:
+            if items:
+                # The consumer stopped early, so return the items fetched but not yielded to the queue
+                self.put_front(list(items))
 
     def qsize(self):
-        return self.data.qsize()
+        return len(self.data)
 
     def empty(self):
-        return self.data.empty()
+        return not self.data._has_items()
 
     def full(self):
-        return self.data.full()
+        return 0 < self.data.max_size <= len(self.data)
+
+    def usage(self) -> Dict[str, int]:
+        """The number of items the queue holds in memory and on disk, and the bytes of its spill files on disk."""
+        return self.data.usage()
 
     def task_done(self):
         return self.data.task_done()
@@ -83,4 +356,4 @@ class Queue(Module):
         return self.data.join()
 
     def subscribe(self, function, out_queue=None):
-        self._subscribers.append((function, out_queue))
+        self.data.subscribers.append((function, out_queue))
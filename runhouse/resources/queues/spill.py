@@ -0,0 +1,96 @@
+import collections
+import os
+import shutil
+import tempfile
+import weakref
+from typing import Any, List, Optional
+
+from ray import cloudpickle as pickle
+
+from runhouse.constants import QUEUE_SPILL_SEGMENT_BYTES
+
+
+class SpillSegments:
+    """Append-only segment files on local disk holding the items a queue has spilled, read back in the order they
+    were written. Each segment is deleted once all its items have been read, so the disk used tracks how far behind
+    consumers are. Not thread safe, the queue calls it with its lock held."""
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        segment_bytes: int = QUEUE_SPILL_SEGMENT_BYTES,
+    ):
+        self.parent_directory = directory
+        self.segment_bytes = segment_bytes
+        self.directory = None
+        # [path, number of unread items, size in bytes] of each segment, oldest first
+        self.segments = collections.deque()
+        self.num_items = 0
+        self.num_bytes = 0
+        self._writer = None
+        self._reader = None
+        self._next_segment = 0
+
+    def _new_segment(self):
+        if self.directory is None:
+            # Only created once the queue first spills, as most queues never do
+            if self.parent_directory:
+                os.makedirs(self.parent_directory, exist_ok=True)
+            self.directory = tempfile.mkdtemp(
+                prefix="rh-queue-", dir=self.parent_directory
+            )
+            weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+        if self._writer:
+            self._writer.close()
+        path = os.path.join(self.directory, f"{self._next_segment:08d}.seg")
+        self._next_segment += 1
+        self._writer = open(path, "wb")
+        self.segments.append([path, 0, 0])
+
+    def append(self, items: List[Any]):
+        for item in items:
+            if self._writer is None or self.segments[-1][2] >= self.segment_bytes:
+                self._new_segment()
+            data = pickle.dumps(item)
+            self._writer.write(data)
+            segment = self.segments[-1]
+            segment[1] += 1
+            segment[2] += len(data)
+            self.num_items += 1
+            self.num_bytes += len(data)
+        # So the reader sees the items, which it may read from this same segment
+        self._writer.flush()
+
+    def read(self, max_items: int) -> List[Any]:
+        items = []
+        while len(items) < max_items and self.num_items:
+            segment = self.segments[0]
+            if not segment[1]:
+                self._remove_oldest_segment()
+                continue
+            if self._reader is None:
+                self._reader = open(segment[0], "rb")
+            num_read = min(max_items - len(items), segment[1])
+            items.extend(pickle.load(self._reader) for _ in range(num_read))
+            segment[1] -= num_read
+            self.num_items -= num_read
+
+        if not self.num_items:
+            # Start over, so a queue which has caught up uses no disk
+            while self.segments:
+                self._remove_oldest_segment()
+        elif not self.segments[0][1]:
+            self._remove_oldest_segment()
+        return items
+
+    def _remove_oldest_segment(self):
+        path, _, size = self.segments.popleft()
+        if self._reader:
+            self._reader.close()
+            self._reader = None
+        if not self.segments and self._writer:
+            self._writer.close()
+            self._writer = None
+        os.remove(path)
+        self.num_bytes -= size
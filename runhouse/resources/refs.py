@@ -0,0 +1,56 @@
+from typing import Union
+
+from runhouse.resources.resource import Resource
+
+
+class Ref:
+    """Reference to an object in a cluster's object store, to pass as an argument to a method call on the same
+    cluster. The env servlet running the call swaps the ref for the object itself, taken from its own object store
+    or from the env which holds it, so the object is never sent through the client.
+
+    .. note::
+            To create a Ref, please use the factory method :func:`ref`.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+
+    def __repr__(self):
+        return f"Ref({self.key!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, Ref) and other.key == self.key
+
+    def __hash__(self):
+        return hash((Ref, self.key))
+
+
+def ref(obj: Union[str, Resource]) -> Ref:
+    """Reference an object on the cluster by its key, to pass it to another call on the cluster without fetching it
+    and uploading it again. Takes the key itself, the result handle of a ``.remote()`` call, the future returned by
+    ``.run()``, or any other resource in the cluster's object store.
+
+    Args:
+        obj (str or Resource): Key of the object, or a resource whose name is its key.
+
+    Returns:
+        Ref: The reference, which resolves to the object when the call runs. The result handles of ``.remote()``
+        calls resolve to the result itself. A ref to a ``.run()`` which hasn't finished waits for it, and one to a
+        run which failed or was cancelled raises an error in the call.
+
+    Example:
+        >>> dataset = preprocess.remote(raw_path)
+        >>> train(rh.ref(dataset), epochs=3)
+        >>>
+        >>> train(rh.ref("my_dataset_key"), epochs=3)
+    """
+    if isinstance(obj, Ref):
+        return obj
+    if isinstance(obj, Resource):
+        if not obj.name:
+            raise ValueError("Can only reference a resource with a name")
+        return Ref(obj.name)
+    if isinstance(obj, str):
+        # Includes RemoteFutures, which are the run key
+        return Ref(str(obj))
+    raise TypeError(f"Can't reference an object of type {type(obj)}, pass its key")
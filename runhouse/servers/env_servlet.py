@@ -1,25 +1,56 @@
 import asyncio
+import copy
+import hashlib
 import inspect
 import json
 import logging
+import multiprocessing
+import queue
+import sys
 import threading
 import time
 import traceback
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, TimeoutError
 from functools import wraps
-from typing import Any, Optional
-
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Dict, List, Optional
+
+import ray
+from ray import cloudpickle as pickle
+
+from runhouse.constants import (
+    ARG_CACHE_MAX_BYTES,
+    ARG_CACHE_MAX_ENTRIES,
+    DEFAULT_CALL_PRIORITY,
+    MAX_EARLY_CANCELS,
+    PROCESS_POOL_SHM_THRESHOLD,
+    RESULT_QUEUE_MAX_MEMORY_ITEMS,
+    STREAM_FRAME_MAX_BYTES,
+    STREAM_FRAME_MAX_ITEMS,
+    STREAM_FRAME_MAX_WAIT,
+)
 from runhouse.globals import obj_store
 
 from runhouse.resources.blobs import blob, Blob
+from runhouse.resources.envs import Env
 from runhouse.resources.module import Module
-from runhouse.resources.provenance import run, RunStatus
+from runhouse.resources.provenance import (
+    _set_cancel_event,
+    is_cancelled,
+    run,
+    RunStatus,
+)
 from runhouse.resources.queues import Queue
+from runhouse.resources.refs import Ref
 from runhouse.resources.resource import Resource
 from runhouse.rns.utils.api import ResourceVisibility
 
 # from runhouse.rns.utils.names import _generate_default_name
 from runhouse.servers.http.http_utils import (
+    ArgCacheMiss,
     b64_unpickle,
+    CachedArg,
     deserialize_data,
     handle_exception_response,
     Message,
@@ -72,9 +103,481 @@ def error_handling_decorator(func):
     return wrapper
 
 
+# Modules served by the env's process pools, by name, in the pools' worker processes. Each worker loads the module once
+# when it starts, rather than with each call.
+_worker_modules = {}
+
+
+def _init_worker(module_name, module_data):
+    _worker_modules[module_name] = pickle.loads(module_data)
+
+
+def _worker_pool(module_name: str, module: Any, procs: int) -> ProcessPoolExecutor:
+    """A pool of ``procs`` worker processes to call the module's methods in. The workers are started by a fork server
+    rather than forked from the servlet, as it runs Ray's and its event loop's threads, and a child forked from it
+    could deadlock on a lock one of them held at the fork. The module is pickled once here, and loaded by each worker
+    as it starts."""
+    context = multiprocessing.get_context("forkserver")
+    # The fork server is a fresh, single-threaded process, which imports this module once rather than each worker
+    context.set_forkserver_preload([__name__])
+    return ProcessPoolExecutor(
+        max_workers=procs,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(module_name, pickle.dumps(module)),
+    )
+
+
+def _call_in_worker(module_name, method_name, args, kwargs):
+    """Call the method in one of the servlet's worker processes. Large results are passed back through shared
+    memory rather than the pool's pipe, and read by :func:`_load_worker_result`."""
+    result = getattr(_worker_modules[module_name], method_name)(*args, **kwargs)
+    if inspect.isgenerator(result) or inspect.isasyncgen(result):
+        raise TypeError(
+            f"Method {method_name} returned a generator, which can't be streamed back from a worker process. "
+            "Run it in an env without procs instead."
+        )
+    data = pickle.dumps(result, protocol=5)
+    if len(data) < PROCESS_POOL_SHM_THRESHOLD:
+        return data, None
+
+    shm = shared_memory.SharedMemory(create=True, size=len(data))
+    shm.buf[: len(data)] = data
+    # The servlet unlinks the block once it's read it, so this process's resource tracker shouldn't clean it up
+    resource_tracker.unregister(shm._name, "shared_memory")
+    shm.close()
+    return len(data), shm.name
+
+
+def _wait_for_worker_result(future: Future, cancel_event: threading.Event):
+    """Wait for the result of a call submitted to a worker process, raising ``CancelledError`` if ``cancel_event``
+    is set first (by cancel or the call's timeout). A call still queued for a worker is dropped, but one already
+    running in a worker can't be interrupted without breaking the pool, so it's left to finish and its result
+    discarded."""
+    while True:
+        try:
+            return _load_worker_result(
+                *future.result(timeout=EventLoopThread.CANCEL_CHECK_INTERVAL)
+            )
+        except TimeoutError:
+            if cancel_event.is_set():
+                if not future.cancel():
+                    future.add_done_callback(_discard_worker_result)
+                raise CancelledError()
+
+
+def _discard_worker_result(future: Future):
+    # Still loaded, so any shared memory block holding it is unlinked
+    if not future.cancelled() and future.exception() is None:
+        _load_worker_result(*future.result())
+
+
+def _load_worker_result(data, shm_name):
+    if shm_name is None:
+        return pickle.loads(data)
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        buf = shm.buf[:data]
+        try:
+            return pickle.loads(buf)
+        finally:
+            buf.release()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _resolve_arg(arg, arg_cache: Optional["ResultCache"] = None):
+    """Swap a Ref for the object it points to, a CachedArg for the argument from the env's argument cache, and a
+    module marked with ``.resolve()`` for its resolved state."""
+    if isinstance(arg, CachedArg):
+        value = arg_cache.get(arg.digest) if arg_cache else ResultCache.MISS
+        if value is ResultCache.MISS:
+            raise ArgCacheMiss(arg.digest)
+        return value
+    if isinstance(arg, Ref):
+        return _resolve_ref(arg)
+    if isinstance(arg, Module) and arg._resolve:
+        return arg.fetch()
+    return arg
+
+
+def _resolve_ref(ref: Ref):
+    """The object a Ref points to. A ref to a run which hasn't finished waits for it (or for the call resolving it
+    to be cancelled), and one to a run which failed or was cancelled raises, rather than resolving to the queue
+    the run keeps its results in."""
+    while True:
+        obj = obj_store.get(ref.key, default=KeyError)
+        provenance = (
+            getattr(obj, "provenance", None) if isinstance(obj, Queue) else None
+        )
+        status = provenance.status if provenance else None
+        if status == RunStatus.ERROR:
+            error = provenance.error
+            raise RuntimeError(f"Referenced run {ref.key} failed with {error!r}") from (
+                error if isinstance(error, BaseException) else None
+            )
+        if status == RunStatus.CANCELLED:
+            raise RuntimeError(f"Referenced run {ref.key} was cancelled")
+        if status not in [RunStatus.NOT_STARTED, RunStatus.RUNNING]:
+            break
+        if is_cancelled():
+            raise CancelledError()
+        time.sleep(0.1)
+
+    # The results of remote calls are stored wrapped in a blob
+    return obj.data if type(obj) is Blob else obj
+
+
+class ResultCache:
+    """LRU cache of a method's results by arguments, for methods marked with ``@rh.cached``, also used for each env's
+    cache of large call arguments. Values are stored pickled, so their size can be accounted for and each hit returns
+    a fresh copy."""
+
+    MISS = object()
+
+    def __init__(
+        self,
+        maxsize: int = 128,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(args, kwargs) -> Optional[str]:
+        """Stable hash of the pickled arguments, or None if they can't be pickled."""
+        try:
+            return hashlib.sha256(
+                pickle.dumps((list(args), sorted(kwargs.items())))
+            ).hexdigest()
+        except Exception:
+            return None
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.time() > entry[1]:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return self.MISS
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return pickle.loads(entry[0])
+
+    def contains(self, key: str) -> bool:
+        """Whether the key is cached, marking it as recently used if so, without counting a hit or miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (self.ttl and time.time() > entry[1]):
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+    def put(self, key: str, result: Any):
+        try:
+            data = pickle.dumps(result)
+        except Exception as e:
+            logger.debug(f"Not caching unpicklable result: {e}")
+            return
+        self.put_pickled(key, data)
+
+    def put_pickled(self, key: str, data: bytes):
+        if self.max_bytes and len(data) > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            expires = time.time() + self.ttl if self.ttl else None
+            self._entries[key] = (data, expires)
+            self._bytes += len(data)
+            while len(self._entries) > self.maxsize or (
+                self.max_bytes and self._bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        data, _ = self._entries.pop(key)
+        self._bytes -= len(data)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+class CallBatcher:
+    """Collects concurrent calls to a method marked with ``@rh.batched`` into batches, calling the method once per
+    batch with the list of the calls' inputs from a single dispatcher thread, and returning each call its own result.
+    A batch is dispatched once it's full, or ``max_wait_ms`` after its first call arrived. Calls arriving while a
+    batch runs queue up for the next one, so batches grow with load."""
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        method: Callable,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 10,
+        run_coroutine: Optional[Callable] = None,
+    ):
+        self.method = method
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.run_coroutine = run_coroutine
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def call(self, item: Any, cancel_event: Optional[threading.Event] = None):
+        """Submit the input and block until its batch has run, returning its result."""
+        future = self.submit(item)
+        while True:
+            try:
+                return future.result(timeout=0.1)
+            except TimeoutError:
+                if cancel_event is not None and cancel_event.is_set():
+                    # Only drops it if its batch hasn't started yet
+                    future.cancel()
+                    raise CancelledError()
+
+    def stop(self):
+        self._queue.put(self._STOP)
+
+    def _next_batch(self) -> Optional[List]:
+        first = self._queue.get()
+        if first is self._STOP:
+            return None
+        batch = [first]
+        deadline = time.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                entry = self._queue.get(timeout=max(deadline - time.time(), 0))
+            except queue.Empty:
+                break
+            if entry is self._STOP:
+                # Run what we have, then stop
+                self._queue.put(entry)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            batch = [
+                (item, future)
+                for item, future in batch
+                if future.set_running_or_notify_cancel()
+            ]
+            if batch:
+                self._run_batch(batch)
+
+    def _run_batch(self, batch: List):
+        try:
+            results = self.method([item for item, _ in batch])
+            if inspect.iscoroutine(results):
+                results = self.run_coroutine(results)
+            results = list(results)
+            if len(results) != len(batch):
+                raise ValueError(
+                    f"Batched method {self.method.__name__} returned {len(results)} results for {len(batch)} inputs"
+                )
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+class SingleFlight:
+    """One run of a method marked with ``@rh.single_flight``, which identical calls arriving while it runs attach to
+    rather than running the method again. If the method is a generator, its items are kept until it finishes, so calls
+    attaching partway through still get all of them."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._started = False
+        self._done = False
+        self._is_stream = False
+        self._result = None
+        self._exception = None
+        self._items = []
+
+    def start(self, result):
+        """Share the result of the run with the attached calls. If it's a generator, returns a generator over the
+        same items, for the running call to consume in its place."""
+        if inspect.isgenerator(result) or inspect.isasyncgen(result):
+            with self._cond:
+                self._started = True
+                self._is_stream = True
+                self._cond.notify_all()
+            return (
+                self._async_tee(result)
+                if inspect.isasyncgen(result)
+                else self._tee(result)
+            )
+
+        with self._cond:
+            self._result = result
+            self._started = True
+            self._done = True
+            self._cond.notify_all()
+        return result
+
+    def fail(self, e: BaseException):
+        """End the run with an exception, unless it's already finished."""
+        if isinstance(e, GeneratorExit):
+            # The running call stopped consuming the generator early, i.e. it was cancelled
+            e = CancelledError()
+        with self._cond:
+            if self._done:
+                return
+            self._exception = e
+            self._done = True
+            self._cond.notify_all()
+
+    def result(self, cancel_event: Optional[threading.Event] = None):
+        """Wait for the run to return and return its result, or a generator over its items if it's a generator."""
+        with self._cond:
+            while not self._started and self._exception is None:
+                self._wait(cancel_event)
+            if self._is_stream:
+                return self._iter_items(cancel_event)
+            if self._exception is not None:
+                raise self._exception
+            return self._result
+
+    def _wait(self, cancel_event: Optional[threading.Event]):
+        self._cond.wait(timeout=0.1)
+        if cancel_event is not None and cancel_event.is_set():
+            raise CancelledError()
+
+    def _add(self, item):
+        with self._cond:
+            self._items.append(item)
+            self._cond.notify_all()
+
+    def _finish(self):
+        with self._cond:
+            self._done = True
+            self._cond.notify_all()
+
+    def _tee(self, gen):
+        try:
+            for item in gen:
+                self._add(item)
+                yield item
+        except BaseException as e:
+            self.fail(e)
+            raise
+        self._finish()
+
+    async def _async_tee(self, gen):
+        try:
+            async for item in gen:
+                self._add(item)
+                yield item
+        except BaseException as e:
+            self.fail(e)
+            raise
+        self._finish()
+
+    def _iter_items(self, cancel_event: Optional[threading.Event]):
+        i = 0
+        while True:
+            with self._cond:
+                while i >= len(self._items) and not self._done:
+                    self._wait(cancel_event)
+                items = self._items[i:]
+                done, exception = self._done, self._exception
+            i += len(items)
+            yield from items
+            if done:
+                if exception is not None:
+                    raise exception
+                return
+
+
+class EventLoopThread:
+    """A long-lived event loop running in a daemon thread. The servlet runs all the coroutines and async generators
+    of the methods it calls on it, so they run concurrently with each other, and can share loop-bound resources
+    (e.g. aiohttp sessions or async DB pools) across calls, rather than getting a new event loop each time."""
+
+    def __init__(self, name: str = "event_loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self.loop.run_forever, name=name, daemon=True
+        )
+        self._thread.start()
+
+    # How often a thread waiting on a coroutine checks whether it's been cancelled
+    CANCEL_CHECK_INTERVAL = 0.05
+
+    def run(self, coro, cancel_event: Optional[threading.Event] = None):
+        """Run the coroutine on the loop, blocking the calling thread until it returns. If ``cancel_event`` is set
+        first, the coroutine's task is cancelled and ``CancelledError`` is raised."""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        if cancel_event is None:
+            return future.result()
+
+        while True:
+            try:
+                return future.result(timeout=self.CANCEL_CHECK_INTERVAL)
+            except TimeoutError:
+                if cancel_event.is_set():
+                    future.cancel()
+                    raise CancelledError()
+
+    def drain(
+        self, async_gen, callback, cancel_event: Optional[threading.Event] = None
+    ):
+        """Iterate over the async generator on the loop, calling ``callback`` with each item, and block the calling
+        thread until it's exhausted (or ``cancel_event`` is set, as in :func:`run`)."""
+
+        async def _drain():
+            async for item in async_gen:
+                callback(item)
+
+        self.run(_drain(), cancel_event)
+
+
+def call_concurrency_group(priority: Optional[str] = None) -> str:
+    """The Ray concurrency group of the EnvServlet which calls with the given priority run in. Callers pick it with
+    ``.options(concurrency_group=...)``, so the call queues for a thread of its priority before it takes one."""
+    return f"call_{priority or DEFAULT_CALL_PRIORITY}"
+
+
 class EnvServlet:
     def __init__(self, env_name: str, *args, **kwargs):
         self.env_name = env_name
+        self.event_loop = EventLoopThread(name=f"{env_name}_event_loop")
 
         obj_store.initialize(
             self.env_name,
@@ -84,6 +587,22 @@ class EnvServlet:
 
         self.output_types = {}
         self.thread_ids = {}
+        self.cancel_events = {}
+        # Keys of calls cancelled before they reached the servlet, e.g. while queued for a thread of their priority's
+        # concurrency group, oldest first so those which never arrive are eventually forgotten
+        self.early_cancels = OrderedDict()
+        self._early_cancels_lock = threading.Lock()
+        self.process_pools = {}
+        self._process_pools_lock = threading.Lock()
+        self.result_caches = {}
+        self._result_caches_lock = threading.Lock()
+        self.batchers = {}
+        self._batchers_lock = threading.Lock()
+        self.flights = {}
+        self._flights_lock = threading.Lock()
+        self.arg_cache = ResultCache(
+            maxsize=ARG_CACHE_MAX_ENTRIES, max_bytes=ARG_CACHE_MAX_BYTES
+        )
 
     @staticmethod
     def register_activity():
@@ -94,6 +613,7 @@ class EnvServlet:
         except ImportError:
             pass
 
+    @ray.method(concurrency_group=call_concurrency_group(DEFAULT_CALL_PRIORITY))
     def call_module_method(
         self,
         module_name,
@@ -105,6 +625,8 @@ class EnvServlet:
     ):
         self.register_activity()
         result_resource = None
+        deadline_timer = None
+        flight_key, flight, leads_flight = None, None, False
 
         persist = message.save or message.remote or message.run_async
         try:
@@ -112,7 +634,13 @@ class EnvServlet:
                 f"Message received from client to call method {method_name} on module {module_name} at {time.time()}"
             )
 
-            result_resource = Queue(name=message.key, persist=persist)
+            # If the method is a generator whose results are streamed more slowly than it yields them, the results
+            # beyond RESULT_QUEUE_MAX_MEMORY_ITEMS are spilled to disk rather than held in the servlet's memory
+            result_resource = Queue(
+                name=message.key,
+                persist=persist,
+                max_memory_items=RESULT_QUEUE_MAX_MEMORY_ITEMS,
+            )
             result_resource.provenance = run(
                 name=message.key,
                 log_dest="file" if message.stream_logs else None,
@@ -120,6 +648,19 @@ class EnvServlet:
             )
             result_resource.provenance.__enter__()
 
+            # Set by cancel, or once the call's timeout passes. Checked between the items of generators, used to
+            # cancel the task of coroutines, and visible to synchronous code via rh.is_cancelled().
+            cancel_event = self.cancel_events.setdefault(message.key, threading.Event())
+            _set_cancel_event(cancel_event)
+            timeout = getattr(message, "timeout", None)
+            if timeout:
+                deadline_timer = threading.Timer(timeout, cancel_event.set)
+                deadline_timer.daemon = True
+                deadline_timer.start()
+            if cancel_event.is_set():
+                # Cancelled while queued for a thread
+                raise CancelledError()
+
             module = obj_store.get(module_name, default=KeyError)
             if den_auth:
                 if not isinstance(module, Resource) or module.visibility not in [
@@ -180,15 +721,9 @@ class EnvServlet:
                 if serialization == "json"
                 else ([], {})
             )
-            # Resolve any resources which need to be resolved
-            args = [
-                arg.fetch() if (isinstance(arg, Module) and arg._resolve) else arg
-                for arg in args
-            ]
-            kwargs = {
-                k: v.fetch() if (isinstance(v, Module) and v._resolve) else v
-                for k, v in kwargs.items()
-            }
+            # Resolve any refs and resources which need to be resolved
+            args = [_resolve_arg(arg, self.arg_cache) for arg in args]
+            kwargs = {k: _resolve_arg(v, self.arg_cache) for k, v in kwargs.items()}
 
             if not callable_method and kwargs and "new_value" in kwargs:
                 # If new_value was passed, that means we're setting a property
@@ -201,20 +736,83 @@ class EnvServlet:
             if persist or message.stream_logs:
                 result_resource.pin()
 
+            # Plain synchronous methods run in the env's worker processes, if it has them
+            process_pool = (
+                self.process_pool(module_name, module)
+                if callable_method
+                and not inspect.iscoroutinefunction(method)
+                and not inspect.isgeneratorfunction(method)
+                and not inspect.isasyncgenfunction(method)
+                else None
+            )
+
+            # Methods marked with @rh.cached return the cached result for repeat arguments without running
+            result_cache = (
+                self.result_cache(module_name, method_name, module, method)
+                if callable_method
+                else None
+            )
+            cache_key = ResultCache.key(args, kwargs) if result_cache else None
+            result = result_cache.get(cache_key) if cache_key else ResultCache.MISS
+
             # If method is a property, `method = getattr(module, method_name, None)` above already
             # got our result
-            if inspect.iscoroutinefunction(method):
+            # Identical concurrent calls to methods marked with @rh.single_flight attach to the one already running
+            if callable_method and result is ResultCache.MISS:
+                flight_key, flight, leads_flight = self.join_flight(
+                    module_name, method_name, module, method, args, kwargs
+                )
+
+            # Methods marked with @rh.batched are called with the inputs of concurrent calls together
+            batcher = (
+                self.batcher(module_name, method_name, module, method)
+                if callable_method and result is ResultCache.MISS
+                else None
+            )
+
+            if result is not ResultCache.MISS:
+                logger.debug(
+                    f"{self.env_name} servlet: Returning cached result of {method_name} on module {module_name}"
+                )
+                cache_key = None
+            elif flight and not leads_flight:
+                logger.debug(
+                    f"{self.env_name} servlet: Attaching to the running call of {method_name} on module {module_name}"
+                )
+                # Only the call running the method caches its result
+                cache_key = None
+                result = flight.result(cancel_event)
+            elif batcher:
+                if len(args) != 1 or kwargs:
+                    raise TypeError(
+                        f"Batched method {method_name} takes a single input per call"
+                    )
+                result = batcher.call(args[0], cancel_event)
+            elif inspect.iscoroutinefunction(method):
                 # If method is a coroutine, we need to await it
                 logger.debug(
                     f"{self.env_name} servlet: Method {method_name} on module {module_name} is a coroutine"
                 )
-                result = asyncio.run(method(*args, **kwargs))
+                result = self.event_loop.run(method(*args, **kwargs), cancel_event)
+            elif process_pool:
+                logger.debug(
+                    f"{self.env_name} servlet: Calling method {method_name} on module {module_name} in a worker process"
+                )
+                result = _wait_for_worker_result(
+                    process_pool.submit(
+                        _call_in_worker, module_name, method_name, args, kwargs
+                    ),
+                    cancel_event,
+                )
             else:
                 result = method(*args, **kwargs) if callable_method else method
 
             # TODO do we need the branch above if we do this?
             if inspect.iscoroutine(result):
-                result = asyncio.run(result)
+                result = self.event_loop.run(result, cancel_event)
+
+            if leads_flight:
+                result = flight.start(result)
 
             if inspect.isgenerator(result) or inspect.isasyncgen(result):
                 result_resource.pin()
@@ -224,17 +822,21 @@ class EnvServlet:
                 )
                 self.output_types[message.key] = OutputType.RESULT_STREAM
                 if inspect.isasyncgen(result):
-                    while True:
-                        try:
-                            self.register_activity()
-                            result_resource.put(asyncio.run(result.__anext__()))
-                        except StopAsyncIteration:
-                            break
+
+                    def put(val):
+                        self.register_activity()
+                        result_resource.put(val)
+
+                    # Iterate the whole generator on the servlet's loop, rather than hopping to it for each item
+                    self.event_loop.drain(result, put, cancel_event)
                 else:
                     for val in result:
                         self.register_activity()
                         # Doing this at the top of the loop so we can catch the final result and change the OutputType
                         result_resource.put(val)
+                        if cancel_event.is_set():
+                            result.close()
+                            raise CancelledError()
 
                 # Set run status to COMPLETED to indicate end of stream
                 result_resource.provenance.__exit__(None, None, None)
@@ -243,6 +845,13 @@ class EnvServlet:
                 if message.save:
                     result_resource.save()
             else:
+                if cancel_event.is_set():
+                    # The method didn't check rh.is_cancelled(), but the caller has given up on the result anyway
+                    raise CancelledError()
+
+                if cache_key:
+                    result_cache.put(cache_key, result)
+
                 # If the user needs this result again later, don't put it in queue or
                 # it will be gone after the first get
                 if persist:
@@ -284,9 +893,25 @@ class EnvServlet:
                 if message.save:
                     result_resource.save()
                 self.register_activity()
+        except CancelledError as e:
+            logger.info(f"Call {message.key} was cancelled")
+            self.register_activity()
+            if leads_flight:
+                flight.fail(e)
+
+            # If the call was a generator, keep the stream output type so the results it already produced can still
+            # be retrieved, followed by the cancellation
+            if not self.output_types.get(message.key) == OutputType.RESULT_STREAM:
+                self.output_types[message.key] = OutputType.CANCELLED
+            result_resource.pin()
+            result_resource.provenance.__exit__(None, None, None)
+            result_resource.provenance.status = RunStatus.CANCELLED
+            return Response(output_type=OutputType.CANCELLED)
         except Exception as e:
             logger.exception(e)
             self.register_activity()
+            if leads_flight:
+                flight.fail(e)
 
             # Setting this here is great because it allows us to still return all the computed values of a
             # generator before hitting the exception, stream the logs back to the client until raising the exception,
@@ -296,7 +921,186 @@ class EnvServlet:
             result_resource.provenance.__exit__(
                 type(e), e, traceback.format_exc()
             )  # TODO use format_tb instead?
+        finally:
+            if deadline_timer:
+                deadline_timer.cancel()
+            if leads_flight:
+                with self._flights_lock:
+                    self.flights.pop(flight_key, None)
+            self.cancel_events.pop(message.key, None)
+            self.early_cancels.pop(message.key, None)
+            _set_cancel_event(None)
+
+    def process_pool(
+        self, module_name: str, module: Any
+    ) -> Optional[ProcessPoolExecutor]:
+        """The pool of worker processes which runs calls to the module, if the env was created with ``procs``.
+        Each worker loads its own copy of the module when it starts (see :func:`_worker_pool`), and the pool is
+        replaced if the module is. Changes the workers make to the module's state aren't seen by the servlet or each
+        other."""
+        env = obj_store.get_local(self.env_name)
+        procs = getattr(env, "procs", None)
+        if not procs:
+            return None
+
+        with self._process_pools_lock:
+            pool_module, pool = self.process_pools.get(module_name, (None, None))
+            if pool_module is not module:
+                if pool is not None:
+                    pool.shutdown(wait=False)
+                pool = _worker_pool(module_name, module, procs)
+                self.process_pools[module_name] = (module, pool)
+            return pool
+
+    def join_flight(
+        self,
+        module_name: str,
+        method_name: str,
+        module: Any,
+        method: Any,
+        args: List,
+        kwargs: Dict,
+    ):
+        """If the method is marked with ``@rh.single_flight``, return the key of the call, the run of the method with
+        the same arguments to attach to, and whether this call is the one to run it (if none was running yet).
+        Otherwise returns (None, None, False)."""
+        single_flight = (
+            module.method_signature(method).get("single_flight")
+            if isinstance(module, Module)
+            else getattr(method, "__rh_single_flight__", None)
+        )
+        args_key = ResultCache.key(args, kwargs) if single_flight else None
+        if not args_key:
+            return None, None, False
+
+        key = (module_name, method_name, args_key)
+        with self._flights_lock:
+            flight = self.flights.get(key)
+            if flight is not None:
+                return key, flight, False
+            flight = self.flights[key] = SingleFlight()
+            return key, flight, True
+
+    def batcher(
+        self, module_name: str, method_name: str, module: Any, method: Any
+    ) -> Optional[CallBatcher]:
+        """The batcher of the method's calls, if it's marked with ``@rh.batched``. It's replaced along with the
+        module."""
+        batch_config = (
+            module.method_signature(method).get("batch")
+            if isinstance(module, Module)
+            else getattr(method, "__rh_batch__", None)
+        )
+        if not batch_config:
+            return None
+
+        with self._batchers_lock:
+            batcher_module, batcher = self.batchers.get(
+                (module_name, method_name), (None, None)
+            )
+            if batcher_module is not module:
+                if batcher is not None:
+                    batcher.stop()
+                batcher = CallBatcher(
+                    method, run_coroutine=self.event_loop.run, **batch_config
+                )
+                self.batchers[(module_name, method_name)] = (module, batcher)
+            return batcher
+
+    def result_cache(
+        self, module_name: str, method_name: str, module: Any, method: Any
+    ) -> Optional[ResultCache]:
+        """The cache of the method's results, if it's marked with ``@rh.cached``. It's replaced along with the
+        module."""
+        cache_config = (
+            module.method_signature(method).get("cache")
+            if isinstance(module, Module)
+            else getattr(method, "__rh_cache__", None)
+        )
+        if not cache_config:
+            return None
 
+        with self._result_caches_lock:
+            cache_module, cache = self.result_caches.get(
+                (module_name, method_name), (None, None)
+            )
+            if cache_module is not module:
+                cache = ResultCache(**cache_config)
+                self.result_caches[(module_name, method_name)] = (module, cache)
+            return cache
+
+    @ray.method(concurrency_group="control")
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Hits, misses, evictions and size of the result cache of each ``@rh.cached`` method in this env, and of
+        its cache of large call arguments (under "call_args") if it's been used."""
+        stats = {
+            f"{module_name}.{method_name}": cache.stats()
+            for (module_name, method_name), (_, cache) in self.result_caches.items()
+        }
+        arg_stats = self.arg_cache.stats()
+        if arg_stats["entries"] or arg_stats["hits"] or arg_stats["misses"]:
+            stats["call_args"] = arg_stats
+        return stats
+
+    @ray.method(concurrency_group="control")
+    def missing_args(self, digests: List[str]) -> List[str]:
+        """Of the given digests of call arguments, return those not in the env's argument cache. Those which are
+        cached are marked as recently used, so they aren't evicted before the call using them arrives."""
+        return [digest for digest in digests if not self.arg_cache.contains(digest)]
+
+    @ray.method(concurrency_group="control")
+    def put_arg(self, digest: str, chunk_refs: List[ray.ObjectRef]):
+        """Add the pickled call argument uploaded in the given chunks to the env's argument cache."""
+        data = b"".join(ray.get(chunk_refs))
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Uploaded argument does not match its digest {digest}")
+        self.arg_cache.put_pickled(digest, data)
+
+    @ray.method(concurrency_group="control")
+    def cancel(self, key: str) -> bool:
+        """Cancel the in-flight call with the given run key, if it's running in this env. Returns whether it was.
+        If it isn't, it may still be queued for a thread, so it's remembered and cancelled as soon as it starts."""
+        cancel_event = self.cancel_events.get(key)
+        if cancel_event is None:
+            with self._early_cancels_lock:
+                cancel_event = self.cancel_events.setdefault(key, threading.Event())
+                cancel_event.set()
+                self.early_cancels[key] = None
+                while len(self.early_cancels) > MAX_EARLY_CANCELS:
+                    forgotten, _ = self.early_cancels.popitem(last=False)
+                    self.cancel_events.pop(forgotten, None)
+            return False
+        logger.info(f"Cancelling call {key}")
+        cancel_event.set()
+        return True
+
+    @ray.method(concurrency_group="control")
+    def run_statuses(self, keys):
+        """Return the RunStatus of each of the given run keys which has finished in this env. Keys which are still
+        running, or which were not run in this env, are omitted."""
+        statuses = {}
+        for key in keys:
+            output_type = self.output_types.get(key)
+            if output_type is None:
+                continue
+            if output_type == OutputType.EXCEPTION:
+                statuses[key] = RunStatus.ERROR.value
+            elif output_type == OutputType.CANCELLED:
+                statuses[key] = RunStatus.CANCELLED.value
+            elif output_type == OutputType.RESULT_STREAM:
+                # Generators set their output type as soon as they start streaming, so check the run itself
+                result_resource = obj_store.get_local(key)
+                provenance = getattr(result_resource, "provenance", None)
+                if provenance and provenance.status in [
+                    RunStatus.COMPLETED,
+                    RunStatus.CANCELLED,
+                ]:
+                    statuses[key] = provenance.status.value
+            else:
+                statuses[key] = RunStatus.COMPLETED.value
+        return statuses
+
+    @ray.method(concurrency_group="results")
     def get(
         self,
         key,
@@ -387,6 +1191,16 @@ class EnvServlet:
                 # There's no OutputType.EXCEPTION case to handle here, because if an exception were thrown the
                 # provenance.status would be RunStatus.ERROR, and we want to continue retrieving results until the
                 # queue is empty, and then will return the exception and traceback in the empty case above.
+                if (
+                    self.output_types[key] == OutputType.RESULT_STREAM
+                    and not serialization == "json"
+                ):
+                    frame = self._stream_frame(ret_obj, res)
+                    if len(frame) > 1:
+                        return Response(
+                            data=pickle_b64(frame),
+                            output_type=OutputType.RESULT_STREAM_BATCH,
+                        )
                 return Response(
                     data=pickle_b64(res) if not serialization == "json" else res,
                     output_type=self.output_types[key],
@@ -471,6 +1285,32 @@ class EnvServlet:
                 output_type=OutputType.EXCEPTION,
             )
 
+    @staticmethod
+    def _stream_frame(result_queue: Queue, first_item: Any):
+        """Coalesce the next results of a stream into one frame to send back together, so that streams of many
+        small items aren't bottlenecked on a round trip per item. Takes whatever is already queued after
+        ``first_item``, waiting briefly for more while the generator is still running, up to the frame's count and
+        byte limits. Each item is pickled separately (see ``handle_response``)."""
+        frame = [pickle.dumps(first_item)]
+        size = len(frame[0])
+        deadline = time.time() + STREAM_FRAME_MAX_WAIT
+        while len(frame) < STREAM_FRAME_MAX_ITEMS and size < STREAM_FRAME_MAX_BYTES:
+            remaining = deadline - time.time()
+            running = (
+                result_queue.provenance
+                and result_queue.provenance.status == RunStatus.RUNNING
+            )
+            try:
+                if remaining > 0 and running:
+                    item = result_queue.get(block=True, timeout=remaining)
+                else:
+                    item = result_queue.get(block=False)
+            except queue.Empty:
+                break
+            frame.append(pickle.dumps(item))
+            size += len(frame[-1])
+        return frame
+
     ##############################################################
     # Methods decorated with a standardized error decorating handler
     # These catch exceptions and wrap the output in a Response object.
@@ -487,6 +1327,7 @@ class EnvServlet:
         resource_config, state, dryrun = data
         return obj_store.put_resource_local(resource_config, state, dryrun)
 
+    @ray.method(concurrency_group="control")
     @error_handling_decorator
     def put_local(self, key: Any, data: Any, serialization: Optional[str] = None):
         return obj_store.put_local(key, data)
@@ -496,34 +1337,78 @@ class EnvServlet:
     # These do not catch exceptions, and do not wrap the output
     # in a Response object.
     ##############################################################
+    @ray.method(concurrency_group="control")
     def keys_local(self):
         self.register_activity()
         return obj_store.keys_local()
 
+    @ray.method(concurrency_group="control")
     def get_local(self, key: Any, default: Optional[Any] = None):
         self.register_activity()
         return obj_store.get_local(key, default)
 
+    @ray.method(concurrency_group="control")
     def rename_local(self, key: Any, new_key: Any):
         self.register_activity()
         return obj_store.rename_local(key, new_key)
 
+    @ray.method(concurrency_group="control")
     def contains_local(self, key: Any):
         self.register_activity()
         return obj_store.contains_local(key)
 
+    @ray.method(concurrency_group="control")
     def pop_local(self, key: Any, *args):
         self.register_activity()
         return obj_store.pop_local(key, *args)
 
+    @ray.method(concurrency_group="control")
     def delete_local(self, key: Any):
         self.register_activity()
         return obj_store.delete_local(key)
 
+    @ray.method(concurrency_group="control")
     def clear_local(self):
         self.register_activity()
         return obj_store.clear_local()
 
+    def snapshot_for_replicas(self, key: Any):
+        """Snapshot a resource along with what this servlet has installed, so obj_store.replicate_resource can
+        fork it into new env servlets without reinstalling anything. The resource is put in the Ray object store
+        once, and each replica fetches it from there."""
+        self.register_activity()
+        env = obj_store.get_local(self.env_name)
+        env = env if isinstance(env, Env) else None
+        return {
+            "resource_ref": ray.put(obj_store.get_local(key, default=KeyError)),
+            "env": env,
+            "compute": env.compute if env else None,
+            "env_vars": env.env_vars if env and isinstance(env.env_vars, dict) else {},
+            "runtime_env": dict(ray.get_runtime_context().runtime_env or {}),
+            "sys_path": list(sys.path),
+        }
+
+    def load_replica(self, snapshot: Dict[str, Any], name: str):
+        """Set up this servlet as a replica of the one which took the snapshot, and put the replicated resource in
+        the local object store under name."""
+        self.register_activity()
+        Env._set_env_vars(snapshot["env_vars"])
+        # Preserve the order of the source servlet's path, e.g. for working dirs and local packages
+        for path in reversed(snapshot["sys_path"]):
+            if path not in sys.path:
+                sys.path.insert(0, path)
+
+        resource = ray.get(snapshot["resource_ref"])
+        if snapshot["env"] is not None:
+            env = copy.copy(snapshot["env"])
+            env.name = self.env_name
+            obj_store.put_local(env.name, env)
+            resource.env = env
+        resource.name = name
+        obj_store.put(resource.name, resource)
+        return resource.name
+
+    @ray.method(concurrency_group="user")
     def call(
         self,
         module_name: str,
@@ -568,3 +1453,49 @@ class EnvServlet:
             return result
         else:
             raise ValueError(f"Unknown serialization: {serialization}")
+
+    def _run_pipeline_step(self, module_name, method_name, args, kwargs):
+        self.register_activity()
+        module = obj_store.get(module_name, default=KeyError)
+        args = [_resolve_arg(arg) for arg in args or []]
+        kwargs = {k: _resolve_arg(v) for k, v in (kwargs or {}).items()}
+        result = getattr(module, method_name)(*args, **kwargs)
+        if inspect.iscoroutine(result):
+            result = self.event_loop.run(result)
+        return result
+
+    @ray.method(concurrency_group="user")
+    def call_pipeline_step(self, module_name, method_name, args, kwargs, *prev):
+        """Call a step of a pipeline. The result of the previous step, if any, is passed as ``prev`` rather than in
+        ``args`` so Ray resolves its ObjectRef before the call, without it going through the pipeline's own env."""
+        if prev:
+            args = list(prev)
+        return self._run_pipeline_step(module_name, method_name, args, kwargs)
+
+    @ray.method(concurrency_group="user")
+    def stream_pipeline_step(
+        self, module_name, method_name, args, kwargs, result_queue, *prev
+    ):
+        """Call a generator step of a pipeline, putting each item it yields in the object store and its ObjectRef on
+        ``result_queue`` as it's produced, followed by ``("end", None)``, or ``("error", e)`` if the step fails."""
+        if prev:
+            args = list(prev)
+
+        def put(item):
+            self.register_activity()
+            result_queue.put(("item", ray.put(item)))
+
+        try:
+            result = self._run_pipeline_step(module_name, method_name, args, kwargs)
+            if inspect.isasyncgen(result):
+                self.event_loop.drain(result, put)
+            else:
+                for item in result:
+                    put(item)
+            result_queue.put(("end", None))
+        except Exception as e:
+            try:
+                result_queue.put(("error", e))
+            except Exception:
+                # The pipeline shuts the queue down if it stops consuming early, which is what ended the step
+                pass
@@ -1,25 +1,46 @@
+import asyncio
+import codecs
+import hashlib
+import io
 import json
 import logging
+import sys
+import tempfile
+import threading
 import time
 import warnings
+import weakref
 from pathlib import Path
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 
+import httpx
 import requests
 
+from runhouse.constants import (
+    ARG_DEDUP_THRESHOLD,
+    CHUNKED_UPLOAD_THRESHOLD,
+    UPLOAD_CHUNK_SIZE,
+)
 from runhouse.globals import rns_client
 
 from runhouse.resources.envs.utils import _get_env_from
 
 from runhouse.resources.resource import Resource
 from runhouse.servers.http.http_utils import (
+    ArgCacheMiss,
+    ArgDigestsParams,
+    CachedArg,
+    CancelParams,
     DeleteObjectParams,
     handle_response,
     OutputType,
+    pickle,
     pickle_b64,
     PutObjectParams,
     PutResourceParams,
     RenameObjectParams,
+    ReplicateParams,
+    WaitForRunsParams,
 )
 
 logger = logging.getLogger(__name__)
@@ -31,6 +52,10 @@ class HTTPClient:
     """
 
     CHECK_TIMEOUT_SEC = 10
+    # Bounds for the pooled connections used by async calls. Calls beyond max_connections wait for a free
+    # connection rather than opening new sockets.
+    ASYNC_MAX_CONNECTIONS = 256
+    ASYNC_MAX_KEEPALIVE_CONNECTIONS = 64
 
     def __init__(
         self,
@@ -52,6 +77,9 @@ class HTTPClient:
         self.client.auth = self.auth
         self.client.verify = self.verify
         self.client.timeout = None
+        # One pooled async client per event loop, as httpx connections are bound to the loop they were opened on
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._async_clients_lock = threading.Lock()
 
     def _use_cert_verification(self):
         if not self.use_https:
@@ -86,6 +114,32 @@ class HTTPClient:
         client.use_https = use_https
         return client
 
+    def _get_async_client(self):
+        """Return the pooled async client for the running event loop. httpx connections are bound to the loop
+        they were opened on, so each loop gets its own client, kept until the loop is closed or garbage collected.
+        Callers alternating between loops (e.g. from several threads) reuse their loop's connections rather than
+        replacing each other's client."""
+        loop = asyncio.get_running_loop()
+        with self._async_clients_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                # The clients of closed loops can't be used again, drop them so their connections are released
+                for closed_loop in [
+                    other for other in self._async_clients if other.is_closed()
+                ]:
+                    del self._async_clients[closed_loop]
+                client = httpx.AsyncClient(
+                    auth=self.auth,
+                    verify=self.verify,
+                    timeout=None,
+                    limits=httpx.Limits(
+                        max_connections=self.ASYNC_MAX_CONNECTIONS,
+                        max_keepalive_connections=self.ASYNC_MAX_KEEPALIVE_CONNECTIONS,
+                    ),
+                )
+                self._async_clients[loop] = client
+        return client
+
     def _formatted_url(self, endpoint: str):
         prefix = "https" if self.use_https else "http"
         return f"{prefix}://{self.host}:{self.port}/{endpoint}"
@@ -205,6 +259,8 @@ class HTTPClient:
         remote=False,
         run_async=False,
         save=False,
+        timeout=None,
+        priority=None,
         **kwargs,
     ):
         """wrapper to temporarily support cluster's call signature"""
@@ -216,6 +272,8 @@ class HTTPClient:
             remote=remote,
             run_async=run_async,
             save=save,
+            timeout=timeout,
+            priority=priority,
             args=args,
             kwargs=kwargs,
             system=self.system,
@@ -234,9 +292,15 @@ class HTTPClient:
         args=None,
         kwargs=None,
         system=None,
+        timeout=None,
+        priority=None,
+        dedup_args=True,
     ):
         """
-        Client function to call the rpc for call_module_method
+        Client function to call the rpc for call_module_method. If ``timeout`` is given, the call is cancelled on the
+        cluster if it's still running after that many seconds. ``priority`` ("high", "normal" or "low") selects the
+        worker pool the call runs in within its env. With ``dedup_args``, large arguments are only uploaded if the
+        env doesn't already hold them from an earlier call.
         """
         # Measure the time it takes to send the message
         start = time.time()
@@ -244,16 +308,23 @@ class HTTPClient:
             f"{'Calling' if method_name else 'Getting'} {module_name}"
             + (f".{method_name}" if method_name else "")
         )
+        call_args, call_kwargs, arg_blobs = (
+            self._digest_args(args, kwargs) if dedup_args else (args, kwargs, {})
+        )
+        if arg_blobs:
+            self._upload_missing_args(module_name, env, arg_blobs)
         res = self.client.post(
             self._formatted_url(f"{module_name}/{method_name}"),
             json={
-                "data": pickle_b64([args, kwargs]),
+                "data": pickle_b64([call_args, call_kwargs]),
                 "env": env,
                 "stream_logs": stream_logs,
                 "save": save,
                 "key": run_name,
                 "remote": remote,
                 "run_async": run_async,
+                "timeout": timeout,
+                "priority": priority,
             },
             stream=not run_async,
             headers=rns_client.request_headers(),
@@ -280,13 +351,43 @@ class HTTPClient:
 
             resp = json.loads(responses_json)
             output_type = resp["output_type"]
-            result = handle_response(resp, output_type, error_str)
-            if output_type in [OutputType.RESULT_STREAM, OutputType.SUCCESS_STREAM]:
+            try:
+                result = handle_response(resp, output_type, error_str)
+            except ArgCacheMiss:
+                # The env resolves arguments before calling the method, so a miss is always reported before any
+                # result, including the first frame of a stream, and so is caught here rather than in the generator
+                if not arg_blobs:
+                    raise
+                # Evicted from the env's argument cache since we checked for it, so send the arguments in full
+                res.close()
+                return self.call_module_method(
+                    module_name,
+                    method_name,
+                    env=env,
+                    stream_logs=stream_logs,
+                    save=save,
+                    run_name=run_name,
+                    remote=remote,
+                    run_async=run_async,
+                    args=args,
+                    kwargs=kwargs,
+                    system=system,
+                    timeout=timeout,
+                    priority=priority,
+                    dedup_args=False,
+                )
+            if output_type in [
+                OutputType.RESULT_STREAM,
+                OutputType.RESULT_STREAM_BATCH,
+                OutputType.SUCCESS_STREAM,
+            ]:
                 # First time we encounter a stream result, we know the rest of the results will be a stream, so return
                 # a generator
                 def results_generator():
                     # If this is supposed to be an empty generator, there's no first result to return
-                    if not output_type == OutputType.SUCCESS_STREAM:
+                    if output_type == OutputType.RESULT_STREAM_BATCH:
+                        yield from result
+                    elif not output_type == OutputType.SUCCESS_STREAM:
                         yield result
                     for responses_json_inner in res_iter:
                         resp_inner = json.loads(responses_json_inner)
@@ -296,7 +397,9 @@ class HTTPClient:
                         )
                         # if output_type == OutputType.SUCCESS_STREAM:
                         #     break
-                        if output_type_inner in [
+                        if output_type_inner == OutputType.RESULT_STREAM_BATCH:
+                            yield from result_inner
+                        elif output_type_inner in [
                             OutputType.RESULT_STREAM,
                             OutputType.RESULT,
                         ]:
@@ -333,34 +436,352 @@ class HTTPClient:
         res.close()
         return non_generator_result
 
-    def put_object(self, key: str, value: Any, env=None):
-        return self.request_json(
-            "object",
+    async def call_async(
+        self,
+        module_name,
+        method_name,
+        *args,
+        stream_logs=True,
+        run_name=None,
+        remote=False,
+        run_async=False,
+        save=False,
+        timeout=None,
+        priority=None,
+        **kwargs,
+    ):
+        """Async version of :func:`call`."""
+        return await self.call_module_method_async(
+            module_name,
+            method_name,
+            stream_logs=stream_logs,
+            run_name=run_name,
+            remote=remote,
+            run_async=run_async,
+            save=save,
+            timeout=timeout,
+            priority=priority,
+            args=args,
+            kwargs=kwargs,
+            system=self.system,
+        )
+
+    async def _call_module_method_responses_async(
+        self,
+        module_name,
+        method_name,
+        json_dict: Dict,
+        error_str: str,
+    ):
+        """Async generator over the (output_type, result) pairs streamed back from a call_module_method request.
+        The connection is returned to the pool once the stream is exhausted or the generator is closed."""
+        client = self._get_async_client()
+        async with client.stream(
+            "POST",
+            self._formatted_url(f"{module_name}/{method_name}"),
+            json=json_dict,
+            headers=rns_client.request_headers(),
+        ) as res:
+            if res.status_code != 200:
+                content = await res.aread()
+                raise ValueError(
+                    f"Error calling {method_name} on server: {content.decode()}"
+                )
+            async for responses_json in res.aiter_lines():
+                if not responses_json:
+                    continue
+                resp = json.loads(responses_json)
+                output_type = resp["output_type"]
+                yield output_type, handle_response(resp, output_type, error_str)
+
+    async def call_module_method_async(
+        self,
+        module_name,
+        method_name,
+        env=None,
+        stream_logs=True,
+        save=False,
+        run_name=None,
+        remote=False,
+        run_async=False,
+        args=None,
+        kwargs=None,
+        system=None,
+        timeout=None,
+        priority=None,
+        dedup_args=True,
+    ):
+        """Async version of :func:`call_module_method`, sent over a pooled keep-alive connection. Returns an async
+        generator if the method streams results."""
+        start = time.time()
+        logger.info(
+            f"{'Calling' if method_name else 'Getting'} {module_name}"
+            + (f".{method_name}" if method_name else "")
+        )
+        call_args, call_kwargs, arg_blobs = (
+            self._digest_args(args, kwargs) if dedup_args else (args, kwargs, {})
+        )
+        if arg_blobs:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._upload_missing_args, module_name, env, arg_blobs
+            )
+        responses = self._call_module_method_responses_async(
+            module_name,
+            method_name,
+            json_dict={
+                "data": pickle_b64([call_args, call_kwargs]),
+                "env": env,
+                "stream_logs": stream_logs,
+                "save": save,
+                "key": run_name,
+                "remote": remote,
+                "run_async": run_async,
+                "timeout": timeout,
+                "priority": priority,
+            },
+            error_str=f"Error calling {method_name} on {module_name} on server",
+        )
+
+        non_generator_result = None
+        try:
+            async for output_type, result in responses:
+                if output_type in [
+                    OutputType.RESULT_STREAM,
+                    OutputType.RESULT_STREAM_BATCH,
+                    OutputType.SUCCESS_STREAM,
+                ]:
+
+                    async def results_generator():
+                        # If this is supposed to be an empty generator, there's no first result to return
+                        if output_type == OutputType.RESULT_STREAM_BATCH:
+                            for item in result:
+                                yield item
+                        elif not output_type == OutputType.SUCCESS_STREAM:
+                            yield result
+                        async for output_type_inner, result_inner in responses:
+                            if output_type_inner == OutputType.RESULT_STREAM_BATCH:
+                                for item in result_inner:
+                                    yield item
+                            elif output_type_inner in [
+                                OutputType.RESULT_STREAM,
+                                OutputType.RESULT,
+                            ]:
+                                yield result_inner
+
+                    return results_generator()
+                elif output_type == OutputType.CONFIG:
+                    if (
+                        system
+                        and "system" in result
+                        and system.rns_address == result["system"]
+                    ):
+                        result["system"] = system
+                    non_generator_result = Resource.from_config(result, dryrun=True)
+                elif output_type == OutputType.RESULT:
+                    non_generator_result = result
+
+        except ArgCacheMiss:
+            # Reported before any result, as the env resolves arguments before calling the method (see
+            # call_module_method), so never from within results_generator
+            if not arg_blobs:
+                raise
+            # Evicted from the env's argument cache since we checked for it, so send the arguments in full
+            await responses.aclose()
+            return await self.call_module_method_async(
+                module_name,
+                method_name,
+                env=env,
+                stream_logs=stream_logs,
+                save=save,
+                run_name=run_name,
+                remote=remote,
+                run_async=run_async,
+                args=args,
+                kwargs=kwargs,
+                system=system,
+                timeout=timeout,
+                priority=priority,
+                dedup_args=False,
+            )
+
+        logging.info(
+            f"Time to call {module_name}.{method_name}: {round(time.time() - start, 2)} seconds"
+        )
+        return non_generator_result
+
+    @staticmethod
+    def _estimate_size(value, limit: int) -> int:
+        """A cheap estimate of the size of the value's pickle, without pickling it, which stops counting once it
+        reaches ``limit``. Buffers and arrays count their bytes, and containers their items, so arguments which
+        are clearly small aren't pickled just to measure them."""
+        if isinstance(value, (bytes, bytearray, str)):
+            return len(value)
+        if isinstance(value, memoryview):
+            return value.nbytes
+        # Looked up on the type, so remote modules and other proxies don't get an attribute call
+        if hasattr(type(value), "nbytes") and isinstance(
+            getattr(value, "nbytes", None), int
+        ):
+            # e.g. numpy arrays and torch tensors
+            return value.nbytes
+        if isinstance(value, (list, tuple, set, frozenset, dict)):
+            size = sys.getsizeof(value)
+            for item in value.values() if isinstance(value, dict) else value:
+                if size >= limit:
+                    break
+                size += HTTPClient._estimate_size(item, limit - size)
+            return size
+        try:
+            return sys.getsizeof(value)
+        except TypeError:
+            return 0
+
+    @staticmethod
+    def _digest_args(args, kwargs):
+        """Swap each argument whose pickle is at least ``ARG_DEDUP_THRESHOLD`` bytes for a CachedArg with the hash of
+        its pickle. Only arguments estimated to be that large are pickled here, and their pickles are what's uploaded,
+        so other arguments are only pickled once, with the rest of the call. Returns the new args and kwargs (or the
+        originals if none were swapped), and a dict of the swapped arguments' pickles by hash."""
+        arg_blobs = {}
+
+        def digest(value):
+            if (
+                HTTPClient._estimate_size(value, ARG_DEDUP_THRESHOLD)
+                < ARG_DEDUP_THRESHOLD
+            ):
+                return value
+            try:
+                data = pickle.dumps(value)
+            except Exception:
+                # Leave it to fail when the call is pickled, as it would have anyway
+                return value
+            if len(data) < ARG_DEDUP_THRESHOLD:
+                return value
+            key = hashlib.sha256(data).hexdigest()
+            arg_blobs[key] = data
+            return CachedArg(key)
+
+        digested_args = [digest(arg) for arg in args or []]
+        digested_kwargs = {k: digest(v) for k, v in (kwargs or {}).items()}
+        if not arg_blobs:
+            return args, kwargs, arg_blobs
+        return digested_args, digested_kwargs, arg_blobs
+
+    def _upload_missing_args(self, module_name, env, arg_blobs: Dict[str, bytes]):
+        """Check which of the large arguments the module's env already holds, and upload only the rest."""
+        missing = self.request_json(
+            "args/missing",
             req_type="post",
-            json_dict=PutObjectParams(
-                key=key,
-                serialized_data=pickle_b64(value),
-                env_name=env,
-                serialization="pickle",
+            json_dict=ArgDigestsParams(
+                module=module_name, digests=list(arg_blobs), env_name=env
             ).dict(),
-            err_str=f"Error putting object {key}",
+            err_str=f"Error checking the cached arguments of {module_name}",
+        )
+        for key in missing:
+            params = {"module": module_name, "digest": key}
+            if env:
+                params["env_name"] = env
+            self.request_stream(
+                "args/stream",
+                io.BytesIO(arg_blobs[key]),
+                params=params,
+                err_str=f"Error uploading an argument of {module_name}",
+            )
+
+    @staticmethod
+    def _pickle_to_spool(picklable):
+        """Pickle into a spooled temp file, which stays in memory for small payloads and rolls over to disk for
+        large ones. Returns the file (rewound) and the size of the pickle."""
+        spool = tempfile.SpooledTemporaryFile(max_size=CHUNKED_UPLOAD_THRESHOLD)
+        pickle.dump(picklable, spool)
+        size = spool.tell()
+        spool.seek(0)
+        return spool, size
+
+    @staticmethod
+    def _iter_chunks(f, chunk_size: int = UPLOAD_CHUNK_SIZE):
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def request_stream(
+        self,
+        endpoint: str,
+        f,
+        params: Optional[Dict] = None,
+        err_str=None,
+    ):
+        """Upload the contents of a file-like object to the server in fixed-size chunks, using chunked
+        transfer encoding, so the full payload is never held in memory."""
+        headers = rns_client.request_headers()
+        headers["Content-Type"] = "application/octet-stream"
+        response = self.client.post(
+            self._formatted_url(endpoint.strip("/")),
+            params=params,
+            data=self._iter_chunks(f),
+            headers=headers,
         )
+        if response.status_code != 200:
+            raise ValueError(
+                f"Error calling {endpoint} on server: {response.content.decode()}"
+            )
+        resp_json = response.json()
+        return handle_response(resp_json, resp_json["output_type"], err_str)
+
+    def put_object(self, key: str, value: Any, env=None):
+        err_str = f"Error putting object {key}"
+        spool, size = self._pickle_to_spool(value)
+        with spool:
+            if size > CHUNKED_UPLOAD_THRESHOLD:
+                params = {"key": key}
+                if env:
+                    params["env_name"] = env
+                return self.request_stream(
+                    "object/stream", spool, params=params, err_str=err_str
+                )
+
+            return self.request_json(
+                "object",
+                req_type="post",
+                json_dict=PutObjectParams(
+                    key=key,
+                    serialized_data=codecs.encode(spool.read(), "base64").decode(),
+                    env_name=env,
+                    serialization="pickle",
+                ).dict(),
+                err_str=err_str,
+            )
 
     def put_resource(
         self, resource, env_name: Optional[str] = None, state=None, dryrun=False
     ):
         config = resource.config_for_rns
-        return self.request_json(
-            "resource",
-            req_type="post",
-            # TODO wire up dryrun properly
-            json_dict=PutResourceParams(
-                serialized_data=pickle_b64((config, state, dryrun)),
-                env_name=env_name,
-                serialization="pickle",
-            ).dict(),
-            err_str=f"Error putting resource {resource.name or type(resource)}",
-        )
+        err_str = f"Error putting resource {resource.name or type(resource)}"
+        spool, size = self._pickle_to_spool((config, state, dryrun))
+        with spool:
+            # Envs are always sent in one piece, because the server needs to read their config to create
+            # the corresponding env servlet
+            if size > CHUNKED_UPLOAD_THRESHOLD and resource.RESOURCE_TYPE != "env":
+                return self.request_stream(
+                    "resource/stream",
+                    spool,
+                    params={"env_name": env_name} if env_name else None,
+                    err_str=err_str,
+                )
+
+            return self.request_json(
+                "resource",
+                req_type="post",
+                # TODO wire up dryrun properly
+                json_dict=PutResourceParams(
+                    serialized_data=codecs.encode(spool.read(), "base64").decode(),
+                    env_name=env_name,
+                    serialization="pickle",
+                ).dict(),
+                err_str=err_str,
+            )
 
     def get(
         self, key: str, default: Any = None, remote=False, stream_logs: bool = False
@@ -380,6 +801,42 @@ class HTTPClient:
             return default
         return res
 
+    async def get_async(
+        self, key: str, default: Any = None, remote=False, stream_logs: bool = False
+    ):
+        """Async version of :func:`get`."""
+        try:
+            return await self.call_module_method_async(
+                key,
+                None,
+                remote=remote,
+                stream_logs=stream_logs,
+                system=self,
+            )
+        except KeyError as e:
+            if default == KeyError:
+                raise e
+            return default
+
+    def wait_for_runs(self, keys: List[str], timeout: Optional[float] = None):
+        """Long-poll the server for the status of a batch of async runs. Returns a dict of the keys which have
+        finished to their RunStatus, as soon as any of them finishes or the timeout passes."""
+        return self.request_json(
+            "runs/wait",
+            req_type="post",
+            json_dict=WaitForRunsParams(keys=keys, timeout=timeout).dict(),
+            err_str="Error waiting for runs",
+        )
+
+    def cancel(self, key: str) -> bool:
+        """Cancel the in-flight call with the given run key. Returns whether a running call was found."""
+        return self.request_json(
+            "cancel",
+            req_type="post",
+            json_dict=CancelParams(key=key).dict(),
+            err_str=f"Error cancelling run {key}",
+        )
+
     def rename(self, old_key: str, new_key: str):
         """Provides compatibility with cluster's rename."""
         return self.rename_object(old_key, new_key)
@@ -392,6 +849,20 @@ class HTTPClient:
             err_str=f"Error renaming object {old_key}",
         )
 
+    def replicate_resource(
+        self, key: str, replica_names: List[str], replica_env_names: List[str]
+    ):
+        return self.request_json(
+            "replicate",
+            req_type="post",
+            json_dict=ReplicateParams(
+                key=key,
+                replica_names=replica_names,
+                replica_env_names=replica_env_names,
+            ).dict(),
+            err_str=f"Error replicating {key}",
+        )
+
     def set_settings(self, new_settings: Dict[str, Any]):
         res = self.client.post(
             self._formatted_url("settings"),
@@ -1,4 +1,5 @@
 import argparse
+import asyncio
 import inspect
 import json
 import logging
@@ -14,8 +15,10 @@ import yaml
 from fastapi import Body, FastAPI, HTTPException, Request
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
 from runhouse.constants import (
+    CALL_PRIORITY_POOL_SIZES,
     CLUSTER_CONFIG_PATH,
     DEFAULT_HTTP_PORT,
     DEFAULT_HTTPS_PORT,
@@ -23,13 +26,19 @@ from runhouse.constants import (
     DEFAULT_SERVER_PORT,
     LOGGING_WAIT_TIME,
     RH_LOGFILE_PATH,
+    RUN_STATUS_LONG_POLL_TIMEOUT,
+    RUN_STATUS_POLL_INTERVAL,
+    UPLOAD_CHUNK_SIZE,
 )
 from runhouse.globals import configs, obj_store, rns_client
 from runhouse.rns.utils.api import resolve_absolute_path
 from runhouse.rns.utils.names import _generate_default_name
+from runhouse.servers.env_servlet import call_concurrency_group
 from runhouse.servers.http.auth import hash_token, verify_cluster_access
 from runhouse.servers.http.certs import TLSCertConfig
 from runhouse.servers.http.http_utils import (
+    ArgDigestsParams,
+    CancelParams,
     DeleteObjectParams,
     get_token_from_request,
     handle_exception_response,
@@ -40,8 +49,10 @@ from runhouse.servers.http.http_utils import (
     PutObjectParams,
     PutResourceParams,
     RenameObjectParams,
+    ReplicateParams,
     Response,
     ServerSettings,
+    WaitForRunsParams,
 )
 from runhouse.servers.nginx.config import NginxConfig
 from runhouse.servers.obj_store import (
@@ -272,9 +283,12 @@ class HTTPServer:
             )
 
     @staticmethod
-    def call_servlet_method(servlet, method, args, block=True):
+    def call_servlet_method(servlet, method, args, block=True, concurrency_group=None):
         if isinstance(servlet, ray.actor.ActorHandle):
-            obj_ref = getattr(servlet, method).remote(*args)
+            actor_method = getattr(servlet, method)
+            if concurrency_group:
+                actor_method = actor_method.options(concurrency_group=concurrency_group)
+            obj_ref = actor_method.remote(*args)
             if block:
                 return ray.get(obj_ref)
             else:
@@ -290,6 +304,7 @@ class HTTPServer:
         create=False,
         lookup_env_for_name=None,
         block=True,
+        concurrency_group=None,
     ):
         HTTPServer.register_activity()
         try:
@@ -297,7 +312,9 @@ class HTTPServer:
                 env = env or obj_store.get_env_servlet_name_for_key(lookup_env_for_name)
             servlet = ObjStore.get_env_servlet(env or "base", create=create)
             # If servlet is a RayActor, call with .remote
-            return HTTPServer.call_servlet_method(servlet, method, args, block=block)
+            return HTTPServer.call_servlet_method(
+                servlet, method, args, block=block, concurrency_group=concurrency_group
+            )
         except Exception as e:
             logger.exception(e)
             HTTPServer.register_activity()
@@ -332,6 +349,157 @@ class HTTPServer:
         except Exception as e:
             return handle_exception_response(e, traceback.format_exc())
 
+    # NOTE: The streaming upload and run status routes need to be registered before "/{module}/{method}", or
+    # FastAPI will route them to call_module_method instead.
+    @staticmethod
+    @app.post("/resource/stream")
+    @validate_cluster_access
+    async def put_resource_stream(request: Request, env_name: Optional[str] = None):
+        try:
+            chunk_refs = await HTTPServer._stream_request_to_object_refs(request)
+            return await run_in_threadpool(
+                obj_store.put_resource,
+                serialized_data=chunk_refs,
+                serialization="pickle_chunks",
+                env_name=env_name or "base",
+            )
+        except Exception as e:
+            return handle_exception_response(e, traceback.format_exc())
+
+    @staticmethod
+    @app.post("/object/stream")
+    @validate_cluster_access
+    async def put_object_stream(
+        request: Request, key: str, env_name: Optional[str] = None
+    ):
+        try:
+            chunk_refs = await HTTPServer._stream_request_to_object_refs(request)
+            await run_in_threadpool(
+                obj_store.put,
+                key=key,
+                value=chunk_refs,
+                env=env_name,
+                serialization="pickle_chunks",
+                create_env_if_not_exists=True,
+            )
+            return Response(output_type=OutputType.SUCCESS)
+        except Exception as e:
+            return handle_exception_response(e, traceback.format_exc())
+
+    @staticmethod
+    @app.post("/args/missing")
+    @validate_cluster_access
+    def missing_args(request: Request, params: ArgDigestsParams):
+        """Of the given digests of large call arguments, return those which the env the module is in doesn't hold,
+        and which the client should upload before calling the module."""
+        try:
+            servlet = HTTPServer._arg_cache_servlet(params.module, params.env_name)
+            return Response(
+                data=ObjStore.call_actor_method(
+                    servlet, "missing_args", params.digests
+                ),
+                output_type=OutputType.RESULT_SERIALIZED,
+                serialization=None,
+            )
+        except Exception as e:
+            return handle_exception_response(e, traceback.format_exc())
+
+    @staticmethod
+    @app.post("/args/stream")
+    @validate_cluster_access
+    async def put_arg_stream(
+        request: Request, module: str, digest: str, env_name: Optional[str] = None
+    ):
+        try:
+            chunk_refs = await HTTPServer._stream_request_to_object_refs(request)
+            servlet = await run_in_threadpool(
+                HTTPServer._arg_cache_servlet, module, env_name
+            )
+            await run_in_threadpool(
+                ObjStore.call_actor_method, servlet, "put_arg", digest, chunk_refs
+            )
+            return Response(output_type=OutputType.SUCCESS)
+        except Exception as e:
+            return handle_exception_response(e, traceback.format_exc())
+
+    @staticmethod
+    def _arg_cache_servlet(module: str, env_name: Optional[str] = None):
+        # The same env a call to the module is routed to in call_module_method
+        env_name = env_name or obj_store.get_env_servlet_name_for_key(module)
+        return ObjStore.get_env_servlet(env_name or "base", create=True)
+
+    @staticmethod
+    async def _stream_request_to_object_refs(request: Request):
+        """Read a streamed request body into fixed-size chunks in the Ray object store, so the payload is never
+        held in full in the server's memory. The EnvServlet unpickles directly from the chunks."""
+        chunk_refs = []
+        buffer = bytearray()
+        async for piece in request.stream():
+            buffer.extend(piece)
+            if len(buffer) >= UPLOAD_CHUNK_SIZE:
+                chunk_refs.append(ray.put(bytes(buffer)))
+                buffer = bytearray()
+        if buffer:
+            chunk_refs.append(ray.put(bytes(buffer)))
+        return chunk_refs
+
+    @staticmethod
+    @app.post("/runs/wait")
+    @validate_cluster_access
+    async def wait_for_runs(request: Request, params: WaitForRunsParams):
+        """Long-poll for the status of a batch of async runs. Returns a dict of the keys which have finished to
+        their RunStatus as soon as any of them finishes, or an empty dict once the timeout passes."""
+        try:
+            timeout = (
+                RUN_STATUS_LONG_POLL_TIMEOUT
+                if params.timeout is None
+                else min(params.timeout, RUN_STATUS_LONG_POLL_TIMEOUT)
+            )
+            deadline = time.time() + timeout
+            while True:
+                statuses = await run_in_threadpool(
+                    HTTPServer._get_run_statuses, params.keys
+                )
+                if statuses or time.time() >= deadline:
+                    break
+                await asyncio.sleep(RUN_STATUS_POLL_INTERVAL)
+
+            return Response(
+                data=statuses,
+                output_type=OutputType.RESULT_SERIALIZED,
+                serialization=None,
+            )
+        except Exception as e:
+            return handle_exception_response(e, traceback.format_exc())
+
+    @staticmethod
+    @app.post("/cancel")
+    @validate_cluster_access
+    def cancel_run(request: Request, params: CancelParams):
+        """Cancel an in-flight call by its run key. Returns whether a running call was found."""
+        try:
+            return Response(
+                data=obj_store.cancel_run(params.key),
+                output_type=OutputType.RESULT_SERIALIZED,
+                serialization=None,
+            )
+        except Exception as e:
+            return handle_exception_response(e, traceback.format_exc())
+
+    @staticmethod
+    def _get_run_statuses(keys):
+        """Collect the statuses of the finished runs among keys from all the env servlets on the cluster."""
+        results = [
+            HTTPServer.call_servlet_method(
+                ObjStore.get_env_servlet(env_name), "run_statuses", [keys], block=False
+            )
+            for env_name in obj_store.get_all_initialized_env_servlet_names()
+        ]
+        statuses = {}
+        for res in results:
+            statuses.update(ray.get(res) if isinstance(res, ray.ObjectRef) else res)
+        return statuses
+
     @staticmethod
     @app.post("/{module}/{method}")
     @validate_cluster_access
@@ -354,6 +522,12 @@ class HTTPServer:
             env = message.env or obj_store.get_env_servlet_name_for_key(module)
             persist = message.run_async or message.remote or message.save or not method
             if method:
+                priority = getattr(message, "priority", None)
+                if priority and priority not in CALL_PRIORITY_POOL_SIZES:
+                    raise ValueError(
+                        f"Invalid priority {priority}, must be one of {list(CALL_PRIORITY_POOL_SIZES)}"
+                    )
+
                 # TODO fix the way we generate runkeys, it's ugly
                 message.key = message.key or _generate_default_name(
                     prefix=module if method == "__call__" else f"{module}_{method}",
@@ -369,6 +543,8 @@ class HTTPServer:
                     env=env,
                     create=True,
                     block=False,
+                    # Queued behind calls of the same priority only
+                    concurrency_group=call_concurrency_group(priority),
                 )
 
                 if fast_resp:
@@ -465,7 +641,10 @@ class HTTPServer:
                         obj_ref = None
                         # time.sleep(LOGGING_WAIT_TIME)
                         raise ray.exceptions.GetTimeoutError
-                    if not ret_val.output_type == OutputType.RESULT_STREAM:
+                    if ret_val.output_type not in [
+                        OutputType.RESULT_STREAM,
+                        OutputType.RESULT_STREAM_BATCH,
+                    ]:
                         waiting_for_results = False
                     ret_val = ret_val.data if serialization == "json" else ret_val
                     ret_resp = json.dumps(jsonable_encoder(ret_val))
@@ -503,6 +682,13 @@ class HTTPServer:
                     logger.debug(f"Yielding logs for key {key}")
                     yield json.dumps(jsonable_encoder(lines_resp)) + "\n"
 
+        except GeneratorExit:
+            # The client disconnected before the call finished. If nobody else can collect the result, cancel the
+            # call rather than leave it running for nothing.
+            if waiting_for_results and pop:
+                logger.info(f"Client disconnected, cancelling call {key}")
+                obj_store.cancel_run(key)
+            raise
         except Exception as e:
             logger.exception(e)
             yield json.dumps(
@@ -555,6 +741,24 @@ class HTTPServer:
         except Exception as e:
             return handle_exception_response(e, traceback.format_exc())
 
+    @staticmethod
+    @app.post("/replicate")
+    @validate_cluster_access
+    def replicate(request: Request, params: ReplicateParams):
+        try:
+            replica_names = obj_store.replicate_resource(
+                key=params.key,
+                replica_names=params.replica_names,
+                replica_env_names=params.replica_env_names,
+            )
+            return Response(
+                data=replica_names,
+                output_type=OutputType.RESULT_SERIALIZED,
+                serialization=None,
+            )
+        except Exception as e:
+            return handle_exception_response(e, traceback.format_exc())
+
     @staticmethod
     @app.post("/delete_object")
     @validate_cluster_access
@@ -861,6 +1065,24 @@ class HTTPServer:
             )
 
 
+def create_worker_app() -> FastAPI:
+    """App factory for uvicorn's worker processes when launched with ``--workers`` > 1, which import this module but
+    don't run ``__main__``. All server state lives in Ray actors (the ClusterServlet and EnvServlets), so each worker
+    only needs to connect to the ones created by the parent process. uvicorn calls this as each worker loads the app,
+    before it starts serving, as the telemetry middleware can't be added to the app after that."""
+    obj_store.initialize(
+        "base",
+        setup_cluster_servlet=ClusterServletSetupOption.GET_OR_FAIL,
+    )
+    HTTPServer(
+        enable_local_span_collection=obj_store.get_cluster_config().get(
+            "use_local_telemetry", False
+        ),
+    )
+    logger.info("Initialized Runhouse API server worker process.")
+    return app
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -920,6 +1142,13 @@ if __name__ == "__main__":
         action="store_true",  # if providing --use-nginx will be set to True
         help="Configure Nginx as a reverse proxy",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of server worker processes. Each worker connects to the same Ray-backed object store. "
+        "Defaults to 1.",
+    )
     parser.add_argument(
         "--certs-address",
         type=str,
@@ -1036,6 +1265,18 @@ if __name__ == "__main__":
     host = parse_args.host or cluster_config.get("server_host") or DEFAULT_SERVER_HOST
     cluster_config["server_host"] = host
 
+    # Server worker processes
+    if parse_args.workers and parse_args.workers != cluster_config.get(
+        "server_workers"
+    ):
+        logger.warning(
+            f"CLI provided workers: {parse_args.workers} is different from the server_workers specified in "
+            f"cluster_config.json: {cluster_config.get('server_workers')}. Prioritizing CLI provided workers."
+        )
+
+    workers = parse_args.workers or cluster_config.get("server_workers") or 1
+    cluster_config["server_workers"] = workers
+
     # Address in the case we're a TLS server
     if parse_args.certs_address != cluster_config.get("ips", [None])[0]:
         logger.warning(
@@ -1151,17 +1392,22 @@ if __name__ == "__main__":
     logger.info(
         f"Launching Runhouse API server with den_auth={den_auth} and "
         + f"use_local_telemetry={use_local_telemetry} "
-        + f"on host={host} and use_https={use_https} and port_arg={daemon_port}"
+        + f"on host={host} and use_https={use_https} and port_arg={daemon_port} "
+        + f"with workers={workers}"
     )
 
     # Only launch uvicorn with certs if HTTPS is enabled and not using Nginx
     uvicorn_cert = ssl_certfile if not use_nginx and use_https else None
     uvicorn_key = ssl_keyfile if not use_nginx and use_https else None
 
+    # uvicorn can only spawn multiple workers from an import string, which the workers each import fresh
+    # (see create_worker_app above)
     uvicorn.run(
-        app,
+        app if workers == 1 else "runhouse.servers.http.http_server:create_worker_app",
+        factory=workers > 1,
         host=host,
         port=daemon_port,
         ssl_certfile=uvicorn_cert,
         ssl_keyfile=uvicorn_key,
+        workers=workers,
     )
@@ -1,4 +1,5 @@
 import codecs
+import io
 import json
 import logging
 import re
@@ -20,6 +21,10 @@ class Message(BaseModel):
     save: Optional[bool] = False
     remote: Optional[bool] = False
     run_async: Optional[bool] = False
+    # Seconds after which the call is cancelled if it's still running
+    timeout: Optional[float] = None
+    # Priority class of the call within its env servlet, "high", "normal" or "low"
+    priority: Optional[str] = None
 
 
 class ServerSettings(BaseModel):
@@ -49,6 +54,27 @@ class DeleteObjectParams(BaseModel):
     keys: List[str]
 
 
+class ReplicateParams(BaseModel):
+    key: str
+    replica_names: List[str]
+    replica_env_names: List[str]
+
+
+class WaitForRunsParams(BaseModel):
+    keys: List[str]
+    timeout: Optional[float] = None
+
+
+class CancelParams(BaseModel):
+    key: str
+
+
+class ArgDigestsParams(BaseModel):
+    module: str
+    digests: List[str]
+    env_name: Optional[str] = None
+
+
 class Args(BaseModel):
     args: Optional[List[Any]]
     kwargs: Optional[Dict[str, Any]]
@@ -72,11 +98,26 @@ class OutputType:
     RESULT = "result"
     RESULT_LIST = "result_list"
     RESULT_STREAM = "result_stream"
+    # Several results of a stream in one frame
+    RESULT_STREAM_BATCH = "result_stream_batch"
     RESULT_SERIALIZED = "result_serialized"
     SUCCESS_STREAM = "success_stream"  # No output, but with generators
     CONFIG = "config"
 
 
+class CachedArg:
+    """Stands in for a large call argument, identified by the hash of its pickle. The env servlet swaps it for the
+    argument from its argument cache, which the client uploads the argument to beforehand if it's missing."""
+
+    def __init__(self, digest: str):
+        self.digest = digest
+
+
+class ArgCacheMiss(KeyError):
+    """Raised if an env servlet no longer holds the argument for a CachedArg, e.g. if it was evicted since the
+    client checked for it."""
+
+
 def pickle_b64(picklable):
     return codecs.encode(pickle.dumps(picklable), "base64").decode()
 
@@ -85,6 +126,33 @@ def b64_unpickle(b64_pickled):
     return pickle.loads(codecs.decode(b64_pickled.encode(), "base64"))
 
 
+class ChunkedReader(io.RawIOBase):
+    """Read-only file-like view over an iterable of byte chunks. Lets us unpickle a payload that arrived in pieces
+    without first joining the pieces into one large buffer."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._current = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not len(self._current):
+            try:
+                self._current = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        n = min(len(buffer), len(self._current))
+        buffer[:n] = self._current[:n]
+        self._current = self._current[n:]
+        return n
+
+
+def unpickle_chunks(chunks):
+    return pickle.load(io.BufferedReader(ChunkedReader(chunks)))
+
+
 def deserialize_data(data: Any, serialization: Optional[str]):
     if data is None:
         return None
@@ -93,6 +161,12 @@ def deserialize_data(data: Any, serialization: Optional[str]):
         return json.loads(data)
     elif serialization == "pickle":
         return b64_unpickle(data)
+    elif serialization == "pickle_chunks":
+        # Data is a list of Ray ObjectRefs to consecutive chunks of a pickle, as assembled by the server from a
+        # streamed upload. Fetch them one at a time so we only hold a single chunk alongside the result.
+        import ray
+
+        return unpickle_chunks(ray.get(ref) for ref in data)
     else:
         return data
 
@@ -135,6 +209,9 @@ def handle_response(response_data, output_type, err_str):
         return deserialize_data(response_data["data"], response_data["serialization"])
     if output_type in [OutputType.RESULT, OutputType.RESULT_STREAM]:
         return b64_unpickle(response_data["data"])
+    elif output_type == OutputType.RESULT_STREAM_BATCH:
+        # Each item in the frame is pickled separately, so the frame can be bounded in bytes as it's built
+        return [pickle.loads(item) for item in b64_unpickle(response_data["data"])]
     elif output_type == OutputType.CONFIG:
         # No need to unpickle since this was just sent as json
         return response_data["data"]
@@ -7,6 +7,11 @@ import ray
 
 import runhouse
 
+from runhouse.constants import (
+    ENV_SERVLET_CONCURRENCY_GROUPS,
+    ENV_SERVLET_MAX_CONCURRENCY,
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -89,6 +94,8 @@ class ObjStore:
         self.servlet_name: Optional[str] = None
         self.cluster_servlet: Optional[ray.actor.ActorHandle] = None
         self.imported_modules = {}
+        # Source file versions of imported_modules, to tell when they need to be reloaded
+        self.imported_module_versions = {}
         self.installed_envs = {}  # TODO: consider deleting it?
         self._kv_store: Dict[Any, Any] = None
 
@@ -223,7 +230,9 @@ class ObjStore:
         # Otherwise, create it
         if create:
             new_env_actor = (
-                ray.remote(EnvServlet)
+                ray.remote(concurrency_groups=ENV_SERVLET_CONCURRENCY_GROUPS)(
+                    EnvServlet
+                )
                 .options(
                     name=env_name,
                     get_if_exists=True,
@@ -235,7 +244,7 @@ class ObjStore:
                     resources=resources,
                     lifetime="detached",
                     namespace="runhouse",
-                    max_concurrency=1000,
+                    max_concurrency=ENV_SERVLET_MAX_CONCURRENCY,
                 )
                 .remote(env_name=env_name)
             )
@@ -440,8 +449,9 @@ class ObjStore:
                     f"Env {env} does not exist; cannot put key {key} there."
                 )
 
-        # If it does exist somewhere, no more!
-        if self.get(key, default=None) is not None:
+        # If it does exist somewhere, no more! Check with contains rather than get so we don't pull a
+        # potentially large existing value into this process just to overwrite it.
+        if self.contains(key):
             logger.warning("Key already exists in some env, overwriting.")
             self.pop(key)
 
@@ -772,8 +782,14 @@ class ObjStore:
         # Normally, serialization and deserialization happens within the servlet
         # However, if we're putting an env, we need to deserialize it here and
         # actually create the corresponding env servlet.
-        resource_config, _, _ = deserialize_data(serialized_data, serialization)
-        if resource_config["resource_type"] == "env":
+        # Chunked uploads are only used for large payloads (never envs), and we don't want to pull the
+        # whole payload into this process just to inspect the config, so we skip them here.
+        resource_config = (
+            deserialize_data(serialized_data, serialization)[0]
+            if serialization != "pickle_chunks"
+            else {}
+        )
+        if resource_config.get("resource_type") == "env":
 
             # Note that the passed in `env_name` and the `env_name_to_create` here are
             # distinct. The `env_name` is the name of the env servlet where we want to store
@@ -846,6 +862,48 @@ class ObjStore:
         # Return the name in case we had to set it
         return resource.name
 
+    def cancel_run(self, key: str) -> bool:
+        """Cancel the in-flight call with the given run key, in whichever env it's running. Returns whether a running
+        call was found."""
+        env_name = self.get_env_servlet_name_for_key(key)
+        env_names = (
+            [env_name] if env_name else self.get_all_initialized_env_servlet_names()
+        )
+        return any(
+            ray.get(
+                [
+                    self.get_env_servlet(env_name).cancel.remote(key)
+                    for env_name in env_names
+                ]
+            )
+        )
+
+    def replicate_resource(
+        self, key: str, replica_names: List[str], replica_env_names: List[str]
+    ) -> List[str]:
+        """Fork the resource at key into a new env servlet per replica. The replica servlets are created with the
+        source env's runtime env and compute, and take on its env vars and sys.path, so nothing is reinstalled. The
+        resource is copied through the Ray object store once and fanned out to all the replicas."""
+        env_name = self.get_env_servlet_name_for_key(key)
+        if env_name is None:
+            raise ObjStoreError(f"Key {key} not found; cannot replicate it.")
+
+        snapshot = self.call_actor_method(
+            self.get_env_servlet(env_name), "snapshot_for_replicas", key
+        )
+        load_refs = []
+        for replica_name, replica_env_name in zip(replica_names, replica_env_names):
+            replica_servlet = self.get_env_servlet(
+                replica_env_name,
+                create=True,
+                runtime_env=snapshot["runtime_env"],
+                resources=dict(snapshot["compute"] or {}),
+            )
+            load_refs.append(
+                replica_servlet.load_replica.remote(snapshot, replica_name)
+            )
+        return ray.get(load_refs)
+
     ##############################################
     # Cluster info methods
     ##############################################
@@ -854,7 +912,14 @@ class ObjStore:
         config_cluster = self.get_cluster_config()
         envs_in_cluster = self.get_all_initialized_env_servlet_names()
         cluster_servlets = {}
+        cache_stats = {}
         for env in envs_in_cluster:
+            env_cache_stats = self.call_actor_method(
+                self.get_env_servlet(env), "cache_stats"
+            )
+            if env_cache_stats:
+                cache_stats[env] = env_cache_stats
+
             env_keys = self.keys_for_env_servlet_name(env)
             resources_in_env = self.get_list(env_keys)
             resources_in_env_modified = []
@@ -880,4 +945,5 @@ class ObjStore:
 
             cluster_servlets[env] = resources_in_env_modified
         config_cluster["envs"] = cluster_servlets
+        config_cluster["cache_stats"] = cache_stats
         return config_cluster
@@ -65,6 +65,7 @@ install_requires = [
     "python-dotenv",
     "fastapi",
     "fsspec<=2023.5.0",
+    "httpx",
     "opentelemetry-api",
     "opentelemetry-exporter-otlp-proto-http",
     "opentelemetry-instrumentation",
@@ -1,11 +1,21 @@
+import asyncio
 import logging
+import multiprocessing
+import queue
+import threading
 import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 import requests
 
+import runhouse as rh
+
 from runhouse.globals import rns_client
+from runhouse.resources.module import Module
+from runhouse.servers import env_servlet
+from runhouse.servers.env_servlet import CallBatcher, EventLoopThread
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +58,307 @@ def run_performance_tests(summer_func):
     print(f"{suffix} call took {round(avg_time, 2)} ms: {times_list}")
 
 
+def run_throughput_test(summer_func, num_requests=500, concurrency=32):
+    """Measure call throughput under concurrent load. Run against servers started with
+    ``runhouse restart --workers N`` for different N to compare how throughput scales with workers."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    cluster = summer_func.system
+    port = cluster.client.port
+    suffix = "https" if cluster._use_https else "http"
+    call_url = (
+        f"{suffix}://{cluster.address}:{port}/call/summer_func/call/?serialization=None"
+    )
+    headers = rns_client.request_headers() if cluster.den_auth else None
+
+    def call(i):
+        return requests.post(
+            call_url,
+            json={"args": [i, 1]},
+            headers=headers,
+            verify=cluster.client.verify,
+        ).json()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.time()
+        results = list(executor.map(call, range(num_requests)))
+        elapsed = time.time() - start
+
+    assert results == [i + 1 for i in range(num_requests)]
+    workers = cluster.status().get("server_workers", 1)
+    throughput = round(num_requests / elapsed, 2)
+    print(
+        f"{num_requests} calls with concurrency {concurrency} against {workers} server worker(s): "
+        f"{throughput} calls/s"
+    )
+    return throughput
+
+
+class SignatureModule(rh.Module):
+    def summer(self, a, b=1):
+        return a + b
+
+    async def async_summer(self, a, b=1):
+        return a + b
+
+
+def run_dispatch_benchmark(reps=10000):
+    """Measure the client-side cost of attribute dispatch on a remote Module, i.e. of building the
+    RemoteMethodWrapper on each access, with signatures memoized vs. recomputed with inspect each time."""
+    module = SignatureModule()
+    # Pretend the module is remote so attribute access goes through the RemoteMethodWrapper path
+    module._client = lambda: object()
+
+    start = time.time()
+    for _ in range(reps):
+        module.summer
+    dispatch_us = (time.time() - start) / reps * 1e6
+
+    start = time.time()
+    for _ in range(reps):
+        Module._compute_method_signature(SignatureModule.summer)
+    uncached_us = (time.time() - start) / reps * 1e6
+
+    start = time.time()
+    for _ in range(reps // 100):
+        module.signature
+    signature_us = (time.time() - start) / (reps // 100) * 1e6
+
+    print(
+        f"Attribute dispatch took {round(dispatch_us, 2)} us, vs. {round(uncached_us, 2)} us to compute a "
+        f"signature uncached. Full module signature took {round(signature_us, 2)} us."
+    )
+    return dispatch_us, uncached_us
+
+
+async def async_range(n):
+    for i in range(n):
+        yield i
+
+
+async def async_add_one(x):
+    return x + 1
+
+
+def run_event_loop_benchmark(num_items=10000):
+    """Compare running async methods and async generators in the servlet with a new event loop per call or item,
+    as it used to, vs. on its persistent event loop thread."""
+    results = []
+    gen = async_range(num_items)
+    start = time.time()
+    while True:
+        loop = asyncio.new_event_loop()
+        try:
+            results.append(loop.run_until_complete(gen.__anext__()))
+        except StopAsyncIteration:
+            break
+        finally:
+            loop.close()
+    loop_per_item_rate = num_items / (time.time() - start)
+    assert results == list(range(num_items))
+
+    event_loop = EventLoopThread()
+    results = []
+    start = time.time()
+    event_loop.drain(async_range(num_items), results.append)
+    persistent_rate = num_items / (time.time() - start)
+    assert results == list(range(num_items))
+
+    num_calls = num_items // 10
+    start = time.time()
+    for i in range(num_calls):
+        asyncio.run(async_add_one(i))
+    asyncio_run_rate = num_calls / (time.time() - start)
+
+    start = time.time()
+    for i in range(num_calls):
+        event_loop.run(async_add_one(i))
+    persistent_call_rate = num_calls / (time.time() - start)
+
+    print(
+        f"Async generator: {round(loop_per_item_rate)} items/s with a new event loop per item, "
+        f"{round(persistent_rate)} items/s on a persistent loop. Coroutine calls: {round(asyncio_run_rate)} calls/s "
+        f"with asyncio.run, {round(persistent_call_rate)} calls/s on a persistent loop."
+    )
+    return loop_per_item_rate, persistent_rate
+
+
+class CPUBoundModule:
+    def square_sum(self, n):
+        return sum(i * i for i in range(n))
+
+
+def run_process_pool_benchmark(num_calls=32, n=200000, procs=None):
+    """Compare concurrent CPU-bound calls to a module run on the servlet's threads, where they serialize on the GIL,
+    vs. in an env's worker processes (``rh.env(procs=...)``)."""
+    procs = procs or multiprocessing.cpu_count()
+    module = CPUBoundModule()
+    expected = module.square_sum(n)
+
+    with ThreadPoolExecutor(max_workers=procs) as threads:
+        start = time.time()
+        results = list(threads.map(module.square_sum, [n] * num_calls))
+        thread_rate = num_calls / (time.time() - start)
+    assert results == [expected] * num_calls
+
+    pool = env_servlet._worker_pool("cpu_bound", module, procs)
+    try:
+        # Start the workers before timing, as the servlet only does so on a module's first calls
+        list(pool.map(abs, range(procs)))
+        start = time.time()
+        futures = [
+            pool.submit(env_servlet._call_in_worker, "cpu_bound", "square_sum", [n], {})
+            for _ in range(num_calls)
+        ]
+        results = [env_servlet._load_worker_result(*f.result()) for f in futures]
+        process_rate = num_calls / (time.time() - start)
+    finally:
+        pool.shutdown()
+    assert results == [expected] * num_calls
+
+    print(
+        f"CPU-bound calls with {procs} workers: {round(thread_rate, 2)} calls/s in threads, "
+        f"{round(process_rate, 2)} calls/s in worker processes."
+    )
+    return thread_rate, process_rate
+
+
+def vectorized_double(inputs):
+    # Stands in for a vectorized model call, with a fixed cost per invocation (holding the GIL) and a small cost
+    # per input
+    sum(range(50000))
+    return [x * 2 for x in inputs]
+
+
+def run_batching_benchmark(
+    num_calls=2000, concurrency=64, max_wait_ms_options=(0, 1, 5, 20)
+):
+    """Compare throughput and per-call latency of concurrent single-input calls to a vectorized method, each invoking
+    it separately vs. batched by the servlet's CallBatcher (``@rh.batched``) with different batch windows."""
+
+    def run(call):
+        latencies = []
+
+        def timed_call(i):
+            start = time.time()
+            assert call(i) == i * 2
+            latencies.append(time.time() - start)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            start = time.time()
+            list(executor.map(timed_call, range(num_calls)))
+            throughput = num_calls / (time.time() - start)
+        latencies.sort()
+        return (
+            throughput,
+            sum(latencies) / len(latencies) * 1000,
+            latencies[int(len(latencies) * 0.99)] * 1000,
+        )
+
+    results = {"unbatched": run(lambda x: vectorized_double([x])[0])}
+    for max_wait_ms in max_wait_ms_options:
+        batcher = CallBatcher(
+            vectorized_double, max_batch_size=concurrency, max_wait_ms=max_wait_ms
+        )
+        try:
+            results[f"batched, {max_wait_ms} ms window"] = run(batcher.call)
+        finally:
+            batcher.stop()
+
+    for mode, (throughput, mean_ms, p99_ms) in results.items():
+        print(
+            f"{mode}: {round(throughput)} calls/s, mean latency {round(mean_ms, 2)} ms, "
+            f"p99 latency {round(p99_ms, 2)} ms"
+        )
+    return results
+
+
+def run_queue_benchmark(num_items=200000, batch_size=1000, max_size=10000):
+    """Compare the throughput of a producer and consumer thread passing items through a bounded queue one at a time
+    vs. in batches, as of a stdlib queue.Queue (which rh.Queue used to wrap) vs. rh.Queue."""
+
+    def run(put, get, batched):
+        def produce():
+            if batched:
+                for i in range(0, num_items, batch_size):
+                    put(range(i, i + batch_size))
+            else:
+                for i in range(num_items):
+                    put(i)
+
+        producer = threading.Thread(target=produce)
+        start = time.time()
+        producer.start()
+        received = 0
+        while received < num_items:
+            received += len(get(batch_size)) if batched else get() is not None
+        producer.join()
+        return num_items / (time.time() - start)
+
+    results = {}
+    stdlib_queue = queue.Queue(maxsize=max_size)
+    results["queue.Queue, per item"] = run(
+        stdlib_queue.put, stdlib_queue.get, batched=False
+    )
+    # What rh.Queue.put_batch and get_batch used to do
+    results["queue.Queue, batches of single puts and gets"] = run(
+        lambda items: [stdlib_queue.put(item) for item in items],
+        lambda n: [stdlib_queue.get() for _ in range(n)],
+        batched=True,
+    )
+    rh_queue = rh.Queue(max_size=max_size)
+    results["rh.Queue, per item"] = run(rh_queue.put, rh_queue.get, batched=False)
+    results["rh.Queue, batched"] = run(
+        rh_queue.put_batch, rh_queue.get_batch, batched=True
+    )
+
+    for mode, rate in results.items():
+        print(f"{mode}: {round(rate)} items/s")
+    return results
+
+
+@pytest.mark.rnstest
+def test_queue_performance():
+    run_queue_benchmark()
+
+
+@pytest.mark.rnstest
+def test_batching_performance():
+    run_batching_benchmark()
+
+
+@pytest.mark.rnstest
+def test_process_pool_performance():
+    run_process_pool_benchmark()
+
+
+@pytest.mark.rnstest
+def test_event_loop_performance():
+    run_event_loop_benchmark()
+
+
+@pytest.mark.level("unit")
+def test_signature_cache():
+    module = SignatureModule()
+    for method in [module.summer, module.async_summer, SignatureModule.summer]:
+        assert module.method_signature(method) == Module._compute_method_signature(
+            method
+        )
+        assert module.method_signature(method) is module.method_signature(method)
+
+    # The bound and unbound versions of a method have different signatures
+    assert (
+        module.method_signature(module.summer)["signature"]
+        != module.method_signature(SignatureModule.summer)["signature"]
+    )
+    assert module.signature["async_summer"]["async"]
+
+
+@pytest.mark.rnstest
+def test_attribute_dispatch_performance():
+    run_dispatch_benchmark()
+
+
 @pytest.mark.rnstest
 def test_roundtrip_performance(summer_func):
     run_performance_tests(summer_func)
@@ -58,5 +369,10 @@ def test_https_roundtrip_performance(summer_func_with_auth):
     run_performance_tests(summer_func_with_auth)
 
 
+@pytest.mark.rnstest
+def test_server_throughput(summer_func):
+    run_throughput_test(summer_func)
+
+
 if __name__ == "__main__":
     unittest.main()
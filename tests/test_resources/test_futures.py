@@ -0,0 +1,109 @@
+import pickle
+import threading
+from concurrent.futures import CancelledError, TimeoutError
+
+import pytest
+
+import runhouse as rh
+
+
+class FakeClient:
+    """Reports runs as finished in the order given, one long-poll at a time."""
+
+    def __init__(self, finish_order):
+        self.finish_order = list(finish_order)
+        self.finished = {}
+        self.polls = 0
+
+    def wait_for_runs(self, keys, timeout=None):
+        self.polls += 1
+        if self.finish_order:
+            self.finished[self.finish_order.pop(0)] = "COMPLETED"
+        return {key: self.finished[key] for key in keys if key in self.finished}
+
+    def cancel(self, key):
+        self.finished[key] = "CANCELLED"
+        return True
+
+    def get(self, key, default=None):
+        if key == "failed_run":
+            raise ValueError("remote failure")
+        return f"result of {key}"
+
+
+@pytest.mark.level("unit")
+def test_remote_future_result():
+    client = FakeClient(["run_0"])
+    future = rh.RemoteFuture("run_0", client)
+
+    assert future == "run_0"
+    assert future.result() == "result of run_0"
+    assert future.done()
+    # Result is cached after the first fetch
+    assert future.result() == "result of run_0"
+    assert client.polls == 1
+
+    # Only the run key is sent along when pickled
+    assert pickle.loads(pickle.dumps(future)) == "run_0"
+
+
+@pytest.mark.level("unit")
+def test_remote_future_exception():
+    client = FakeClient(["failed_run"])
+    future = rh.RemoteFuture("failed_run", client)
+
+    with pytest.raises(ValueError, match="remote failure"):
+        future.result()
+    assert isinstance(future.exception(), ValueError)
+
+
+@pytest.mark.level("unit")
+def test_as_completed_batches_polls():
+    keys = [f"run_{i}" for i in range(10)]
+    client = FakeClient(reversed(keys))
+    futures = [rh.RemoteFuture(key, client) for key in keys]
+
+    completed = list(rh.as_completed(futures))
+
+    assert completed == list(reversed(keys))
+    # One long-poll per finished run for all futures, not one polling loop per future
+    assert client.polls == len(keys)
+
+
+@pytest.mark.level("unit")
+def test_as_completed_timeout():
+    future = rh.RemoteFuture("run_0", FakeClient([]))
+
+    with pytest.raises(TimeoutError):
+        list(rh.as_completed([future], timeout=0))
+
+    done, not_done = rh.wait([future], timeout=0)
+    assert not done and not_done == {future}
+
+
+@pytest.mark.level("unit")
+def test_add_done_callback():
+    client = FakeClient(["run_0"])
+    future = rh.RemoteFuture("run_0", client)
+    called = threading.Event()
+
+    future.add_done_callback(lambda f: called.set())
+    assert called.wait(timeout=5)
+
+    # Callbacks added after the run finished are called immediately
+    called_again = []
+    future.add_done_callback(called_again.append)
+    assert called_again == [future]
+
+
+@pytest.mark.level("unit")
+def test_cancel():
+    client = FakeClient([])
+    future = rh.RemoteFuture("run_0", client)
+
+    assert future.cancel()
+    assert future.cancelled()
+    with pytest.raises(CancelledError):
+        future.result()
+    # Already finished, so there's nothing to cancel
+    assert not future.cancel()
@@ -182,6 +182,28 @@ class TestFunction:
         pid_res = pid_blob.fetch()
         assert pid_res > 0
 
+    @pytest.mark.level("local")
+    def test_refs(self, cluster):
+        summer_fn = rh.function(summer).to(cluster)
+
+        # Pass results on to the next call on the cluster without fetching them
+        a = summer_fn.remote([1], [2])
+        b = summer_fn.run([3], [4])
+        b.result()
+        assert summer_fn(rh.ref(a), b=rh.ref(b)) == [1, 2, 3, 4]
+
+        cluster.put("summer_input", [0])
+        assert summer_fn(rh.ref("summer_input"), rh.ref(a)) == [0, 1, 2]
+
+    @pytest.mark.level("unit")
+    def test_ref_factory(self):
+        assert rh.ref("key") == rh.Ref("key")
+        assert rh.ref(rh.ref("key")) == rh.Ref("key")
+        assert rh.ref(rh.RemoteFuture("run_key", None)).key == "run_key"
+        assert rh.ref(rh.Blob(name="blob_key")).key == "blob_key"
+        with pytest.raises(TypeError):
+            rh.ref(5)
+
     @pytest.mark.skip("Install is way too heavy, choose a lighter example")
     @pytest.mark.level("local")
     def test_function_git_fn(self, cluster):
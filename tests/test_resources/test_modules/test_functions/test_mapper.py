@@ -1,11 +1,17 @@
 import logging
 import multiprocessing
 import os
+import threading
+import time
 import unittest
+import uuid
 
 import pytest
 
 import runhouse as rh
+from runhouse.resources.functionals.mapper import _Autoscaler, _ReplicaScheduler, Mapper
+from runhouse.resources.functions.function import _auto_chunksize
+from runhouse.resources.module import Module
 
 REMOTE_FUNC_NAME = "@/remote_function"
 
@@ -45,6 +51,21 @@ def getpid(a=0):
     return os.getpid() + a
 
 
+def sleep_and_return(delay=0):
+    time.sleep(delay)
+    return delay
+
+
+def fail_first_attempt(marker_dir, a):
+    # Each odd input fails the first time it's called, wherever that is
+    os.makedirs(marker_dir, exist_ok=True)
+    marker = os.path.join(marker_dir, str(a))
+    if a % 2 and not os.path.exists(marker):
+        open(marker, "w").close()
+        raise ValueError(f"First attempt at {a} failed")
+    return a
+
+
 def get_pid_and_ray_node(a=0):
     import ray
 
@@ -54,6 +75,60 @@ def get_pid_and_ray_node(a=0):
     )
 
 
+class FakeMapper:
+    """Stands in for a Mapper in autoscaler tests, with named strings as replicas."""
+
+    def __init__(self, num_replicas):
+        self.module = "replica"
+        self._auto_replicas = [f"replica_{i}" for i in range(num_replicas - 1)]
+        self._scheduler = _ReplicaScheduler()
+
+    @property
+    def replicas(self):
+        return [self.module] + self._auto_replicas
+
+    def _add_auto_replicas(self, num_replicas):
+        start = len(self._auto_replicas)
+        self._auto_replicas += [
+            f"replica_{i}" for i in range(start, start + num_replicas)
+        ]
+
+    def _reap_replicas(self, replicas):
+        self._auto_replicas = [r for r in self._auto_replicas if r not in replicas]
+
+
+class FakeReplica:
+    """Stands in for a local replica in retry tests. ``call`` raises a ValueError for input 1, and fails with a
+    ConnectionError the first time input 2 is called on any of the replicas sharing ``failed``."""
+
+    _call_chunk = Module._call_chunk
+
+    def __init__(self, name, failed):
+        self.name = name
+        self.failed = failed
+        self.calls = []
+
+    def _client(self):
+        return None
+
+    def call(self, a, **kwargs):
+        self.calls.append(a)
+        if a == 1:
+            raise ValueError(f"Bad input {a}")
+        if a == 2 and a not in self.failed:
+            self.failed.add(a)
+            raise ConnectionError(f"{self.name} is down")
+        return a
+
+
+def wait_for_decisions(autoscaler, num_decisions, timeout=10):
+    start = time.time()
+    while len(autoscaler.decisions) < num_decisions:
+        assert time.time() - start < timeout
+        time.sleep(0.05)
+    return autoscaler.decisions
+
+
 class TestMapper:
 
     """Testing strategy:
@@ -107,6 +182,236 @@ class TestMapper:
         # Test call
         assert len(set(mapper.call() for _ in range(4))) == 3
 
+    @pytest.mark.level("unit")
+    def test_scheduler_least_loaded(self):
+        replicas = ["replica_0", "replica_1", "replica_2"]
+        scheduler = _ReplicaScheduler("least_loaded", max_in_flight=2)
+
+        # Sequential calls are spread across replicas
+        for replica in replicas:
+            assert scheduler.acquire(replicas) == replica
+        # The next calls go to the least loaded replica
+        scheduler.release("replica_1")
+        assert scheduler.acquire(replicas) == "replica_1"
+        assert [scheduler.load(r) for r in replicas] == [1, 1, 1]
+
+        # Once every replica is at its cap, acquiring blocks until one is released
+        for _ in replicas:
+            scheduler.acquire(replicas)
+        acquired = []
+        waiter = threading.Thread(
+            target=lambda: acquired.append(scheduler.acquire(replicas))
+        )
+        waiter.start()
+        waiter.join(timeout=0.2)
+        assert not acquired
+        scheduler.release("replica_2")
+        waiter.join(timeout=5)
+        assert acquired == ["replica_2"]
+
+    @pytest.mark.level("unit")
+    def test_scheduler_drains_reaped_replicas(self):
+        replicas = ["replica_0", "replica_1"]
+        scheduler = _ReplicaScheduler("least_loaded", max_in_flight=1)
+        for replica in replicas:
+            scheduler.acquire(lambda: replicas)
+
+        # A call waiting for a free replica...
+        acquired = []
+        waiter = threading.Thread(
+            target=lambda: acquired.append(scheduler.acquire(lambda: replicas))
+        )
+        waiter.start()
+
+        # ...never gets one which was reaped while it waited
+        replicas.remove("replica_1")
+        reaper = threading.Thread(target=scheduler.drain, args=("replica_1",))
+        reaper.start()
+        reaper.join(timeout=0.2)
+        assert reaper.is_alive()
+        scheduler.release("replica_1")
+        reaper.join(timeout=5)
+        assert not reaper.is_alive()
+        waiter.join(timeout=0.2)
+        assert not acquired
+
+        scheduler.release("replica_0")
+        waiter.join(timeout=5)
+        assert acquired == ["replica_0"]
+
+        # Once the replica is forgotten, a new one can reuse its id
+        scheduler.forget("replica_1")
+        assert scheduler.acquire(["replica_1"]) == "replica_1"
+
+    @pytest.mark.level("unit")
+    def test_scheduler_is_picklable(self):
+        import pickle
+
+        scheduler = _ReplicaScheduler("power_of_two", max_in_flight=4)
+        scheduler.acquire(["replica_0"])
+        restored = pickle.loads(pickle.dumps(scheduler))
+        assert restored.policy == "power_of_two"
+        assert restored.max_in_flight == 4
+        assert restored.load("replica_0") == 0
+
+    @pytest.mark.level("local")
+    def test_mapper_imap(self, cluster):
+        sleep_fn = rh.function(sleep_and_return).to(cluster)
+        mapper = rh.mapper(sleep_fn, num_replicas=2, max_in_flight_per_replica=1)
+
+        # The slow call shouldn't hold up the results of the fast ones, which go to the other replica
+        delays = [2] + [0] * 5
+        assert list(mapper.imap_unordered(delays, chunksize=1))[-1] == 2
+        assert list(mapper.imap(delays, chunksize=1)) == delays
+
+    @pytest.mark.level("unit")
+    def test_scheduler_avoids_unhealthy_replicas(self):
+        replicas = ["replica_0", "replica_1"]
+        scheduler = _ReplicaScheduler("round_robin")
+
+        # A retry goes to a replica which hasn't failed the call yet
+        assert scheduler.acquire(replicas, exclude={id("replica_0")}) == "replica_1"
+        # ...unless they all have, in which case any replica is used
+        assert scheduler.acquire(replicas, exclude={id(r) for r in replicas})
+
+        for _ in range(_ReplicaScheduler.UNHEALTHY_AFTER_FAILURES):
+            assert scheduler.healthy("replica_0")
+            scheduler.record_result("replica_0", success=False)
+        assert not scheduler.healthy("replica_0")
+        assert all(scheduler.acquire(replicas) == "replica_1" for _ in range(4))
+
+        # A success resets the failure count
+        scheduler.record_result("replica_1", success=False)
+        scheduler.record_result("replica_1", success=True)
+        assert scheduler._failures.get(id("replica_1")) is None
+
+    @pytest.mark.level("unit")
+    def test_mapper_retries_replica_failures(self):
+        failed = set()
+        replicas = [FakeReplica("replica_0", failed), FakeReplica("replica_1", failed)]
+        mapper = Mapper(
+            replicas[0],
+            "call",
+            num_replicas=0,
+            replicas=replicas[1:],
+            scheduling="round_robin",
+            max_retries=2,
+            retry_backoff=0.01,
+        )
+        scheduler = mapper._scheduler
+
+        # Only the replica failure is retried, on the other replica, and counted against the replica's health.
+        # The error raised by the call itself is returned as is, without retrying.
+        for chunksize in [1, 3]:
+            for replica in replicas:
+                replica.calls = []
+            failed.clear()
+            scheduler._failures.clear()
+            results = mapper.map([0, 1, 2], return_exceptions=True, chunksize=chunksize)
+            assert results[0::2] == [0, 2]
+            assert isinstance(results[1], ValueError)
+            assert sum(replica.calls.count(1) for replica in replicas) == 1
+            assert [replica.calls.count(2) for replica in replicas] == [1, 1]
+            assert sum(scheduler._failures.values()) == 1
+            with pytest.raises(ValueError):
+                mapper.map([1], chunksize=chunksize)
+
+        # The exceptions to retry are configurable
+        mapper.retry_on = (ValueError,)
+        for replica in replicas:
+            replica.calls = []
+        with pytest.raises(ValueError):
+            mapper.call(1)
+        assert sum(replica.calls.count(1) for replica in replicas) == 3
+
+    @pytest.mark.level("local")
+    def test_mapper_retries(self, cluster):
+        fail_fn = rh.function(fail_first_attempt).to(cluster)
+        marker_dir = f"/tmp/mapper_retries_{uuid.uuid4().hex}"
+        inputs = list(range(10))
+
+        # Without retries, the failures are returned in place of the results
+        mapper = rh.mapper(fail_fn, num_replicas=2)
+        results = mapper.map([marker_dir] * 10, inputs, return_exceptions=True)
+        assert [r for r in results if not isinstance(r, Exception)] == inputs[::2]
+        assert all(isinstance(r, ValueError) for r in results[1::2])
+
+        # Errors raised by the function aren't retried unless they're in retry_on
+        marker_dir += "_retries"
+        mapper = rh.mapper(fail_fn, num_replicas=2, max_retries=2, retry_backoff=0.1)
+        with pytest.raises(ValueError):
+            mapper.map([marker_dir] * 10, inputs, chunksize=3)
+
+        # With retries, each failure is retried and succeeds
+        marker_dir += "_retry_on"
+        mapper = rh.mapper(
+            fail_fn,
+            num_replicas=2,
+            max_retries=2,
+            retry_backoff=0.1,
+            retry_on=(ValueError,),
+        )
+        assert mapper.map([marker_dir] * 10, inputs, chunksize=3) == inputs
+
+    @pytest.mark.level("unit")
+    def test_autoscaler(self):
+        mapper = FakeMapper(num_replicas=2)
+        autoscaler = _Autoscaler(
+            target_latency=1, min_replicas=2, max_replicas=5, cooldown=0.5
+        )
+
+        # Too few samples to scale on
+        autoscaler.record(mapper, mapper.module, 0.5)
+        assert autoscaler.latency_percentile() is None
+
+        # Latency at 2x the target doubles the replicas
+        for _ in range(_Autoscaler.MIN_SAMPLES):
+            autoscaler.record(mapper, mapper.module, 2)
+        decision = wait_for_decisions(autoscaler, 1)[0]
+        assert decision["action"] == "scale_up"
+        assert (decision["from_replicas"], decision["to_replicas"]) == (2, 4)
+        assert len(mapper.replicas) == 4
+
+        # Once idle, the auto replicas are reaped down to the minimum, but not below it
+        start = time.time()
+        while len(mapper.replicas) > 2:
+            assert time.time() - start < 10
+            time.sleep(0.05)
+        time.sleep(1)
+        assert len(mapper.replicas) == 2
+        decisions = autoscaler.decisions[1:]
+        assert all(decision["action"] == "scale_down" for decision in decisions)
+        assert decisions[-1]["to_replicas"] == 2
+
+        # The max is respected
+        for _ in range(_Autoscaler.MIN_SAMPLES):
+            autoscaler.record(mapper, mapper.module, 100)
+        decision = wait_for_decisions(autoscaler, len(decisions) + 2)[-1]
+        assert decision["action"] == "scale_up"
+        assert decision["to_replicas"] == 5
+
+    @pytest.mark.level("unit")
+    def test_auto_chunksize(self):
+        # Fast calls are batched, but still spread over a few chunks per worker
+        assert _auto_chunksize(1000, num_workers=2, latency=0.0001) == 125
+        assert _auto_chunksize(100000, num_workers=2, latency=0.0001) == 1000
+        # Slow calls each get their own chunk
+        assert _auto_chunksize(1000, num_workers=2, latency=1) == 1
+        assert _auto_chunksize(0, num_workers=2, latency=0) == 1
+
+    @pytest.mark.level("local")
+    def test_mapper_chunksize(self, cluster):
+        summer_fn = rh.function(summer).to(cluster)
+        mapper = rh.mapper(summer_fn, num_replicas=2)
+        inputs = list(range(100))
+        expected = [a + 1 for a in inputs]
+
+        assert mapper.map(inputs, [1] * 100, chunksize=7) == expected
+        assert mapper.starmap(list(zip(inputs, [1] * 100))) == expected
+        assert (
+            sorted(mapper.imap_unordered(inputs, [1] * 100, chunksize=10)) == expected
+        )
+
     @pytest.mark.level("thorough")
     def test_multinode_map(self, multinode_cpu_cluster):
         num_replicas = 6
@@ -0,0 +1,105 @@
+import inspect
+import unittest
+
+import pytest
+
+import runhouse as rh
+
+
+def tokenize(text):
+    return text.split()
+
+
+def count(tokens):
+    return len(tokens)
+
+
+def add_one(x):
+    return x + 1
+
+
+def split_lines(text):
+    for line in text.splitlines():
+        yield line
+
+
+def fail(x):
+    raise ValueError(f"Step failed on {x}")
+
+
+class Scaler(rh.Module):
+    def __init__(self, factor):
+        super().__init__()
+        self.factor = factor
+
+    def scale(self, x):
+        return x * self.factor
+
+    async def async_scale(self, x):
+        return x * self.factor
+
+
+class TestPipeline:
+    @pytest.mark.level("unit")
+    def test_pipeline_step_validation(self):
+        with pytest.raises(ValueError, match="at least one step"):
+            rh.pipeline()
+
+        with pytest.raises(TypeError):
+            rh.pipeline(42)
+
+        # Steps must already be on a cluster, so they can be called there
+        with pytest.raises(ValueError, match="sent to a cluster"):
+            rh.pipeline(rh.function(add_one))
+
+    @pytest.mark.level("unit")
+    def test_pipeline_signature(self):
+        # Only run_stream streams when called remotely, even if a step is a generator
+        signature = rh.Pipeline([("split_lines", "call", True)]).signature
+        assert not signature["run"]["gen"]
+        assert signature["run_stream"]["gen"]
+
+    @pytest.mark.level("local")
+    def test_pipeline(self, cluster):
+        tokenize_fn = rh.function(tokenize).to(cluster)
+        count_fn = rh.function(count).to(cluster)
+        add_one_fn = rh.function(add_one).to(cluster)
+        scaler = rh.module(Scaler).to(cluster)(2, name="scaler")
+
+        pipe = rh.pipeline(
+            tokenize_fn, count_fn, add_one_fn, scaler.scale, (scaler, "async_scale")
+        )
+        assert pipe.run("the quick brown fox") == 20
+
+        with pytest.raises(ValueError, match="Step failed"):
+            rh.pipeline(add_one_fn, rh.function(fail).to(cluster)).run(1)
+
+    @pytest.mark.level("local")
+    def test_streaming_pipeline(self, cluster):
+        split_fn = rh.function(split_lines).to(cluster)
+        tokenize_fn = rh.function(tokenize).to(cluster)
+        count_fn = rh.function(count).to(cluster)
+
+        pipe = rh.pipeline(split_fn, tokenize_fn, count_fn)
+        text = "one\ntwo words\nand three words"
+        # Streamed back through the cluster's HTTP client as each line's count is ready
+        counts = pipe.run_stream(text)
+        assert inspect.isgenerator(counts)
+        assert list(counts) == [1, 2, 3]
+        assert pipe.run(text) == [1, 2, 3]
+
+        # A pipeline without generator steps streams its single result
+        assert list(rh.pipeline(tokenize_fn, count_fn).run_stream("a b")) == [2]
+
+    @pytest.mark.level("local")
+    def test_pipeline_across_envs(self, cluster):
+        add_one_fn = rh.function(add_one).to(cluster, env=rh.env(name="pipeline_env_a"))
+        count_fn = rh.function(count).to(cluster, env=rh.env(name="pipeline_env_b"))
+        tokenize_fn = rh.function(tokenize).to(cluster)
+
+        pipe = rh.pipeline(tokenize_fn, count_fn, add_one_fn, name="count_plus_one")
+        assert pipe.run("a b c") == 4
+
+
+if __name__ == "__main__":
+    unittest.main()
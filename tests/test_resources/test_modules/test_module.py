@@ -1,8 +1,10 @@
 import inspect
 import logging
 import os
+import sys
 import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import pandas as pd
@@ -109,6 +111,53 @@ class Calculator:
         return a * b
 
 
+class Embedder:
+    def __init__(self):
+        self.calls = 0
+
+    @rh.cached(maxsize=2)
+    def embed(self, text):
+        self.calls += 1
+        return [ord(c) for c in text]
+
+    def num_calls(self):
+        return self.calls
+
+
+class Scorer:
+    def __init__(self):
+        self.batch_sizes = []
+
+    @rh.batched(max_batch_size=8, max_wait_ms=50)
+    def score(self, inputs):
+        self.batch_sizes.append(len(inputs))
+        return (np.array(inputs) * 2).tolist()
+
+    def get_batch_sizes(self):
+        return self.batch_sizes
+
+
+class ConfigStore:
+    def __init__(self):
+        self.loads = 0
+
+    @rh.single_flight
+    def load(self, path):
+        self.loads += 1
+        time.sleep(1)
+        return {"path": path}
+
+    @rh.single_flight
+    def stream(self, n):
+        self.loads += 1
+        for i in range(n):
+            time.sleep(0.2)
+            yield i
+
+    def num_loads(self):
+        return self.loads
+
+
 @pytest.mark.usefixtures("cluster")
 class TestModule:
 
@@ -283,6 +332,28 @@ class TestModule:
         assert resolved_obj.size == 20  # resolved_obj.remote.size causing an error
         assert resolved_obj.config_for_rns == remote_df.config_for_rns
 
+    @pytest.mark.level("local")
+    def test_fork_replicas(self, cluster, env):
+        remote_df = SlowPandas(size=3).to(cluster, env, name="forked_df")
+        remote_df.size = 7
+
+        replicas = remote_df.replicate(num_replicas=2, fork=True)
+        assert [replica.name for replica in replicas] == [
+            "forked_df_replica_0",
+            "forked_df_replica_1",
+        ]
+        for i, replica in enumerate(replicas):
+            assert replica.system == cluster
+            assert replica.env.name == f"{remote_df.env.name}_replica_{i}"
+            # State is copied from the running module, not reconstructed from its config
+            assert replica.remote.size == 7
+            assert replica.cpu_count(local=False) == remote_df.cpu_count(local=False)
+
+        # Replicas are independent copies
+        replicas[0].size = 1
+        assert replicas[1].remote.size == 7
+        assert remote_df.remote.size == 7
+
     @pytest.mark.asyncio
     @pytest.mark.parametrize("env", [None])
     @pytest.mark.level("local")
@@ -516,6 +587,9 @@ class TestModule:
                 "async": False,
                 "gen": False,
                 "local": True,
+                "cache": None,
+                "batch": None,
+                "single_flight": None,
             },
             "factory_constructor": {
                 "signature": "(size=5)",
@@ -523,6 +597,9 @@ class TestModule:
                 "async": False,
                 "gen": False,
                 "local": False,
+                "cache": None,
+                "batch": None,
+                "single_flight": None,
             },
             "size_minus_cpus": {
                 "signature": "(self)",
@@ -530,6 +607,9 @@ class TestModule:
                 "async": False,
                 "gen": False,
                 "local": False,
+                "cache": None,
+                "batch": None,
+                "single_flight": None,
             },
             "slow_iter": {
                 "signature": "(self)",
@@ -537,6 +617,9 @@ class TestModule:
                 "async": False,
                 "gen": True,
                 "local": False,
+                "cache": None,
+                "batch": None,
+                "single_flight": None,
             },
         }
 
@@ -557,6 +640,9 @@ class TestModule:
                 "async": False,
                 "gen": False,
                 "local": False,
+                "cache": None,
+                "batch": None,
+                "single_flight": None,
                 "property": True,
                 "signature": None,
             },
@@ -564,6 +650,9 @@ class TestModule:
                 "async": False,
                 "gen": False,
                 "local": True,
+                "cache": None,
+                "batch": None,
+                "single_flight": None,
                 "property": False,
                 "signature": "(self, local=True)",
             },
@@ -571,6 +660,9 @@ class TestModule:
                 "async": True,
                 "gen": False,
                 "local": True,
+                "cache": None,
+                "batch": None,
+                "single_flight": None,
                 "property": False,
                 "signature": "(self, local=True)",
             },
@@ -578,6 +670,9 @@ class TestModule:
                 "async": False,
                 "gen": False,
                 "local": False,
+                "cache": None,
+                "batch": None,
+                "single_flight": None,
                 "property": True,
                 "signature": None,
             },
@@ -585,6 +680,9 @@ class TestModule:
                 "async": False,
                 "gen": False,
                 "local": False,
+                "cache": None,
+                "batch": None,
+                "single_flight": None,
                 "property": True,
                 "signature": None,
             },
@@ -592,6 +690,9 @@ class TestModule:
                 "async": False,
                 "gen": True,
                 "local": False,
+                "cache": None,
+                "batch": None,
+                "single_flight": None,
                 "property": False,
                 "signature": "(self)",
             },
@@ -599,6 +700,9 @@ class TestModule:
                 "async": True,
                 "gen": True,
                 "local": False,
+                "cache": None,
+                "batch": None,
+                "single_flight": None,
                 "property": False,
                 "signature": "(self)",
             },
@@ -619,6 +723,9 @@ class TestModule:
                 "async": False,
                 "gen": False,
                 "local": False,
+                "cache": None,
+                "batch": None,
+                "single_flight": None,
             },
             "importer": {
                 "signature": None,
@@ -626,6 +733,9 @@ class TestModule:
                 "async": False,
                 "gen": False,
                 "local": False,
+                "cache": None,
+                "batch": None,
+                "single_flight": None,
             },
             "mult": {
                 "signature": "(self, a: int, b: int)",
@@ -633,6 +743,9 @@ class TestModule:
                 "async": False,
                 "gen": False,
                 "local": False,
+                "cache": None,
+                "batch": None,
+                "single_flight": None,
             },
             "sub": {
                 "signature": "(self, a: int, b: int)",
@@ -640,6 +753,9 @@ class TestModule:
                 "async": False,
                 "gen": False,
                 "local": False,
+                "cache": None,
+                "batch": None,
+                "single_flight": None,
             },
             "summer": {
                 "signature": "(self, a: int, b: int)",
@@ -647,9 +763,142 @@ class TestModule:
                 "async": False,
                 "gen": False,
                 "local": False,
+                "cache": None,
+                "batch": None,
+                "single_flight": None,
             },
         }
 
+    @pytest.mark.level("unit")
+    def test_cached_signature(self):
+        RemoteEmbedder = rh.module(Embedder)
+        assert RemoteEmbedder.signature["embed"]["cache"] == {
+            "maxsize": 2,
+            "max_bytes": None,
+            "ttl": None,
+        }
+        assert RemoteEmbedder.signature["num_calls"]["cache"] is None
+
+        # Also usable bare, or with positional args
+        @rh.cached
+        def embed_bare(text):
+            return text
+
+        @rh.cached(1000)
+        def embed_positional(text):
+            return text
+
+        assert embed_bare.__rh_cache__ == {
+            "maxsize": 128,
+            "max_bytes": None,
+            "ttl": None,
+        }
+        assert embed_positional.__rh_cache__["maxsize"] == 1000
+
+    @pytest.mark.parametrize("env", [None])
+    @pytest.mark.level("local")
+    def test_cached_method(self, cluster, env):
+        RemoteEmbedder = rh.module(Embedder).to(cluster, env=env)
+        embedder = RemoteEmbedder(name="cached_embedder")
+
+        assert embedder.embed("a") == [97]
+        assert embedder.embed("a") == [97]
+        assert embedder.num_calls() == 1
+
+        # Only the two most recently used results are kept
+        embedder.embed("b")
+        embedder.embed("c")
+        assert embedder.embed("a") == [97]
+        assert embedder.num_calls() == 4
+
+    @pytest.mark.level("unit")
+    def test_batched_signature(self):
+        RemoteScorer = rh.module(Scorer)
+        assert RemoteScorer.signature["score"]["batch"] == {
+            "max_batch_size": 8,
+            "max_wait_ms": 50,
+        }
+        assert RemoteScorer.signature["get_batch_sizes"]["batch"] is None
+
+        # Also usable bare, or with positional args
+        @rh.batched
+        def score_bare(inputs):
+            return inputs
+
+        @rh.batched(64, 5)
+        def score_positional(inputs):
+            return inputs
+
+        assert score_bare.__rh_batch__ == {"max_batch_size": 32, "max_wait_ms": 10}
+        assert score_positional.__rh_batch__ == {
+            "max_batch_size": 64,
+            "max_wait_ms": 5,
+        }
+
+    @pytest.mark.parametrize("env", [None])
+    @pytest.mark.level("local")
+    def test_batched_method(self, cluster, env):
+        RemoteScorer = rh.module(Scorer).to(cluster, env=env)
+        scorer = RemoteScorer(name="batched_scorer")
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(scorer.score, range(16)))
+
+        # Each caller gets its own result, though the calls ran in a few batches
+        assert results == [i * 2 for i in range(16)]
+        batch_sizes = scorer.get_batch_sizes()
+        assert sum(batch_sizes) == 16
+        assert len(batch_sizes) < 16
+        assert max(batch_sizes) <= 8
+
+    @pytest.mark.parametrize("env", [None])
+    @pytest.mark.level("local")
+    def test_single_flight_method(self, cluster, env):
+        RemoteConfigStore = rh.module(ConfigStore).to(cluster, env=env)
+        store = RemoteConfigStore(name="single_flight_store")
+        assert RemoteConfigStore.signature["load"]["single_flight"] is True
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(store.load, ["config.yaml"] * 8))
+        assert results == [{"path": "config.yaml"}] * 8
+        assert store.num_loads() == 1
+
+        # Different arguments run separately
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(store.load, ["a.yaml", "b.yaml"]))
+        assert store.num_loads() == 3
+
+        # Calls to a generator attaching partway through get all of its items
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            first = executor.submit(lambda: list(store.stream(5)))
+            time.sleep(0.5)
+            second = executor.submit(lambda: list(store.stream(5)))
+            assert first.result() == second.result() == list(range(5))
+        assert store.num_loads() == 4
+
+    @pytest.mark.level("unit")
+    def test_get_obj_from_pointers_reloads_on_change(self, tmp_path):
+        module_file = tmp_path / "pointer_cache_module.py"
+        module_file.write_text("def get_value():\n    return 1\n")
+        pointers = (str(tmp_path), "pointer_cache_module", "get_value")
+
+        fn = rh.Module._get_obj_from_pointers(*pointers)
+        assert fn() == 1
+        # Warm lookups return the cached object without reloading or growing sys.path
+        assert rh.Module._get_obj_from_pointers(*pointers) is fn
+        assert rh.Module._get_obj_from_pointers(*pointers) is fn
+        assert sys.path.count(str(tmp_path)) == 1
+
+        # Touching the file without changing its contents doesn't trigger a reload
+        stat = os.stat(module_file)
+        os.utime(module_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert rh.Module._get_obj_from_pointers(*pointers) is fn
+
+        module_file.write_text("def get_value():\n    return 2\n")
+        stat = os.stat(module_file)
+        os.utime(module_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+        assert rh.Module._get_obj_from_pointers(*pointers)() == 2
+
     @pytest.mark.level("thorough")
     def test_shared_readonly(
         self,
@@ -0,0 +1,173 @@
+import os
+import queue
+import threading
+
+import pytest
+
+import runhouse as rh
+
+
+@pytest.mark.level("unit")
+def test_queue_put_and_get_batch():
+    q = rh.Queue()
+    q.put_batch(range(10))
+    q.put(10)
+    assert q.qsize() == 11
+    assert not q.empty()
+    assert not q.full()
+
+    assert q.get_batch(4) == [0, 1, 2, 3]
+    assert q.get() == 4
+    # Returns what's available rather than waiting for a full batch
+    assert q.get_batch(100) == list(range(5, 11))
+    assert q.empty()
+
+    with pytest.raises(queue.Empty):
+        q.get(timeout=0.05)
+    with pytest.raises(queue.Empty):
+        q.get_batch(10, block=False)
+    with pytest.raises(queue.Empty):
+        q.get_nowait()
+
+
+@pytest.mark.level("unit")
+def test_bounded_queue():
+    q = rh.Queue(max_size=3)
+    with pytest.raises(queue.Full):
+        q.put_batch([1, 2, 3, 4], timeout=0.05)
+    # The items which fit were still put
+    assert q.full()
+    assert q.get_batch(10) == [1, 2, 3]
+
+    q.put_batch([1, 2, 3])
+    with pytest.raises(queue.Full):
+        q.put_nowait(4)
+
+
+@pytest.mark.level("unit")
+def test_queue_producers_and_consumers():
+    q = rh.Queue(max_size=16)
+    num_producers, num_items = 4, 5000
+    results = []
+    lock = threading.Lock()
+
+    def produce(producer):
+        for i in range(0, num_items, 50):
+            q.put_batch([(producer, j) for j in range(i, i + 50)])
+
+    def consume():
+        while True:
+            try:
+                items = q.get_batch(64, timeout=0.5)
+            except queue.Empty:
+                return
+            with lock:
+                results.extend(items)
+
+    threads = [threading.Thread(target=consume) for _ in range(4)]
+    threads += [
+        threading.Thread(target=produce, args=(p,)) for p in range(num_producers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [
+        (p, i) for p in range(num_producers) for i in range(num_items)
+    ]
+
+
+@pytest.mark.level("unit")
+def test_queue_iter_stops_early():
+    q = rh.Queue()
+    q.put_batch(range(10))
+    for item in q:
+        if item == 2:
+            break
+    # Items fetched in the same batch as those consumed but not yielded are left in the queue, in order
+    assert q.qsize() == 7
+    assert q.get_batch(10) == list(range(3, 10))
+
+    q.put_batch(range(10, 13))
+    q.put_front([8, 9])
+    assert next(iter(q)) == 8
+    assert q.get_batch(10) == [9, 10, 11, 12]
+
+
+@pytest.mark.level("unit")
+def test_queue_subscribers_and_join():
+    q = rh.Queue()
+    doubled = rh.Queue()
+    q.subscribe(lambda x: x * 2, doubled)
+    q.put_batch([1, 2, 3])
+    assert doubled.get_batch(10) == [2, 4, 6]
+
+    q.get_batch(3)
+    for _ in range(3):
+        q.task_done()
+    q.join()
+    with pytest.raises(ValueError):
+        q.task_done()
+
+
+@pytest.mark.level("unit")
+def test_queue_spills_to_disk(tmp_path):
+    q = rh.Queue(max_memory_items=10, spill_dir=str(tmp_path))
+    q.data.spill.segment_bytes = 100
+    q.put_batch(range(100))
+
+    usage = q.usage()
+    assert usage["memory_items"] == 10
+    assert usage["disk_items"] == 90
+    assert usage["disk_bytes"] > 0
+    assert q.qsize() == 100
+    spill_dir = q.data.spill.directory
+    assert len(os.listdir(spill_dir)) > 1
+
+    # Items come out in the order they were put, including those put after the queue started spilling
+    assert q.get_batch(25) == list(range(25))
+    q.put_batch(range(100, 105))
+    items = []
+    while not q.empty():
+        items += q.get_batch(7)
+    assert items == list(range(25, 105))
+
+    # Segments are deleted once they've been read
+    assert q.usage() == {"memory_items": 0, "disk_items": 0, "disk_bytes": 0}
+    assert os.listdir(spill_dir) == []
+
+
+@pytest.mark.level("unit")
+def test_queue_spills_unpicklable_items(tmp_path):
+    class Point:
+        def __init__(self, x):
+            self.x = x
+
+    q = rh.Queue(max_memory_items=1, spill_dir=str(tmp_path))
+    # Lambdas and locally defined classes can't be pickled with the stdlib pickle, so they're spilled with cloudpickle
+    q.put_batch([0, lambda x: x + 1, Point(2)])
+    assert q.usage()["disk_items"] == 2
+
+    first, add_one, point = q.get_batch(3)
+    assert first == 0
+    assert add_one(1) == 2
+    assert point.x == 2
+
+
+@pytest.mark.level("unit")
+def test_spilling_queue_slow_consumer(tmp_path):
+    q = rh.Queue(max_memory_items=50, spill_dir=str(tmp_path))
+    num_items = 20000
+    results = []
+
+    def consume():
+        while len(results) < num_items:
+            results.extend(q.get_batch(13, timeout=5))
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    for i in range(0, num_items, 7):
+        q.put_batch(range(i, min(i + 7, num_items)))
+    consumer.join()
+    assert results == list(range(num_items))
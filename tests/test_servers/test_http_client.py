@@ -1,20 +1,28 @@
+import asyncio
+import hashlib
 import inspect
 import json
+import pickle
+import threading
 import unittest
 from unittest.mock import ANY, MagicMock, Mock, mock_open, patch
 
+import httpx
 import pytest
 
 import runhouse as rh
-from runhouse.constants import DEFAULT_SERVER_PORT
+from runhouse.constants import ARG_DEDUP_THRESHOLD, DEFAULT_SERVER_PORT
 
 from runhouse.globals import rns_client
 
 from runhouse.servers.http import HTTPClient
 from runhouse.servers.http.http_utils import (
+    b64_unpickle,
+    CachedArg,
     DeleteObjectParams,
     pickle_b64,
     PutObjectParams,
+    unpickle_chunks,
 )
 
 
@@ -149,6 +157,8 @@ class TestHTTPClient:
             "key": None,
             "remote": False,
             "run_async": False,
+            "timeout": None,
+            "priority": None,
         }
         expected_headers = rns_client.request_headers()
 
@@ -159,6 +169,32 @@ class TestHTTPClient:
             headers=expected_headers,
         )
 
+    @pytest.mark.level("unit")
+    @patch("requests.Session.post")
+    def test_call_module_method_stream_batches(self, mock_post):
+        def frame(items):
+            return json.dumps(
+                {
+                    "output_type": "result_stream_batch",
+                    "data": pickle_b64([pickle.dumps(item) for item in items]),
+                }
+            )
+
+        response_sequence = [
+            frame(range(3)),
+            json.dumps({"output_type": "result_stream", "data": pickle_b64(3)}),
+            frame(range(4, 10)),
+            json.dumps({"output_type": "success_stream"}),
+        ]
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.iter_lines.return_value = iter(response_sequence)
+        mock_post.return_value = mock_response
+
+        # Frames of several results are unpacked so the generator still yields them one by one
+        result_generator = self.client.call_module_method("module", "generate")
+        assert list(result_generator) == list(range(10))
+
     @pytest.mark.level("unit")
     @patch("requests.Session.post")
     def test_call_module_method_with_args_kwargs(self, mock_post):
@@ -190,6 +226,8 @@ class TestHTTPClient:
             "key": None,
             "remote": False,
             "run_async": False,
+            "timeout": None,
+            "priority": None,
         }
         expected_url = f"http://localhost:32300/{module_name}/{method_name}"
         expected_headers = rns_client.request_headers()
@@ -201,6 +239,68 @@ class TestHTTPClient:
             headers=expected_headers,
         )
 
+    @pytest.mark.level("unit")
+    @patch("requests.Session.post")
+    def test_call_module_method_dedups_large_args(self, mock_post):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.iter_lines.side_effect = lambda chunk_size=None: iter(
+            [json.dumps({"output_type": "result", "data": pickle_b64("result")})]
+        )
+        mock_post.return_value = mock_response
+
+        table = list(range(ARG_DEDUP_THRESHOLD // 4))
+        held = set()
+
+        def missing_args(endpoint, req_type, json_dict, err_str):
+            assert len(json_dict["digests"]) == 1
+            return [d for d in json_dict["digests"] if d not in held]
+
+        def upload(endpoint, f, params, err_str):
+            assert params["module"] == "module"
+            assert hashlib.sha256(f.read()).hexdigest() == params["digest"]
+            held.add(params["digest"])
+
+        with patch.object(
+            self.client, "request_json", side_effect=missing_args
+        ), patch.object(
+            self.client, "request_stream", side_effect=upload
+        ) as mock_upload:
+            for _ in range(3):
+                assert (
+                    self.client.call_module_method(
+                        "module", "lookup", args=[table], kwargs={"key": 1}
+                    )
+                    == "result"
+                )
+
+        # Only uploaded once, and sent by its digest in each call
+        assert mock_upload.call_count == 1
+        call_args, call_kwargs = b64_unpickle(
+            mock_post.call_args.kwargs["json"]["data"]
+        )
+        assert isinstance(call_args[0], CachedArg) and call_args[0].digest in held
+        assert call_kwargs == {"key": 1}
+
+    @pytest.mark.level("unit")
+    def test_digest_args_only_pickles_large_args(self):
+        pickled = []
+
+        class Tracked:
+            def __reduce__(self):
+                pickled.append(self)
+                return (Tracked, ())
+
+        blob = b"x" * ARG_DEDUP_THRESHOLD
+        args, kwargs, arg_blobs = HTTPClient._digest_args(
+            [Tracked(), [1, 2, 3]], {"blob": blob, "small": {"a": Tracked()}}
+        )
+        # Small arguments aren't pickled just to measure them
+        assert not pickled
+        assert isinstance(kwargs["blob"], CachedArg)
+        assert pickle.loads(arg_blobs[kwargs["blob"].digest]) == blob
+        assert args[1] == [1, 2, 3] and kwargs["small"]["a"].__class__ is Tracked
+
     @pytest.mark.level("unit")
     @patch("requests.Session.post")
     def test_call_module_method_error_handling(self, mock_post):
@@ -265,6 +365,84 @@ class TestHTTPClient:
 
         assert f"key {missing_key} not found" in str(context)
 
+    @pytest.mark.level("unit")
+    @pytest.mark.asyncio
+    async def test_call_module_method_async(self):
+        response_sequence = [
+            json.dumps(
+                {"output_type": "result_stream", "data": pickle_b64("stream_result_1")}
+            ),
+            json.dumps(
+                {"output_type": "result_stream", "data": pickle_b64("stream_result_2")}
+            ),
+            json.dumps({"output_type": "result", "data": pickle_b64("final_result")}),
+        ]
+        requests_seen = []
+
+        def handler(request):
+            requests_seen.append(request)
+            return httpx.Response(200, text="\n".join(response_sequence))
+
+        mock_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with patch.object(self.client, "_get_async_client", return_value=mock_client):
+            result_generator = await self.client.call_module_method_async(
+                "base_env", "install"
+            )
+            results = [result async for result in result_generator]
+
+        assert results == ["stream_result_1", "stream_result_2", "final_result"]
+        assert len(requests_seen) == 1
+        assert str(requests_seen[0].url) == self.client._formatted_url(
+            "base_env/install"
+        )
+
+    @pytest.mark.level("unit")
+    @pytest.mark.asyncio
+    async def test_get_async_missing_key(self):
+        def handler(request):
+            return httpx.Response(
+                200, text=json.dumps({"output_type": "not_found", "data": "missing"})
+            )
+
+        mock_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with patch.object(self.client, "_get_async_client", return_value=mock_client):
+            # Like get, a missing key returns the default unless the default is KeyError
+            assert await self.client.get_async("missing") is None
+            assert await self.client.get_async("missing", default=5) == 5
+            with pytest.raises(KeyError):
+                await self.client.get_async("missing", default=KeyError)
+
+    @pytest.mark.level("unit")
+    def test_async_client_per_loop(self):
+        async def get_client():
+            client = self.client._get_async_client()
+            assert self.client._get_async_client() is client
+            return client
+
+        # Each loop gets its own client, and the clients of closed loops are dropped
+        first = asyncio.run(get_client())
+        second = asyncio.run(get_client())
+        assert first is not second
+        assert first not in self.client._async_clients.values()
+
+        # Loops running at the same time in different threads each keep their own client
+        loops = [asyncio.new_event_loop() for _ in range(2)]
+        threads = [threading.Thread(target=loop.run_forever) for loop in loops]
+        for thread in threads:
+            thread.start()
+        try:
+            clients = [
+                asyncio.run_coroutine_threadsafe(get_client(), loop).result()
+                for loop in loops * 2
+            ]
+            assert clients[:2] == clients[2:]
+            assert clients[0] is not clients[1]
+        finally:
+            for loop, thread in zip(loops, threads):
+                loop.call_soon_threadsafe(loop.stop)
+                thread.join()
+                loop.close()
+
     @pytest.mark.level("unit")
     @patch("runhouse.servers.http.HTTPClient.request_json")
     def test_put_object(self, mock_request):
@@ -286,6 +464,30 @@ class TestHTTPClient:
         assert actual_data.serialized_data == expected_data
         assert actual_data.serialization == "pickle"
 
+    @pytest.mark.level("unit")
+    @patch("runhouse.servers.http.http_client.CHUNKED_UPLOAD_THRESHOLD", 64)
+    @patch("runhouse.servers.http.HTTPClient.request_stream")
+    def test_put_object_streams_large_payloads(self, mock_request_stream):
+        key = "my_big_list"
+        value = list(range(1000))
+        uploaded_chunks = []
+
+        def read_chunks(endpoint, f, params=None, err_str=None):
+            uploaded_chunks.extend(HTTPClient._iter_chunks(f, chunk_size=100))
+
+        mock_request_stream.side_effect = read_chunks
+
+        self.client.put_object(key, value)
+
+        mock_request_stream.assert_called_once_with(
+            "object/stream",
+            ANY,
+            params={"key": key},
+            err_str=f"Error putting object {key}",
+        )
+        assert len(uploaded_chunks) > 1
+        assert unpickle_chunks(uploaded_chunks) == value
+
     @pytest.mark.level("unit")
     @patch("runhouse.servers.http.HTTPClient.request")
     def test_get_keys(self, mock_request):
@@ -298,6 +500,19 @@ class TestHTTPClient:
         self.client.keys(env=test_env)
         mock_request.assert_called_with(f"keys/?env_name={test_env}", req_type="get")
 
+    @pytest.mark.level("unit")
+    @patch("runhouse.servers.http.HTTPClient.request_json")
+    def test_cancel(self, mock_request):
+        mock_request.return_value = True
+
+        assert self.client.cancel("my_run")
+        mock_request.assert_called_once_with(
+            "cancel",
+            req_type="post",
+            json_dict={"key": "my_run"},
+            err_str="Error cancelling run my_run",
+        )
+
     @pytest.mark.level("unit")
     @patch("runhouse.servers.http.HTTPClient.request_json")
     def test_delete(self, mock_request):
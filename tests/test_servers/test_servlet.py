@@ -1,18 +1,433 @@
+import asyncio
+import hashlib
+import multiprocessing
+import pickle
 import tempfile
+import threading
+import time
+from argparse import Namespace
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ThreadPoolExecutor
 from pathlib import Path
 
 import pytest
+import ray
 
 import runhouse as rh
+from runhouse.constants import (
+    CALL_PRIORITY_POOL_SIZES,
+    ENV_SERVLET_CONCURRENCY_GROUPS,
+    PROCESS_POOL_SHM_THRESHOLD,
+)
+from runhouse.resources.provenance import RunStatus
+from runhouse.servers import env_servlet
+from runhouse.servers.env_servlet import (
+    call_concurrency_group,
+    CallBatcher,
+    EnvServlet,
+    EventLoopThread,
+    ResultCache,
+    SingleFlight,
+)
 from runhouse.servers.http.auth import hash_token
 from runhouse.servers.http.http_server import HTTPServer
-from runhouse.servers.http.http_utils import b64_unpickle, Message, pickle_b64
+from runhouse.servers.http.http_utils import (
+    ArgCacheMiss,
+    b64_unpickle,
+    CachedArg,
+    Message,
+    pickle_b64,
+)
 from runhouse.servers.obj_store import ObjStore
 
 from tests.test_servers.conftest import summer
 from tests.utils import friend_account
 
 
+async def slow_count(n, delay=0.05):
+    for i in range(n):
+        await asyncio.sleep(delay)
+        yield i
+
+
+@pytest.mark.level("unit")
+def test_event_loop_cancellation():
+    event_loop = EventLoopThread()
+    cancel_event = threading.Event()
+    results = []
+
+    # Cancelling stops the async generator partway, rather than letting it run to the end
+    threading.Timer(0.2, cancel_event.set).start()
+    start = time.time()
+    with pytest.raises(CancelledError):
+        event_loop.drain(slow_count(100), results.append, cancel_event)
+    assert time.time() - start < 2
+    assert 0 < len(results) < 100
+
+    # The loop is still usable afterwards
+    assert event_loop.run(asyncio.sleep(0, result="done")) == "done"
+
+
+class SleepingServlet(EnvServlet):
+    """Returns the key of each call rather than calling a module, sleeping first for calls to "slow"."""
+
+    @ray.method(concurrency_group=call_concurrency_group())
+    def call_module_method(self, module_name, method_name, message, *args):
+        if method_name == "slow":
+            time.sleep(1)
+        return message.key
+
+
+@pytest.mark.level("unit")
+def test_call_priorities(test_servlet):
+    servlet = ray.remote(concurrency_groups=ENV_SERVLET_CONCURRENCY_GROUPS)(
+        SleepingServlet
+    ).remote(env_name="sleeping_servlet")
+
+    def call(method_name, key, priority):
+        return HTTPServer.call_servlet_method(
+            servlet,
+            "call_module_method",
+            ["module", method_name, Namespace(key=key), None, False],
+            block=False,
+            concurrency_group=call_concurrency_group(priority),
+        )
+
+    try:
+        ray.get(call("fast", "warmup", None))
+
+        # Flood the low priority calls, so most of them queue for a thread
+        num_low = 2 * CALL_PRIORITY_POOL_SIZES["low"]
+        low_refs = [call("slow", f"low_{i}", "low") for i in range(num_low)]
+
+        # High and normal priority calls don't queue behind them
+        start = time.time()
+        assert ray.get(call("fast", "high_0", "high")) == "high_0"
+        assert ray.get(call("fast", "normal_0", None)) == "normal_0"
+        assert time.time() - start < 0.5
+        done, _ = ray.wait(low_refs, num_returns=num_low, timeout=0)
+        assert not done
+
+        assert ray.get(low_refs) == [f"low_{i}" for i in range(num_low)]
+    finally:
+        ray.kill(servlet)
+
+
+@pytest.mark.level("unit")
+def test_cancel_queued_call(monkeypatch):
+    monkeypatch.setattr(env_servlet, "MAX_EARLY_CANCELS", 2)
+    servlet = EnvServlet.__new__(EnvServlet)
+    servlet.cancel_events = {}
+    servlet.early_cancels = OrderedDict()
+    servlet._early_cancels_lock = threading.Lock()
+
+    # Not running yet, but cancelled as soon as it starts
+    assert not servlet.cancel("queued_0")
+    assert servlet.cancel_events["queued_0"].is_set()
+
+    # Only the most recent early cancels are remembered
+    servlet.cancel("queued_1")
+    servlet.cancel("queued_2")
+    assert list(servlet.cancel_events) == ["queued_1", "queued_2"]
+
+
+class WorkerModule:
+    def __init__(self):
+        # Loaded once in the servlet and pickled over to each worker as it starts, not with each call
+        self.state = {"loaded_in": multiprocessing.current_process().pid}
+
+    def loaded_in(self):
+        return self.state["loaded_in"], multiprocessing.current_process().pid
+
+    def large_result(self):
+        return b"x" * (2 * PROCESS_POOL_SHM_THRESHOLD)
+
+    def generator(self):
+        yield 1
+
+    def slow(self):
+        time.sleep(1)
+        return b"x" * (2 * PROCESS_POOL_SHM_THRESHOLD)
+
+
+@pytest.mark.level("unit")
+def test_worker_calls():
+    pool = env_servlet._worker_pool("worker_module", WorkerModule(), 2)
+
+    def call(method_name):
+        return env_servlet._load_worker_result(
+            *pool.submit(
+                env_servlet._call_in_worker,
+                "worker_module",
+                method_name,
+                [],
+                {},
+            ).result()
+        )
+
+    try:
+        loaded_in, called_in = call("loaded_in")
+        assert loaded_in == multiprocessing.current_process().pid
+        assert called_in != loaded_in
+
+        # Large results come back through shared memory
+        assert call("large_result") == b"x" * (2 * PROCESS_POOL_SHM_THRESHOLD)
+
+        with pytest.raises(TypeError, match="generator"):
+            call("generator")
+
+        # Cancelling (or the call's timeout passing) stops the wait for a call running in a worker, and drops calls
+        # still queued for one
+        cancel_event = threading.Event()
+        futures = [
+            pool.submit(env_servlet._call_in_worker, "worker_module", "slow", [], {})
+            for _ in range(6)
+        ]
+        threading.Timer(0.2, cancel_event.set).start()
+        start = time.time()
+        with pytest.raises(CancelledError):
+            env_servlet._wait_for_worker_result(futures[-1], cancel_event)
+        assert time.time() - start < 0.5
+        assert futures[-1].cancelled()
+        with pytest.raises(CancelledError):
+            env_servlet._wait_for_worker_result(futures[0], cancel_event)
+        assert not futures[0].cancelled()
+        # Its result is still loaded once it finishes, so its shared memory is freed
+        futures[0].result()
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.level("unit")
+def test_result_cache():
+    cache = ResultCache(maxsize=2)
+    key = ResultCache.key([1], {"b": 2, "a": 1})
+    assert key == ResultCache.key([1], {"a": 1, "b": 2})
+    assert cache.get(key) is ResultCache.MISS
+
+    cache.put(key, {"result": [1, 2]})
+    hit = cache.get(key)
+    assert hit == {"result": [1, 2]}
+    # Hits are copies, so callers mutating them don't change the cache
+    hit["result"].append(3)
+    assert cache.get(key) == {"result": [1, 2]}
+
+    # Least recently used results are evicted first
+    cache.put("b", 2)
+    cache.get(key)
+    cache.put("c", 3)
+    assert cache.get("b") is ResultCache.MISS
+    assert cache.get(key) is not ResultCache.MISS
+    assert cache.stats() == {
+        "hits": 4,
+        "misses": 2,
+        "evictions": 1,
+        "entries": 2,
+        "bytes": cache.stats()["bytes"],
+    }
+
+    # Evicts by total size, and never caches results larger than max_bytes
+    cache = ResultCache(max_bytes=3000)
+    cache.put("small", b"x" * 1000)
+    cache.put("too_large", b"x" * 4000)
+    assert cache.get("too_large") is ResultCache.MISS
+    cache.put("medium", b"x" * 2000)
+    assert cache.get("small") is ResultCache.MISS
+    assert cache.stats()["bytes"] <= 3000
+
+    cache = ResultCache(ttl=0.1)
+    cache.put("key", 1)
+    assert cache.get("key") == 1
+    time.sleep(0.2)
+    assert cache.get("key") is ResultCache.MISS
+
+    # Arguments which can't be pickled aren't cached
+    assert ResultCache.key([threading.Lock()], {}) is None
+
+
+@pytest.mark.level("unit")
+def test_arg_cache():
+    servlet = EnvServlet.__new__(EnvServlet)
+    servlet.arg_cache = ResultCache(max_bytes=3000)
+    servlet.result_caches = {}
+    data = pickle.dumps(list(range(100)))
+    digest = hashlib.sha256(data).hexdigest()
+
+    assert servlet.missing_args([digest]) == [digest]
+    servlet.arg_cache.put_pickled(digest, data)
+    assert servlet.missing_args([digest, "other"]) == ["other"]
+
+    # Each call gets its own copy of the cached argument
+    arg = env_servlet._resolve_arg(CachedArg(digest), servlet.arg_cache)
+    assert arg == list(range(100))
+    arg.append(100)
+    assert env_servlet._resolve_arg(CachedArg(digest), servlet.arg_cache) == list(
+        range(100)
+    )
+    assert servlet.cache_stats() == {"call_args": servlet.arg_cache.stats()}
+
+    # Evicted arguments are reported to the client, which then sends them in full
+    with pytest.raises(ArgCacheMiss):
+        env_servlet._resolve_arg(CachedArg("other"), servlet.arg_cache)
+
+
+@pytest.mark.level("unit")
+def test_resolve_run_refs(monkeypatch):
+    def run_queue(status, error=None):
+        queue = rh.Queue(name="run_key")
+        queue.provenance = Namespace(status=status, error=error)
+        return queue
+
+    # A ref to a run still in progress waits for it to finish, then resolves to its result
+    result = rh.Blob(name="run_key")
+    result.data = [1, 2]
+    objs = [run_queue(RunStatus.RUNNING)] * 3 + [result]
+    monkeypatch.setattr(env_servlet.obj_store, "get", lambda key, default: objs.pop(0))
+    assert env_servlet._resolve_arg(rh.Ref("run_key")) == [1, 2]
+    assert not objs
+
+    # ...or until the call resolving it is cancelled
+    queue = run_queue(RunStatus.RUNNING)
+    monkeypatch.setattr(env_servlet.obj_store, "get", lambda key, default: queue)
+    cancel_event = threading.Event()
+    threading.Timer(0.2, cancel_event.set).start()
+    env_servlet._set_cancel_event(cancel_event)
+    try:
+        with pytest.raises(CancelledError):
+            env_servlet._resolve_arg(rh.Ref("run_key"))
+    finally:
+        env_servlet._set_cancel_event(None)
+
+    # A ref to a run which failed or was cancelled raises, rather than resolving to the run's queue
+    error = ValueError("Bad input")
+    queue = run_queue(RunStatus.ERROR, error)
+    with pytest.raises(RuntimeError, match="run_key failed") as e:
+        env_servlet._resolve_arg(rh.Ref("run_key"))
+    assert e.value.__cause__ is error
+    queue = run_queue(RunStatus.CANCELLED)
+    with pytest.raises(RuntimeError, match="run_key was cancelled"):
+        env_servlet._resolve_arg(rh.Ref("run_key"))
+
+    # A finished generator run resolves to the queue of its results
+    queue = run_queue(RunStatus.COMPLETED)
+    assert env_servlet._resolve_arg(rh.Ref("run_key")) is queue
+
+
+@pytest.mark.level("unit")
+def test_call_batcher():
+    batch_sizes = []
+
+    def double(inputs):
+        batch_sizes.append(len(inputs))
+        time.sleep(0.01)
+        return [x * 2 for x in inputs]
+
+    batcher = CallBatcher(double, max_batch_size=8, max_wait_ms=20)
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        results = list(executor.map(batcher.call, range(32)))
+
+    assert results == [x * 2 for x in range(32)]
+    assert sum(batch_sizes) == 32
+    assert max(batch_sizes) <= 8
+    assert len(batch_sizes) < 32
+
+    # A lone call is dispatched once the wait passes, without a full batch
+    start = time.time()
+    assert batcher.call(5) == 10
+    assert time.time() - start < 1
+
+    # A method error, or a mismatched number of results, fails every call in the batch
+    bad_batcher = CallBatcher(lambda inputs: inputs[:-1], max_wait_ms=20)
+    futures = [bad_batcher.submit(x) for x in range(3)]
+    for future in futures:
+        with pytest.raises(ValueError, match="returned 2 results for 3 inputs"):
+            future.result()
+
+    # Async methods run on the servlet's event loop
+    async def async_double(inputs):
+        return [x * 2 for x in inputs]
+
+    event_loop = EventLoopThread()
+    async_batcher = CallBatcher(async_double, run_coroutine=event_loop.run)
+    assert async_batcher.call(3) == 6
+
+    # Cancelling a call waiting for its batch drops it
+    cancel_event = threading.Event()
+    cancel_event.set()
+    slow_batcher = CallBatcher(double, max_wait_ms=500)
+    with pytest.raises(CancelledError):
+        slow_batcher.call(1, cancel_event)
+
+    for b in [batcher, bad_batcher, async_batcher, slow_batcher]:
+        b.stop()
+
+
+@pytest.mark.level("unit")
+def test_single_flight():
+    flight = SingleFlight()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        waiters = [executor.submit(flight.result) for _ in range(4)]
+        time.sleep(0.1)
+        assert not any(waiter.done() for waiter in waiters)
+        result = {"config": 1}
+        assert flight.start(result) is result
+        assert all(waiter.result(timeout=5) is result for waiter in waiters)
+
+    # Calls attaching to a generator partway through still get all of its items
+    flight = SingleFlight()
+    items = flight.start(i for i in range(5))
+    assert [next(items), next(items)] == [0, 1]
+    late = flight.result()
+    assert list(items) == [2, 3, 4]
+    assert list(late) == [0, 1, 2, 3, 4]
+
+    # Attached calls get the exception of a failed run
+    flight = SingleFlight()
+    flight.fail(ValueError("load failed"))
+    with pytest.raises(ValueError, match="load failed"):
+        flight.result()
+
+    def failing_gen():
+        yield 1
+        raise ValueError("stream failed")
+
+    flight = SingleFlight()
+    items = flight.start(failing_gen())
+    with pytest.raises(ValueError, match="stream failed"):
+        list(items)
+    attached = flight.result()
+    assert next(attached) == 1
+    with pytest.raises(ValueError, match="stream failed"):
+        next(attached)
+
+    # Attached calls can be cancelled while they wait
+    cancel_event = threading.Event()
+    cancel_event.set()
+    with pytest.raises(CancelledError):
+        SingleFlight().result(cancel_event)
+
+
+@pytest.mark.level("unit")
+def test_concurrency_groups():
+    groups = {
+        name: getattr(method, "__ray_concurrency_group__", None)
+        for name, method in vars(EnvServlet).items()
+        if callable(method)
+    }
+    # Ray only fails on an undeclared group when the method is called, so check them all up front
+    assert {group for group in groups.values() if group} <= set(
+        ENV_SERVLET_CONCURRENCY_GROUPS
+    )
+    for priority in CALL_PRIORITY_POOL_SIZES:
+        assert call_concurrency_group(priority) in ENV_SERVLET_CONCURRENCY_GROUPS
+
+    # Object store operations don't queue behind user calls or result streams
+    for name in ["keys_local", "get_local", "put_local", "contains_local", "pop_local"]:
+        assert groups[name] == "control"
+    assert groups["get"] == "results"
+    assert groups["call_module_method"] == call_concurrency_group()
+
+
 @pytest.mark.servertest
 class TestServlet:
     @pytest.mark.level("unit")
@@ -33,6 +448,16 @@ class TestServlet:
             assert resp.output_type == "result_serialized"
             assert b64_unpickle(resp.data).startswith("file_")
 
+    @pytest.mark.level("unit")
+    def test_concurrency_group_methods(self, test_servlet):
+        # The servlet actor is created with its concurrency groups, so methods in each of them can run
+        assert ray.get(test_servlet.missing_args.remote(["digest"])) == ["digest"]
+        assert ray.get(test_servlet.cache_stats.remote()) == {}
+        resp = HTTPServer.call_servlet_method(
+            test_servlet, "get", ["does_not_exist", False, False]
+        )
+        assert resp.output_type == "exception"
+
     @pytest.mark.level("unit")
     def test_put_obj_local(self, test_servlet, blob_data):
         with tempfile.TemporaryDirectory() as temp_dir: